@@ -0,0 +1,81 @@
+"""
+Compare two result files of run_benchmarks.py, e.g. of two commits.
+
+A case regresses if its fastest time grows by more than the time
+threshold, its peak memory by more than the memory threshold, or its
+error against the exact solution by more than the error tolerance. Times
+below min_time are too noisy and are not compared. The exit code is 1 if
+any case regresses.
+
+    python benchmarks/compare.py baseline.json results.json --time-threshold 1.25
+"""
+
+import argparse
+import json
+import sys
+
+
+def load(filename):
+    with open(filename) as file:
+        data = json.load(file)
+
+    return data["meta"], {r["case"]: r for r in data["results"] if r["status"] == "ok"}
+
+
+def compare(baseline, current, time_threshold=1.25, memory_threshold=1.25,
+            error_tolerance=1e-9, min_time=1e-3):
+    """
+    Returns a list of (case, time ratio, memory ratio, list of regressions)
+    for all cases in both result sets.
+    """
+    rows = []
+    for case in sorted(baseline.keys() & current.keys()):
+        old, new = baseline[case], current[case]
+        time_ratio = new["time_min"] / max(old["time_min"], 1e-9)
+        memory_ratio = new["peak_memory_bytes"] / max(old["peak_memory_bytes"], 1)
+
+        regressions = []
+        if time_ratio > time_threshold and new["time_min"] > min_time:
+            regressions.append("time")
+        if memory_ratio > memory_threshold:
+            regressions.append("memory")
+        if ("abs_error" in old and "abs_error" in new
+                and new["abs_error"] > old["abs_error"] + error_tolerance):
+            regressions.append("accuracy")
+
+        rows.append((case, time_ratio, memory_ratio, regressions))
+
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--time-threshold", type=float, default=1.25)
+    parser.add_argument("--memory-threshold", type=float, default=1.25)
+    parser.add_argument("--error-tolerance", type=float, default=1e-9)
+    parser.add_argument("--min-time", type=float, default=1e-3)
+    args = parser.parse_args(argv)
+
+    baseline_meta, baseline = load(args.baseline)
+    current_meta, current = load(args.current)
+    print(f"Baseline {baseline_meta.get('commit')}, current {current_meta.get('commit')}")
+
+    rows = compare(baseline, current, args.time_threshold, args.memory_threshold,
+                   args.error_tolerance, args.min_time)
+    for case, time_ratio, memory_ratio, regressions in rows:
+        print(f"{case:60s} time x{time_ratio:6.2f}  memory x{memory_ratio:6.2f}  "
+              + ", ".join(regressions))
+
+    for case in sorted(baseline.keys() - current.keys()):
+        print(f"{case:60s} missing in current results")
+
+    regressed = [row for row in rows if row[3]]
+    print(f"{len(regressed)} of {len(rows)} cases regressed")
+
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,340 @@
+"""
+Benchmarks of the simulators, exact solvers and decompositions.
+
+Every case is run with its backend for a range of buffer sizes C, numbers
+of machines N or replications, timed, memory-profiled with tracemalloc and,
+where an exact two-machine solution exists, checked against it. Results are
+written as JSON, which compare.py compares across commits.
+
+    python benchmarks/run_benchmarks.py --suite quick --output results.json
+    python benchmarks/compare.py baseline.json results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+# Run from a checkout without installing the package
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from msma.decomposition.TwoMachineLineReliable2023 import (  # noqa: E402
+    TwoReliableMachines, kpis, throughput as reliable_throughput)
+from msma.decomposition.TwoMachineLineFluid import TwoUnreliableMachinesFluid  # noqa: E402
+from msma.decomposition.BatchDecomposition import N_MachineLineReliableBatch  # noqa: E402
+from msma.decomposition.FluidDecomposition import N_MachineLineUnreliableFluid  # noqa: E402
+from msma.decomposition.N_MachineLineReliableDecomposition import (  # noqa: E402
+    N_MachineLineReliable)
+from msma.two_machines.both_reliable.two_machines_reliable_numerical import (  # noqa: E402
+    two_rel_machines)
+from msma.two_machines.both_unreliable.two_machines_reliable_analytical import (  # noqa: E402
+    TwoMachineLineBothUnreliable, throughput as unreliable_throughput)
+from msma.two_machines.both_unreliable.two_machines_unreliable_sweep import (  # noqa: E402
+    TwoMachineLineBothUnreliableSweep)
+from msma.two_machines.both_unreliable.two_machines_parallel import (  # noqa: E402
+    TwoMachineLineParallel)
+from msma.n_machines.n_machines_unreliable.n_unreliable_machines_numerical import (  # noqa: E402
+    UnreliableProductionLine)
+from msma.n_machines.n_machines_unreliable.n_unreliable_machines_analytical import (  # noqa: E402
+    UnreliableProductionLineCTMC)
+
+# Rates of the two-machine lines
+RELIABLE = dict(mu1=1.0, mu2=1.1)
+UNRELIABLE = dict(mu1=1.0, mu2=1.1, p1=0.01, p2=0.02, r1=0.1, r2=0.15)
+
+# Scales and the largest size each backend is run with, per suite
+SUITES = {
+    "quick": dict(C=[10, 100, 1000, 10_000, 100_000],
+                  N=[2, 5, 10, 20, 50],
+                  replications=[1, 4],
+                  dense_reliable=1000, dense_unreliable=50, sparse_unreliable=1000,
+                  simulation_C=1000, sim_duration=2000, max_N_simulation=5,
+                  repeat=3),
+    "full": dict(C=[10, 100, 1000, 10_000, 100_000],
+                 N=[2, 5, 10, 20, 50, 100, 200],
+                 replications=[1, 4, 16],
+                 dense_reliable=2000, dense_unreliable=250, sparse_unreliable=5000,
+                 simulation_C=10_000, sim_duration=10_000, max_N_simulation=20,
+                 repeat=5),
+}
+
+
+def two_machine_cases(scale):
+    """
+    Two-machine lines over C, with the exact throughput as reference.
+    """
+    cases = []
+    for C in scale["C"]:
+        exact_reliable = reliable_throughput(C=C, **RELIABLE)
+        exact_unreliable = unreliable_throughput(C=C, **UNRELIABLE)
+
+        def dense_reliable(C=C):
+            return TwoReliableMachines("", RELIABLE["mu1"], RELIABLE["mu2"],
+                                       C).determineKPIs()[1]
+
+        def dense_unreliable(C=C):
+            return TwoMachineLineBothUnreliable("", C=C, **UNRELIABLE).calc_TH2()
+
+        def sparse_unreliable(C=C):
+            # One machine per station: the same line, as sparse generator
+            return TwoMachineLineParallel("", C=C, **UNRELIABLE).calc_TH2()
+
+        def sweep_unreliable(C=C):
+            # 101 values of mu1 around the base case, which is the middle one
+            line = TwoMachineLineBothUnreliableSweep("", C=C, param="mu1", **UNRELIABLE)
+            values = UNRELIABLE["mu1"] * np.linspace(0.9, 1.1, 101)
+            return line.sweep(values)[1][50]
+
+        def fluid_unreliable(C=C):
+            return TwoUnreliableMachinesFluid("", C=C, **UNRELIABLE).determineKPIs()[1]
+
+        def simulation_reliable(C=C):
+            np.random.seed(4711)
+            return two_rel_machines(RELIABLE["mu1"], RELIABLE["mu2"], C,
+                                    scale["sim_duration"])[2][1]
+
+        def simulation_unreliable(C=C, leap_condition=None):
+            line = UnreliableProductionLine(
+                mu=np.array([UNRELIABLE["mu1"], UNRELIABLE["mu2"]]),
+                r=np.array([UNRELIABLE["r1"], UNRELIABLE["r2"]]),
+                p=np.array([UNRELIABLE["p1"], UNRELIABLE["p2"]]),
+                C=np.array([C]))
+            np.random.seed(4711)
+            return line.simulate(scale["sim_duration"],
+                                 leap_condition=leap_condition)[0][1]
+
+        group = "two_machines_reliable"
+        cases.append((group, "closed_form", dict(C=C), exact_reliable,
+                      lambda C=C: reliable_throughput(C=C, **RELIABLE)))
+        cases.append((group, "closed_form_vectorized", dict(C=C), exact_reliable,
+                      lambda C=C: float(kpis(RELIABLE["mu1"], RELIABLE["mu2"], C)[0])))
+        if C <= scale["dense_reliable"]:
+            cases.append((group, "dense_lu", dict(C=C), exact_reliable,
+                          dense_reliable))
+        if C <= scale["simulation_C"]:
+            cases.append((group, "simulation", dict(C=C), exact_reliable,
+                          simulation_reliable))
+
+        group = "two_machines_unreliable"
+        cases.append((group, "level_reduction", dict(C=C), exact_unreliable,
+                      lambda C=C: unreliable_throughput(C=C, **UNRELIABLE)))
+        cases.append((group, "fluid", dict(C=C), exact_unreliable,
+                      fluid_unreliable))
+        if C <= scale["dense_unreliable"]:
+            cases.append((group, "dense_lu", dict(C=C), exact_unreliable,
+                          dense_unreliable))
+            cases.append((group, "dense_lu_sweep_101_values", dict(C=C), exact_unreliable,
+                          sweep_unreliable))
+        if C <= scale["sparse_unreliable"]:
+            cases.append((group, "sparse_lu", dict(C=C), exact_unreliable,
+                          sparse_unreliable))
+        if C <= scale["simulation_C"]:
+            cases.append((group, "simulation", dict(C=C), exact_unreliable,
+                          simulation_unreliable))
+            cases.append((group, "simulation_leaping", dict(C=C), exact_unreliable,
+                          lambda C=C: simulation_unreliable(C, leap_condition=0.1)))
+
+    return cases
+
+
+def line_cases(scale):
+    """
+    N-machine lines over N. Only N = 2 has an exact reference.
+    """
+    rng = np.random.default_rng(4711)
+    cases = []
+    for N in scale["N"]:
+        mu = list(rng.uniform(0.8, 1.2, size=N))
+        p = [0.01] * N
+        r = [0.1] * N
+        C = [10] * (N - 1)
+        exact = reliable_throughput(mu[0], mu[1], C[0]) if N == 2 else None
+
+        def decomposition(N=N, mu=mu, C=C):
+            line = N_MachineLineReliable(N, mu, C)
+            line.determineThroughputAndInventory()
+            return line.TP[-1]
+
+        def parallel_decomposition(N=N, mu=mu, C=C, schedule="blocks"):
+            line = N_MachineLineReliable(N, mu, C)
+            line.determineThroughputAndInventoryParallel(schedule)
+            return line.TP[-1]
+
+        def batch_decomposition(N=N, mu=mu, C=C):
+            batch = N_MachineLineReliableBatch([mu] * 100, [C] * 100)
+            return float(batch.determineThroughputAndInventory()[0][0])
+
+        def fluid_decomposition(N=N, mu=mu, p=p, r=r):
+            line = N_MachineLineUnreliableFluid(N, mu, p, r, [1000] * (N - 1))
+            line.determineThroughputAndInventory()
+            return line.TP[-1]
+
+        def exact_ctmc(N=N, mu=mu, p=p, r=r):
+            line = UnreliableProductionLineCTMC(mu, r, p, [5] * (N - 1))
+            line.determineSteadyStateProbabilities()
+            return line.calc_TH()[-1]
+
+        def simulation(N=N, mu=mu, p=p, r=r, C=C):
+            line = UnreliableProductionLine(np.array(mu), np.array(r),
+                                            np.array(p), np.array(C))
+            np.random.seed(4711)
+            return line.simulate(scale["sim_duration"])[0][-1]
+
+        group = "n_machines"
+        cases.append((group, "decomposition", dict(N=N), exact, decomposition))
+        for schedule in ["blocks", "red-black"]:
+            cases.append((group, f"decomposition_{schedule}", dict(N=N), exact,
+                          lambda f=parallel_decomposition, s=schedule: f(schedule=s)))
+        cases.append((group, "batch_decomposition_100_lines", dict(N=N), exact,
+                      batch_decomposition))
+        if N > 2:
+            cases.append((group, "fluid_decomposition", dict(N=N), None,
+                          fluid_decomposition))
+        if N <= 4:
+            cases.append((group, "exact_ctmc", dict(N=N), None, exact_ctmc))
+        if N <= scale["max_N_simulation"]:
+            cases.append((group, "simulation", dict(N=N), None, simulation))
+
+    return cases
+
+
+def replication_cases(scale):
+    """
+    Independent replications of the two-machine simulation, whose mean
+    should approach the exact throughput.
+    """
+    exact = unreliable_throughput(C=10, **UNRELIABLE)
+    line = UnreliableProductionLine(
+        mu=np.array([UNRELIABLE["mu1"], UNRELIABLE["mu2"]]),
+        r=np.array([UNRELIABLE["r1"], UNRELIABLE["r2"]]),
+        p=np.array([UNRELIABLE["p1"], UNRELIABLE["p2"]]),
+        C=np.array([10]))
+
+    cases = []
+    for M in scale["replications"]:
+        def replications(M=M):
+            np.random.seed(4711)
+            return float(np.mean([line.simulate(scale["sim_duration"], seed=m)[0][1]
+                                  for m in range(M)]))
+
+        cases.append(("replications", "simulation", dict(C=10, M=M), exact,
+                      replications))
+
+    return cases
+
+
+def single_machine_cases(scale):
+    from msma.single_unreliable.one_unreliable_machine import single_unreliable_machine
+
+    p, r = 0.01, 0.1
+
+    def simulation():
+        np.random.seed(4711)
+        return single_unreliable_machine(p, r, runtime=100 * scale["sim_duration"])[0]
+
+    return [("single_unreliable", "simulation", {}, r / (p + r), simulation)]
+
+
+def case_name(group, backend, params):
+    return "/".join([group, backend] + [f"{k}={v}" for k, v in params.items()])
+
+
+def run_case(group, backend, params, reference, function, repeat):
+    result = {"case": case_name(group, backend, params),
+              "group": group,
+              "backend": backend,
+              "params": params}
+
+    try:
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            value = function()
+            times.append(time.perf_counter() - start)
+
+        # Separate run for the memory, tracemalloc slows everything down
+        tracemalloc.start()
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    except Exception as error:
+        tracemalloc.stop()
+        result.update(status="error", reason=repr(error))
+        return result
+
+    result.update(status="ok",
+                  time_min=min(times),
+                  time_median=statistics.median(times),
+                  peak_memory_bytes=peak,
+                  value=float(value))
+
+    if reference is not None:
+        result.update(reference=float(reference),
+                      abs_error=abs(float(value) - reference),
+                      rel_error=abs(float(value) - reference) / abs(reference))
+
+    return result
+
+
+def metadata(suite):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+
+    return {"suite": suite,
+            "commit": commit,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--suite", choices=sorted(SUITES), default="quick")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--filter", default="",
+                        help="only run cases whose name contains this string")
+    parser.add_argument("--repeat", type=int,
+                        help="timed runs per case, default depends on the suite")
+    args = parser.parse_args(argv)
+
+    scale = SUITES[args.suite]
+    repeat = args.repeat or scale["repeat"]
+
+    cases = (two_machine_cases(scale) + line_cases(scale)
+             + replication_cases(scale) + single_machine_cases(scale))
+
+    results = []
+    for group, backend, params, reference, function in cases:
+        if args.filter not in case_name(group, backend, params):
+            continue
+
+        result = run_case(group, backend, params, reference, function, repeat)
+        results.append(result)
+        if result["status"] == "ok":
+            error = (f"  rel. error {result['rel_error']:.2e}"
+                     if "rel_error" in result else "")
+            print(f"{result['case']:60s} {result['time_min']:10.4f} s "
+                  f"{result['peak_memory_bytes'] / 2**20:9.2f} MiB{error}")
+        else:
+            print(f"{result['case']:60s} {result['status']}: {result['reason']}")
+
+    with open(args.output, "w") as file:
+        json.dump({"meta": metadata(args.suite), "results": results}, file, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Models of manufacturing systems: single machines, two-machine lines, flow
+lines and their decompositions, solved exactly or simulated.
+
+The classes are imported on first access, so importing the package does
+not load SciPy or any model module:
+
+    from msma import TwoMachineLineBothUnreliable
+"""
+
+import importlib
+
+__version__ = "0.1.0"
+
+# Public name -> module relative to the package
+_EXPORTS = {
+    "single_unreliable_machine": "single_unreliable.one_unreliable_machine",
+    "TwoMachineLineBothReliable": "two_machines.both_reliable.two_machines_reliable_analytical",
+    "TwoMachineLineFirstUnreliable": "two_machines.one_unreliable.two_machines_first_unreliable_analytical",
+    "TwoMachineLineSecondUnreliable": "two_machines.one_unreliable.two_machines_second_unreliable_analytical",
+    "TwoMachineLineBothUnreliable": "two_machines.both_unreliable.two_machines_reliable_analytical",
+    "TwoMachineLineBothUnreliableSweep": "two_machines.both_unreliable.two_machines_unreliable_sweep",
+    "TwoMachineLineParallel": "two_machines.both_unreliable.two_machines_parallel",
+    "TwoMachineLinePhaseType": "two_machines.both_unreliable.two_machines_phase_type",
+    "PhaseType": "phase_type",
+    "UnreliableProductionLine": "n_machines.n_machines_unreliable.n_unreliable_machines_numerical",
+    "ImportanceSampling": "n_machines.n_machines_unreliable.rare_events",
+    "UnreliableProductionLineCTMC": "n_machines.n_machines_unreliable.n_unreliable_machines_analytical",
+    "TwoReliableMachines": "decomposition.TwoMachineLineReliable2023",
+    "TwoUnreliableMachinesFluid": "decomposition.TwoMachineLineFluid",
+    "N_MachineLineReliable": "decomposition.N_MachineLineReliableDecomposition",
+    "N_MachineLineReliableBatch": "decomposition.BatchDecomposition",
+    "N_MachineLineUnreliableFluid": "decomposition.FluidDecomposition",
+    "BufferAllocation": "decomposition.BufferAllocation",
+    "LineGraph": "decomposition.LineGraph",
+    "AssemblyDisassemblyReliable": "decomposition.AssemblyDisassemblyDecomposition",
+    "AssemblyDisassemblySimulation": "decomposition.AssemblyDisassemblySimulation",
+    "ResultCache": "result_cache",
+    "evaluate": "evaluation",
+    "evaluate_config": "evaluation",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module("." + _EXPORTS[name], __name__), name)
+    globals()[name] = value  # later accesses do not come here
+
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,59 @@
+"""
+Command line interface: evaluate a file of line configurations (JSON, JSON
+lines, CSV or Parquet) and write the KPIs as JSON lines or CSV as they come.
+
+    msma lines.csv --output results.csv
+    msma lines.parquet --workers 8 --chunk-size 5000 -o results.jsonl
+    python -m msma lines.json --backend decomposition
+    msma lines.csv --tolerance 0.01 --time-budget 5
+"""
+
+import argparse
+import sys
+
+from . import evaluation, pipeline
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="msma", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input", help="JSON, JSON lines, CSV or Parquet file of "
+                                      "line configurations")
+    parser.add_argument("--output", "-o", help="result file, .csv or JSON lines; "
+                                               "standard output if omitted")
+    parser.add_argument("--backend", choices=sorted(evaluation.BACKENDS),
+                        help="backend of configurations without one; "
+                             "chosen per configuration if omitted")
+    parser.add_argument("--tolerance", type=float,
+                        help="relative throughput error; the cheapest backend "
+                             "expected to meet it is chosen per configuration")
+    parser.add_argument("--time-budget", type=float,
+                        help="seconds per configuration for --tolerance")
+    parser.add_argument("--chunk-size", type=int, default=1000,
+                        help="configurations evaluated together")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes, 0 for one per CPU")
+    args = parser.parse_args(argv)
+
+    results = pipeline.evaluate_file(args.input, args.chunk_size,
+                                     args.workers or None, args.backend,
+                                     args.tolerance, args.time_budget)
+    errors = 0
+
+    def counted(results):
+        nonlocal errors
+        for result in results:
+            errors += "error" in result
+            yield result
+
+    if args.output is None:
+        evaluation.write_results(counted(results), sys.stdout)
+    else:
+        file_format = "csv" if args.output.endswith(".csv") else "jsonl"
+        with open(args.output, "w", newline="") as file:
+            evaluation.write_results(counted(results), file, file_format)
+
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Decomposition of reliable assembly/disassembly systems described by a
+LineGraph.
+"""
+
+from .LineGraph import LineGraph
+from .TwoMachineLineReliable2023 import kpis
+
+
+class AssemblyDisassemblyReliable:
+    """
+    Every buffer b of the graph is represented by a virtual two-machine line
+    with an upstream machine mu_up[b], a downstream machine mu_dn[b] and the
+    buffer size of b.
+
+    The virtual upstream machine of b works like its real station M, slowed
+    down by the time M loses per part because it is starved by one of its
+    input buffers or blocked by one of its other output buffers. For a
+    buffer b' these times are 1/TP[b'] - 1/mu_dn[b'] (input) and
+    1/TP[b'] - 1/mu_up[b'] (output), so
+
+        1/mu_up[b] = 1/mu_M + sum_{b' in In(M)} (1/TP[b'] - 1/mu_dn[b'])
+                            + sum_{b' in Out(M), b' != b} (1/TP[b'] - 1/mu_up[b'])
+
+    and symmetrically for mu_dn. For a serial line these are the update
+    equations of N_MachineLineReliable.
+    """
+    def __init__(self, graph: LineGraph):
+        if not graph.isConnected():
+            raise ValueError("The line graph must be connected!")
+        if any(s.p > 0 for s in graph.stations.values()):
+            raise ValueError("The decomposition requires reliable stations!")
+
+        self.graph = graph
+        self.order = graph.topologicalOrder()
+
+        # Buffers ordered by their upstream station for the forward pass
+        position = {s: k for k, s in enumerate(self.order)}
+        self.forwardOrder = sorted(graph.buffers,
+                                   key=lambda b: (position[graph.buffers[b].upstream],
+                                                  position[graph.buffers[b].downstream]))
+        self.backwardOrder = sorted(graph.buffers,
+                                    key=lambda b: (position[graph.buffers[b].downstream],
+                                                   position[graph.buffers[b].upstream]),
+                                    reverse=True)
+
+        self.mu_up = {b.name: graph.stations[b.upstream].mu
+                      for b in graph.buffers.values()}
+        self.mu_dn = {b.name: graph.stations[b.downstream].mu
+                      for b in graph.buffers.values()}
+
+    def _lostTime(self, station, exclude):
+        lost = 0
+        for b in self.graph.inputBuffers(station):
+            if b.name != exclude:
+                lost += 1 / self.TP[b.name] - 1 / self.mu_dn[b.name]
+        for b in self.graph.outputBuffers(station):
+            if b.name != exclude:
+                lost += 1 / self.TP[b.name] - 1 / self.mu_up[b.name]
+
+        return lost
+
+    def determineVirtualLine(self, b):
+        TP, _, ps, pb, nb = kpis(self.mu_up[b], self.mu_dn[b],
+                                 self.graph.buffers[b].C)
+        self.TP[b], self.ps[b], self.pb[b], self.nb[b] = (
+            float(TP), float(ps), float(pb), float(nb))
+
+    def determineThroughputAndInventory(self, tolerance=1e-6, max_iterations=10000):
+        """
+        Alternate forward and backward passes until all virtual lines have
+        the same throughput. Returns the throughput of the system;
+        converged is False if max_iterations were not enough.
+        """
+        self.iterationCounter = 0
+        self.converged = False
+        self.TP, self.ps, self.pb, self.nb = {}, {}, {}, {}
+
+        # Initialize virtual lines wrt KPIs
+        for b in self.graph.buffers:
+            self.determineVirtualLine(b)
+
+        while self.iterationCounter < max_iterations:
+            self.iterationCounter += 1
+
+            # Forward pass, upstream machines
+            for b in self.forwardOrder:
+                M = self.graph.buffers[b].upstream
+                self.mu_up[b] = 1 / (1 / self.graph.stations[M].mu
+                                     + self._lostTime(M, exclude=b))
+                self.determineVirtualLine(b)
+
+            # Backward pass, downstream machines
+            for b in self.backwardOrder:
+                M = self.graph.buffers[b].downstream
+                self.mu_dn[b] = 1 / (1 / self.graph.stations[M].mu
+                                     + self._lostTime(M, exclude=b))
+                self.determineVirtualLine(b)
+
+            # Check for convergence
+            # when throughput is the same for all virtual lines
+            TP_min, TP_max = min(self.TP.values()), max(self.TP.values())
+            if (TP_max - TP_min) / TP_max < tolerance:
+                self.converged = True
+                break
+
+        return sum(self.TP.values()) / len(self.TP)
+
+
+if __name__ == "__main__":
+    # Two feeder lines merge at assembly station A, whose product is
+    # split again at disassembly station D
+    graph = LineGraph()
+    graph.addStation("F1", mu=1.2)
+    graph.addStation("F2", mu=1.0)
+    graph.addStation("G2", mu=1.3)
+    graph.addStation("A", mu=1.1)
+    graph.addStation("D", mu=1.4)
+    graph.addStation("S1", mu=1.2)
+    graph.addStation("S2", mu=1.0)
+
+    graph.addBuffer("F1-A", "F1", "A", C=5)
+    graph.addBuffer("F2-G2", "F2", "G2", C=3)
+    graph.addBuffer("G2-A", "G2", "A", C=5)
+    graph.addBuffer("A-D", "A", "D", C=4)
+    graph.addBuffer("D-S1", "D", "S1", C=5)
+    graph.addBuffer("D-S2", "D", "S2", C=5)
+
+    system = AssemblyDisassemblyReliable(graph)
+    TP = system.determineThroughputAndInventory()
+
+    print("Throughput:", TP)
+    print("Average inventory:", system.nb)
+    print("Number of iterations required:", system.iterationCounter,
+          "converged:", system.converged)
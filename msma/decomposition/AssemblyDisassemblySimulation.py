@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Event simulation of assembly/disassembly systems described by a LineGraph,
+the counterpart of UnreliableProductionLine for non-serial systems.
+"""
+
+import numpy as np
+
+from .LineGraph import LineGraph
+
+
+class AssemblyDisassemblySimulation:
+    # Definition of codes for events
+    PROCESS_STEP_COMPLETED = 1
+    MACHINE_FAILURE = 2
+    MACHINE_REPAIR = 3
+
+    # Machine states
+    MACHINE_UP = 1
+    MACHINE_DOWN = 0
+
+    def __init__(self, graph: LineGraph) -> None:
+        self.graph = graph
+        self.station_names = graph.topologicalOrder()
+        self.buffer_names = list(graph.buffers)
+        self.num_machines = len(self.station_names)
+        self.num_buffers = len(self.buffer_names)
+
+        stations = [graph.stations[s] for s in self.station_names]
+        self.mu = np.array([s.mu for s in stations], dtype=float)
+        self.p = np.array([s.p for s in stations], dtype=float)
+        self.r = np.array([s.r for s in stations], dtype=float)
+        self.C = np.array([graph.buffers[b].C for b in self.buffer_names], dtype=int)
+
+        # Incidence of stations and their input/output buffers
+        station_index = {s: n for n, s in enumerate(self.station_names)}
+        self.is_input = np.zeros((self.num_machines, self.num_buffers), dtype=bool)
+        self.is_output = np.zeros((self.num_machines, self.num_buffers), dtype=bool)
+        for i, b in enumerate(self.buffer_names):
+            self.is_input[station_index[graph.buffers[b].downstream], i] = True
+            self.is_output[station_index[graph.buffers[b].upstream], i] = True
+
+        # Net change of all buffer levels when a station completes a step
+        self.step_change = self.is_output.astype(int) - self.is_input.astype(int)
+
+    def starved_blocked(self):
+        starved = self.is_input @ (self.ext_buffer_level == 0)
+        blocked = self.is_output @ (self.ext_buffer_level == self.C + 2)
+
+        return starved, blocked
+
+    def simulate(self,
+                 sim_duration: float,
+                 seed: int = 4711):
+        """
+        Simulate the system with the direct method: in every state, the time
+        until the next event is exponential with the sum of the rates of all
+        possible events, and the event is drawn proportional to its rate.
+
+        Returns throughput and processed parts per station (in the order of
+        station_names) and the average extended level of every buffer (in
+        the order of buffer_names). Time fractions in which a station is up
+        and starved or blocked are stored in starving_prob and
+        blocking_prob.
+        """
+        rng = np.random.default_rng(seed)
+        trans_time = sim_duration/10
+
+        # Initialize the state variables
+        self.parts_processed = np.zeros(self.num_machines, dtype=int)
+        self.ext_buffer_level = np.zeros(self.num_buffers, dtype=int)
+        self.avg_buffer_level = np.zeros(self.num_buffers, dtype=float)
+        self.machine_states = np.full(self.num_machines, self.MACHINE_UP, dtype=int)
+        self.starving_prob = np.zeros(self.num_machines, dtype=float)
+        self.blocking_prob = np.zeros(self.num_machines, dtype=float)
+
+        sim_clock = -trans_time
+        while sim_clock < sim_duration:
+            up = self.machine_states == self.MACHINE_UP
+            starved, blocked = self.starved_blocked()
+            prod_ready = up & ~starved & ~blocked
+
+            # Rates of completions, failures (only if producing) and repairs
+            rates = np.concatenate((self.mu * prod_ready,
+                                    self.p * prod_ready,
+                                    self.r * ~up))
+            total_rate = rates.sum()
+            time_until_next_event = rng.exponential(1/total_rate)
+
+            # Statistics of the state before the event, within [0, sim_duration]
+            observed = (min(sim_clock + time_until_next_event, sim_duration)
+                        - max(sim_clock, 0))
+            if observed > 0:
+                self.avg_buffer_level += self.ext_buffer_level * observed
+                self.starving_prob += (up & starved) * observed
+                self.blocking_prob += (up & ~starved & blocked) * observed
+
+            sim_clock += time_until_next_event
+            if sim_clock > sim_duration:
+                break
+
+            event = np.searchsorted(np.cumsum(rates), rng.random() * total_rate,
+                                    side="right")
+            event_type, next_machine = divmod(min(event, len(rates) - 1),
+                                              self.num_machines)
+
+            # Execute the next event
+            if event_type + 1 == self.PROCESS_STEP_COMPLETED:
+                self.ext_buffer_level += self.step_change[next_machine]
+
+                # Transient phase is over, we begin to count the processed parts
+                if sim_clock > 0:
+                    self.parts_processed[next_machine] += 1
+
+            elif event_type + 1 == self.MACHINE_FAILURE:
+                self.machine_states[next_machine] = self.MACHINE_DOWN
+
+            else:
+                self.machine_states[next_machine] = self.MACHINE_UP
+
+        self.th = self.parts_processed / sim_duration
+        self.avg_buffer_level /= sim_duration
+        self.starving_prob /= sim_duration
+        self.blocking_prob /= sim_duration
+
+        return self.th, self.parts_processed, self.avg_buffer_level
+
+
+if __name__ == "__main__":
+    from .AssemblyDisassemblyDecomposition import AssemblyDisassemblyReliable
+
+    # Two feeder lines merge at the assembly station A
+    graph = LineGraph()
+    graph.addStation("F1", mu=1.2)
+    graph.addStation("F2", mu=1.0)
+    graph.addStation("G2", mu=1.3)
+    graph.addStation("A", mu=1.1)
+    graph.addStation("S", mu=1.2)
+
+    graph.addBuffer("F1-A", "F1", "A", C=5)
+    graph.addBuffer("F2-G2", "F2", "G2", C=3)
+    graph.addBuffer("G2-A", "G2", "A", C=5)
+    graph.addBuffer("A-S", "A", "S", C=4)
+
+    simulation = AssemblyDisassemblySimulation(graph)
+    th, _, avg_buffer = simulation.simulate(sim_duration=100000)
+    print("Simulated throughput:", dict(zip(simulation.station_names, th)))
+    print("Simulated average buffer levels:",
+          dict(zip(simulation.buffer_names, avg_buffer)))
+
+    system = AssemblyDisassemblyReliable(graph)
+    print("Decomposition throughput:", system.determineThroughputAndInventory())
+    print("Decomposition average buffer levels:", system.nb)
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Decomposition of many reliable N-station flow lines at once.
+"""
+
+import numpy as np
+
+from .TwoMachineLineReliable2023 import kpis
+
+
+class N_MachineLineReliableBatch:
+    """
+    The decomposition of N_MachineLineReliable for L lines with the same
+    number of stations, run as array operations over all lines.
+
+    Parameters
+    ----------
+    mu : array_like
+        Processing rates, shape (L, N).
+    C : array_like
+        Buffer sizes, shape (L, N-1).
+    """
+    def __init__(self, mu, C):
+        self.mu = np.asarray(mu, dtype=float)
+        self.C = np.asarray(C, dtype=int)
+        self.number_of_lines, self.number_of_stations = self.mu.shape
+
+        if self.C.shape != (self.number_of_lines, self.number_of_stations - 1):
+            raise ValueError("Sizes of machine array and buffer array don't fit!")
+
+    def determineThroughputAndInventory(self, tolerance=1e-6, max_iterations=10000):
+        """
+        Run forward and backward passes until the throughput of the first
+        and last virtual line agree for every line. Lines that converged
+        are frozen, the passes only continue on the remaining ones.
+
+        Returns
+        -------
+        TP : numpy.ndarray
+            Throughput of each line, shape (L,).
+        nb : numpy.ndarray
+            Average inventory of each buffer, shape (L, N-1).
+        pb : numpy.ndarray
+            Blocking probabilities, shape (L, N-1).
+        ps : numpy.ndarray
+            Starving probabilities, shape (L, N-1).
+        """
+        mu = self.mu
+        C = self.C
+        N = self.number_of_stations
+
+        self.mu_up = mu[:, :-1].copy()
+        self.mu_dn = mu[:, 1:].copy()
+        self.iterationCounter = np.zeros(self.number_of_lines, dtype=int)
+
+        # Initialize virtual lines wrt KPIs
+        self.TP, _, self.ps, self.pb, self.nb = kpis(self.mu_up, self.mu_dn, C)
+
+        active = np.arange(self.number_of_lines)
+        for _ in range(max_iterations):
+            if len(active) == 0:
+                break
+
+            a = active
+            self.iterationCounter[a] += 1
+
+            # Forward pass
+            for i in range(1, N - 1):
+                k_up = 1 / self.TP[a, i-1] + 1 / mu[a, i] - 1 / self.mu_dn[a, i-1]
+                self.mu_up[a, i] = 1 / k_up
+                (self.TP[a, i], _, self.ps[a, i],
+                 self.pb[a, i], self.nb[a, i]) = kpis(self.mu_up[a, i],
+                                                      self.mu_dn[a, i],
+                                                      C[a, i])
+
+            # Backward pass
+            for i in range(N - 3, -1, -1):
+                k_down = 1 / self.TP[a, i+1] + 1 / mu[a, i+1] - 1 / self.mu_up[a, i+1]
+                self.mu_dn[a, i] = 1 / k_down
+                (self.TP[a, i], _, self.ps[a, i],
+                 self.pb[a, i], self.nb[a, i]) = kpis(self.mu_up[a, i],
+                                                      self.mu_dn[a, i],
+                                                      C[a, i])
+
+            # Check for convergence, per line
+            converged = (np.abs(self.TP[a, 0] - self.TP[a, -1]) / self.TP[a, 0]
+                         < tolerance)
+            active = a[~converged]
+
+        self.converged = np.ones(self.number_of_lines, dtype=bool)
+        self.converged[active] = False
+
+        return self.TP[:, -1], self.nb, self.pb, self.ps
+
+
+if __name__ == "__main__":
+    import time
+
+    from .N_MachineLineReliableDecomposition import N_MachineLineReliable
+
+    rng = np.random.default_rng(4711)
+    L, N = 2000, 10
+    mu = rng.uniform(0.8, 1.2, size=(L, N))
+    C = rng.integers(1, 20, size=(L, N-1))
+
+    start = time.perf_counter()
+    batch = N_MachineLineReliableBatch(mu, C)
+    TP, nb, pb, ps = batch.determineThroughputAndInventory()
+    print(f"{L} lines decomposed in {time.perf_counter() - start:.2f} s,",
+          "all converged:", batch.converged.all())
+
+    for l in range(3):
+        line = N_MachineLineReliable(N, list(mu[l]), list(C[l]))
+        line.determineThroughputAndInventory()
+        print("Throughput batch:", TP[l], "single:", line.TP[-1])
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+Buffer allocation for reliable N-station flow lines, using the
+decomposition N_MachineLineReliable as evaluator.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+from .N_MachineLineReliableDecomposition import N_MachineLineReliable
+
+
+def evaluateAllocation(mu_list, C_list, mu_up_start=None, mu_dn_start=None):
+    """
+    Decompose the line for one buffer allocation, optionally warm-started
+    from the virtual lines of another solution.
+
+    Returns throughput, total average inventory and the converged
+    virtual lines (mu_up, mu_dn).
+    """
+    line = N_MachineLineReliable(len(mu_list), list(mu_list), list(C_list))
+    line.determineThroughputAndInventory(mu_up_start, mu_dn_start)
+
+    return line.TP[0], sum(line.nb), line.mu_up, line.mu_dn
+
+
+def _evaluate(args):
+    return evaluateAllocation(*args)
+
+
+class BufferAllocation:
+    """
+    Search for the split of a buffer budget across the buffers of a line.
+
+    Every allocation that is evaluated is stored together with its
+    throughput and inventory, so that repeated candidates are free and
+    the Pareto front of throughput versus total buffer can be read off
+    all evaluations made so far.
+
+    Parameters
+    ----------
+    mu_list : list
+        Processing rates of the stations.
+    C_min : int, optional
+        Smallest admissible size of every buffer. Default is 0.
+    step : int, optional
+        Number of buffer places moved in one search step. Default is 1.
+    n_workers : int, optional
+        Number of processes evaluating candidate allocations in parallel.
+        With 1, candidates are evaluated in this process. Default is 1.
+    """
+    def __init__(self, mu_list, C_min=0, step=1, n_workers=1):
+        self.mu = list(mu_list)
+        self.number_of_buffers = len(mu_list) - 1
+        self.C_min = C_min
+        self.step = step
+        self.n_workers = n_workers
+
+        self.evaluated = {}  # allocation -> (TP, WIP)
+        self.solutions = {}  # allocation -> (mu_up, mu_dn)
+        self.evaluationCounter = 0
+        self._executor = None
+
+    def __enter__(self):
+        if self.n_workers > 1:
+            self._executor = ProcessPoolExecutor(self.n_workers)
+        return self
+
+    def __exit__(self, *exc):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def evaluate(self, allocations, start=None):
+        """
+        Evaluate a list of allocations, warm-started from the solution of
+        the allocation start. Returns a list of (TP, WIP).
+        """
+        mu_up_start, mu_dn_start = self.solutions.get(start, (None, None))
+        new = [C for C in dict.fromkeys(allocations) if C not in self.evaluated]
+        args = [(self.mu, C, mu_up_start, mu_dn_start) for C in new]
+
+        if self._executor is not None and len(args) > 1:
+            results = self._executor.map(_evaluate, args)
+        else:
+            results = map(_evaluate, args)
+
+        for C, (TP, WIP, mu_up, mu_dn) in zip(new, results):
+            self.evaluated[C] = (TP, WIP)
+            self.solutions[C] = (mu_up, mu_dn)
+            self.evaluationCounter += 1
+
+        return [self.evaluated[C] for C in allocations]
+
+    def _add(self, C, i, amount):
+        return C[:i] + (C[i] + amount,) + C[i+1:]
+
+    def greedy(self, total_buffer, target_TP=None):
+        """
+        Marginal allocation: starting from C_min everywhere, repeatedly give
+        step places to the buffer with the largest throughput gain, until
+        the budget total_buffer is used up or target_TP is reached.
+
+        Returns the final allocation.
+        """
+        C = (self.C_min,) * self.number_of_buffers
+        TP, _ = self.evaluate([C])[0]
+
+        while (sum(C) + self.step <= total_buffer
+               and (target_TP is None or TP < target_TP)):
+            candidates = [self._add(C, i, self.step)
+                          for i in range(self.number_of_buffers)]
+            results = self.evaluate(candidates, start=C)
+            best = max(range(len(candidates)), key=lambda k: results[k][0])
+            C, TP = candidates[best], results[best][0]
+
+        return C
+
+    def _transfers(self, C):
+        return [self._add(self._add(C, i, -self.step), j, self.step)
+                for i in range(self.number_of_buffers)
+                if C[i] - self.step >= self.C_min
+                for j in range(self.number_of_buffers) if j != i]
+
+    def localSearch(self, C, target_TP=None):
+        """
+        Integer steepest-ascent local search starting at the allocation C.
+
+        Without target_TP, step places are moved from one buffer to another
+        as long as this increases the throughput. With target_TP, moves and
+        removals of step places are accepted as long as the throughput stays
+        at or above target_TP and the total inventory decreases.
+
+        Returns the locally optimal allocation.
+        """
+        C = tuple(C)
+
+        if target_TP is None:
+            def value(result):
+                return result[0]
+        else:
+            def value(result):
+                return -result[1] if result[0] >= target_TP else -float("inf")
+
+        current = value(self.evaluate([C])[0])
+
+        while True:
+            candidates = self._transfers(C)
+            if target_TP is not None:
+                candidates += [self._add(C, i, -self.step)
+                               for i in range(self.number_of_buffers)
+                               if C[i] - self.step >= self.C_min]
+
+            if not candidates:
+                return C
+
+            values = [value(result)
+                      for result in self.evaluate(candidates, start=C)]
+            best = max(range(len(candidates)), key=lambda k: values[k])
+
+            if values[best] <= current:
+                return C
+
+            C, current = candidates[best], values[best]
+
+    def maximizeThroughput(self, total_buffer):
+        """
+        Allocation of total_buffer places with maximal throughput: greedy
+        construction followed by local search.
+        """
+        return self.localSearch(self.greedy(total_buffer))
+
+    def minimizeInventory(self, target_TP, max_total_buffer):
+        """
+        Allocation reaching target_TP with minimal total inventory, or None
+        if the target cannot be reached within max_total_buffer places.
+        """
+        C = self.greedy(max_total_buffer, target_TP=target_TP)
+
+        if self.evaluated[C][0] < target_TP:
+            return None
+
+        return self.localSearch(C, target_TP=target_TP)
+
+    def paretoFront(self):
+        """
+        Allocations evaluated so far that are not dominated with respect to
+        smaller total buffer and larger throughput, as a list of
+        (total buffer, TP, allocation) sorted by total buffer.
+        """
+        front = []
+        for C, (TP, _) in sorted(self.evaluated.items(),
+                                 key=lambda item: (sum(item[0]), -item[1][0])):
+            if not front or TP > front[-1][1]:
+                front.append((sum(C), TP, C))
+
+        return front
+
+
+if __name__ == "__main__":
+    with BufferAllocation(mu_list=[1.0, 1.1, 0.9, 1.2, 1.0],
+                          step=2, n_workers=4) as allocation:
+        C = allocation.maximizeThroughput(total_buffer=40)
+        print("Best allocation of 40 buffer places:", C,
+              "with throughput", allocation.evaluated[C][0])
+
+        C = allocation.minimizeInventory(target_TP=0.8, max_total_buffer=60)
+        print("Allocation reaching TP 0.8 with least inventory:", C,
+              "with inventory", allocation.evaluated[C][1])
+
+        print("Evaluations:", allocation.evaluationCounter)
+        print("Pareto front (total buffer, TP):")
+        for total, TP, C in allocation.paretoFront():
+            print(total, TP, C)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Decomposition of unreliable N-station flow lines with the continuous-
+material two-machine model as building block.
+"""
+
+from .N_MachineLineReliableDecomposition import N_MachineLineReliable
+from .TwoMachineLineFluid import TwoUnreliableMachinesFluid
+
+
+class N_MachineLineUnreliableFluid(N_MachineLineReliable):
+    """
+    The virtual upstream (downstream) machine of buffer i fails and is
+    repaired like the real station i (i+1), only its rate is adapted.
+    With the efficiency e = r/(r+p) of the real station, the update
+    equations of N_MachineLineReliable are applied to the effective
+    rates e*mu, e.g. for the upstream machine
+
+        1/mu_up[i] = e_i/TP[i-1] + 1/mu_i - 1/mu_dn[i-1]
+
+    which reduces to the reliable equation for p = 0.
+    """
+    # The parallel schedules solve the fluid lines one by one
+    batchKPIs = None
+
+    def __init__(self, number_of_stations, mu_list, p_list, r_list, C_list,
+                 reuseTolerance=1e-8, instrument=False):
+        super().__init__(number_of_stations, mu_list, C_list, reuseTolerance,
+                         instrument)
+        self.p = list(p_list)
+        self.r = list(r_list)
+        # Stations that never fail (p = 0, as parse_config gives reliable
+        # stations) are always available
+        self.efficiency = [r / (r + p) if p > 0 else 1.0 for p, r in zip(self.p, self.r)]
+
+    def solveVirtualLine(self, i):
+        currentTwoMachineLine = TwoUnreliableMachinesFluid(
+            "", self.mu_up[i], self.mu_dn[i], self.p[i], self.p[i+1],
+            self.r[i], self.r[i+1], self.C[i])
+
+        return currentTwoMachineLine.determineKPIs()
+
+    def upstreamRate(self, i):
+        k_up = self.efficiency[i] / self.TP[i-1] + 1 / self.mu[i] - 1 / self.mu_dn[i-1]
+
+        return 1 / k_up
+
+    def downstreamRate(self, i):
+        k_down = (self.efficiency[i+1] / self.TP[i+1] + 1 / self.mu[i+1]
+                  - 1 / self.mu_up[i+1])
+
+        return 1 / k_down
+
+
+if __name__ == "__main__":
+    import time
+
+    # A high-volume line, cf. n_reliable_machines_numerical.py
+    line = N_MachineLineUnreliableFluid(number_of_stations=5,
+                                        mu_list=[10, 8, 9, 8.5, 10],
+                                        p_list=[0.01, 0.02, 0.01, 0.015, 0.01],
+                                        r_list=[0.1, 0.15, 0.1, 0.12, 0.1],
+                                        C_list=[10000, 10000, 10000, 10000])
+
+    start = time.perf_counter()
+    line.determineThroughputAndInventory()
+
+    print("Throughput:", line.TP[-1])
+    print("Average inventory:", line.nb)
+    print("Number of iterations required:", line.iterationCounter,
+          f"({time.perf_counter() - start:.3f} s)")
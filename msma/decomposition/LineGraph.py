@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Graph description of production systems with assembly and disassembly
+stations. Stations are the nodes, buffers the directed edges between them.
+"""
+
+
+class Station:
+    def __init__(self, name, mu, p=0.0, r=0.0):
+        self.name = name
+        self.mu = mu  # processing rate
+        self.p = p    # failure rate, 0 for a reliable station
+        self.r = r    # repair rate
+
+
+class Buffer:
+    def __init__(self, name, upstream, downstream, C):
+        self.name = name
+        self.upstream = upstream      # name of the feeding station
+        self.downstream = downstream  # name of the consuming station
+        self.C = C
+
+
+class LineGraph:
+    """
+    A station takes one part out of every input buffer and puts one part
+    into every output buffer per process step. A station with several input
+    buffers is an assembly station, one with several output buffers a
+    disassembly station. Stations without input buffers are never starved,
+    stations without output buffers are never blocked.
+    """
+    def __init__(self):
+        self.stations = {}
+        self.buffers = {}
+
+    def addStation(self, name, mu, p=0.0, r=0.0):
+        if name in self.stations:
+            raise ValueError(f"Station {name} already exists!")
+
+        self.stations[name] = Station(name, mu, p, r)
+
+        return self.stations[name]
+
+    def addBuffer(self, name, upstream, downstream, C):
+        if name in self.buffers:
+            raise ValueError(f"Buffer {name} already exists!")
+        if upstream not in self.stations or downstream not in self.stations:
+            raise ValueError(f"Buffer {name} connects unknown stations!")
+
+        self.buffers[name] = Buffer(name, upstream, downstream, C)
+
+        return self.buffers[name]
+
+    def inputBuffers(self, station):
+        return [b for b in self.buffers.values() if b.downstream == station]
+
+    def outputBuffers(self, station):
+        return [b for b in self.buffers.values() if b.upstream == station]
+
+    def topologicalOrder(self):
+        """
+        Station names ordered such that every buffer points forward.
+        """
+        indegree = {s: len(self.inputBuffers(s)) for s in self.stations}
+        ready = [s for s in self.stations if indegree[s] == 0]
+        order = []
+
+        while ready:
+            s = ready.pop(0)
+            order.append(s)
+            for b in self.outputBuffers(s):
+                indegree[b.downstream] -= 1
+                if indegree[b.downstream] == 0:
+                    ready.append(b.downstream)
+
+        if len(order) != len(self.stations):
+            raise ValueError("The line graph contains a cycle!")
+
+        return order
+
+    def isConnected(self):
+        if not self.stations:
+            return False
+
+        neighbours = {s: set() for s in self.stations}
+        for b in self.buffers.values():
+            neighbours[b.upstream].add(b.downstream)
+            neighbours[b.downstream].add(b.upstream)
+
+        start = next(iter(self.stations))
+        reached, stack = {start}, [start]
+        while stack:
+            for s in neighbours[stack.pop()] - reached:
+                reached.add(s)
+                stack.append(s)
+
+        return len(reached) == len(self.stations)
+
+    @classmethod
+    def serialLine(cls, mu_list, C_list, p_list=None, r_list=None):
+        """
+        The serial line of N_MachineLineReliable and UnreliableProductionLine
+        with stations 0, ..., N-1 and buffer i between station i and i+1.
+        """
+        if len(C_list) != len(mu_list) - 1:
+            raise ValueError("Sizes of machine array and buffer array don't fit!")
+
+        p_list = p_list if p_list is not None else [0.0] * len(mu_list)
+        r_list = r_list if r_list is not None else [0.0] * len(mu_list)
+
+        graph = cls()
+        for n in range(len(mu_list)):
+            graph.addStation(n, mu_list[n], p_list[n], r_list[n])
+        for i in range(len(C_list)):
+            graph.addBuffer(i, i, i + 1, C_list[i])
+
+        return graph
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+Continuous-material (fluid) model of a two-machine line with unreliable
+machines, for lines with high processing rates and large buffers.
+"""
+
+import numpy as np
+import scipy.linalg as sla
+
+
+def _exp_integrals(s, C):
+    """
+    I0 = int_0^C exp(s*y) dy and I1 = int_0^C y*exp(s*y) dy for s <= 0.
+    """
+    sC = s * C
+    if sC == 0:
+        return C, C**2 / 2
+
+    I0 = np.expm1(sC) / s
+    if abs(sC) < 0.1:
+        # Series of I1 to avoid the cancellation in (C*exp(sC) - I0)/s
+        I1, term = 0.0, 1.0
+        for k in range(20):
+            I1 += term / (k + 2)
+            term *= sC / (k + 1)
+        I1 *= C**2
+    else:
+        I1 = (C * np.exp(sC) - I0) / s
+
+    return I0, I1
+
+
+class TwoUnreliableMachinesFluid:
+    """
+    Material flows continuously through the line. Machine i produces at
+    rate mu_i while up, fails at rate p_i while operating and is repaired
+    at rate r_i. The buffer level x is a real number in [0, C].
+
+    In the interior of the buffer, the density f(x) of the machine states
+    alpha = (alpha1, alpha2), numbered 2*alpha1 + alpha2 as in
+    TwoMachineLineBothUnreliable, solves f'(x) D = f(x) T with the drifts
+    D = diag(mu1*alpha1 - mu2*alpha2) and the generator T of the machine
+    states. Its solution is a combination of at most four exponentials,
+    found from a 4x4 generalized eigenvalue problem. At x = 0 and x = C
+    there are probability masses in the states whose drift does not leave
+    the boundary. A machine slowed down to the rate of the other machine
+    at a boundary fails proportionally less often. The coefficients and
+    boundary masses solve an 8x8 linear system, so the effort does not
+    depend on C. A machine that never fails (p = 0) has no down state, so
+    its states are left out of the numbering and the systems shrink.
+
+    determineKPIs returns the same tuple as TwoReliableMachines, with ps
+    and pb the probabilities that the buffer is empty while machine 1 is
+    down and machine 2 up, and full while machine 1 is up and machine 2
+    down.
+    """
+    def __init__(self, name, mu1, mu2, p1, p2, r1, r2, C):
+        self.name = name
+        self.mu1 = mu1
+        self.mu2 = mu2
+        self.p1 = p1
+        self.p2 = p2
+        self.r1 = r1
+        self.r2 = r2
+        self.C = C
+
+        # Machine states (alpha1, alpha2) in the order of 2*alpha1 + alpha2
+        self.states = [(alpha1, alpha2)
+                       for alpha1 in ((0, 1) if p1 > 0 else (1,))
+                       for alpha2 in ((0, 1) if p2 > 0 else (1,))]
+        self.alpha1 = np.array([alpha1 for alpha1, _ in self.states])
+        self.alpha2 = np.array([alpha2 for _, alpha2 in self.states])
+        self.drift = mu1 * self.alpha1 - mu2 * self.alpha2
+
+    def generator(self, share1=None, share2=None):
+        """
+        Generator of the machine states, where machine i fails at rate
+        p_i times the share of its rate at which it operates.
+        """
+        K = len(self.states)
+        share1 = np.ones(K) if share1 is None else share1
+        share2 = np.ones(K) if share2 is None else share2
+        index = {state: s for s, state in enumerate(self.states)}
+
+        T = np.zeros((K, K))
+        for s, (alpha1, alpha2) in enumerate(self.states):
+            if self.p1 > 0:
+                T[s, index[(1 - alpha1, alpha2)]] = self.p1 * share1[s] if alpha1 else self.r1
+            if self.p2 > 0:
+                T[s, index[(alpha1, 1 - alpha2)]] = self.p2 * share2[s] if alpha2 else self.r2
+        T -= np.diag(T.sum(axis=1))
+
+        return T
+
+    def _interiorSolutions(self, T):
+        """
+        Values at 0 and C, integrals and first moments over [0, C] of the
+        basis solutions of f'(x) D = f(x) T.
+        """
+        C = self.C
+        z, V = sla.eig(T.T, np.diag(self.drift))
+        finite = np.isfinite(z)
+        z, V = z[finite].real, V[:, finite].real.T
+        if len(z) == 0:
+            # No drift in any state, only the constant solution
+            z, V = np.zeros(1), np.zeros((1, len(T)))
+        order = np.argsort(np.abs(z))
+        z, V = z[order], V[order]
+
+        # The smallest eigenvalue is 0 with the stationary distribution of
+        # T as eigenvector. If the mean drift vanishes, 0 is a double
+        # eigenvalue and the second solution is x*pi + w with w T = pi D.
+        pi = sla.null_space(T.T)[:, 0]
+        pi /= pi.sum()
+        z[0], V[0] = 0.0, pi
+        jordan = len(z) > 1 and abs(z[1]) * C < 1e-9
+
+        f0, fC, F, X = [], [], [], []
+        for k in range(len(z)):
+            if k == 1 and jordan:
+                w = np.linalg.lstsq(T.T, pi * self.drift, rcond=None)[0]
+                f0.append(w)
+                fC.append(C * pi + w)
+                F.append(C**2 / 2 * pi + C * w)
+                X.append(C**3 / 3 * pi + C**2 / 2 * w)
+            elif z[k] <= 0:
+                # exp(z*x), decaying from x = 0
+                I0, I1 = _exp_integrals(z[k], C)
+                f0.append(V[k])
+                fC.append(V[k] * np.exp(z[k] * C))
+                F.append(V[k] * I0)
+                X.append(V[k] * I1)
+            else:
+                # exp(z*(x-C)), decaying from x = C
+                I0, I1 = _exp_integrals(-z[k], C)
+                f0.append(V[k] * np.exp(-z[k] * C))
+                fC.append(V[k])
+                F.append(V[k] * I0)
+                X.append(V[k] * (C * I0 - I1))
+
+        return np.array(f0), np.array(fC), np.array(F), np.array(X)
+
+    def determineStateProbabilities(self):
+        """
+        Determine the coefficients of the interior density and the
+        probability masses p0 at x = 0 and pC at x = C.
+        """
+        mu1, mu2 = self.mu1, self.mu2
+        d = self.drift
+        T = self.generator()
+
+        # At the boundaries, the faster machine works at the rate of the
+        # slower one
+        T0 = self.generator(share2=np.minimum(1, mu1 * self.alpha1 / mu2))
+        TC = self.generator(share1=np.minimum(1, mu2 * self.alpha2 / mu1))
+        B0 = np.flatnonzero(d <= 0)
+        BC = np.flatnonzero(d >= 0)
+
+        f0, fC, F, X = self._interiorSolutions(T)
+        m = len(f0)
+        K = len(self.states)
+
+        # Balance of the boundary masses and the probability flow between
+        # boundary and interior in every machine state:
+        #   p0 T0 - D f(0) = 0,   pC TC + D f(C) = 0
+        # and normalization
+        A = np.zeros((2*K + 1, m + len(B0) + len(BC)))
+        A[0:K, 0:m] = -(f0 * d).T
+        A[0:K, m:m+len(B0)] = T0[B0].T
+        A[K:2*K, 0:m] = (fC * d).T
+        A[K:2*K, m+len(B0):] = TC[BC].T
+        A[2*K, 0:m] = F.sum(axis=1)
+        A[2*K, m:] = 1
+        b = np.zeros(2*K + 1)
+        b[2*K] = 1
+
+        coefficients = np.linalg.lstsq(A, b, rcond=None)[0]
+        a = coefficients[0:m]
+        self.p0 = np.zeros(K)
+        self.p0[B0] = coefficients[m:m+len(B0)]
+        self.pC = np.zeros(K)
+        self.pC[BC] = coefficients[m+len(B0):]
+
+        self.interior = a @ F         # probability of 0 < x < C per state
+        self.interiorMoment = a @ X   # int x f(x) dx per state
+
+    def determineKPIs(self):
+        self.determineStateProbabilities()
+
+        mu1, mu2 = self.mu1, self.mu2
+        alpha1, alpha2 = self.alpha1, self.alpha2
+
+        TP1 = (mu1 * alpha1 @ (self.interior + self.p0)
+               + self.pC @ (alpha1 * np.minimum(mu1, mu2 * alpha2)))
+        TP2 = (mu2 * alpha2 @ (self.interior + self.pC)
+               + self.p0 @ (alpha2 * np.minimum(mu2, mu1 * alpha1)))
+        # Machine 1 down and machine 2 up, and vice versa, exist only if
+        # the machines fail
+        ps = self.p0[self.states.index((0, 1))] if (0, 1) in self.states else 0.0
+        pb = self.pC[self.states.index((1, 0))] if (1, 0) in self.states else 0.0
+        nb = self.interiorMoment.sum() + self.C * self.pC.sum()
+
+        return TP1, TP2, ps, pb, nb
+
+
+if __name__ == "__main__":
+    from ..two_machines.both_unreliable.two_machines_reliable_analytical import throughput
+
+    # High rates and a large buffer, where the discrete model has tens of
+    # thousands of states
+    mu1, mu2, p1, p2, r1, r2, C = 10, 8, 0.01, 0.02, 0.1, 0.15, 10000
+
+    line = TwoUnreliableMachinesFluid("fluid", mu1, mu2, p1, p2, r1, r2, C)
+    TP1, TP2, ps, pb, nb = line.determineKPIs()
+    print("Fluid model:    TP1 =", TP1, "TP2 =", TP2, "nb =", nb)
+    print("Discrete model: TP  =", throughput(mu1, mu2, p1, p2, r1, r2, C))
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Nov 11 14:55:48 2022
+
+@author: helber
+"""
+
+import math
+import time
+
+import numpy as np
+
+from .. import stationary
+
+
+
+
+class TwoReliableMachines:
+    def __init__(self, name, mu1, mu2, C, instrument=False):
+        self.name = name
+        self.instrument = instrument  # collect sizes and timings in stats
+        self.mu1 = mu1
+        self.mu2 = mu2
+        self.C   = C
+        self.N   = C + 2
+        self.NumberOfStates = C + 3        
+        self.Q = np.zeros(( self.NumberOfStates, self.NumberOfStates ))
+        self.pi = np.zeros((1, self.NumberOfStates ))
+        self.StN = np.arange(self.NumberOfStates + 1 )
+        counter = -1
+        for n in range( self.NumberOfStates ):
+            counter = counter + 1
+            self.StN[ n ] = counter # so states are numbered from 0
+            
+                  
+            
+                      
+            
+            
+        
+    def initializeGeneratorMatrix (self):
+        
+        for i in range( self.NumberOfStates):
+            self.Q[i][i] = 0
+                        
+            
+        for n in range( self.NumberOfStates ):
+            if n < self.N:      # first machine is not blocked 
+                self.Q[ self.StN[ n ], self.StN[ n + 1 ]] = self.mu1
+            if n > 0:           # second machine is not starving
+                self.Q[ self.StN[ n ], self.StN[ n - 1 ]] = self.mu2
+        
+        for i in range( self.NumberOfStates ):
+            for j in range( self.NumberOfStates ):
+                if i != j:
+                    self.Q[i][i] = self.Q[i][i] - self.Q[i][j]
+                
+        
+        
+    def determineStateProbabilities (self):
+        if self.instrument:
+            start = time.perf_counter()
+        
+        self.initializeGeneratorMatrix()
+
+        if self.instrument:
+            assembled = time.perf_counter()
+        
+        # pi Q = 0 with sum(pi) = 1, checked and refined by stationary.solve
+        pi, self.diagnostics = stationary.solve(self.Q)
+        self.pi = pi[None, :]
+
+        if self.instrument:
+            self.stats = {"states": self.NumberOfStates,
+                          "assembly_time": assembled - start,
+                          "solve_time": time.perf_counter() - assembled,
+                          "solve_method": self.diagnostics["method"]}
+        
+        # print("Vector of state probabilities is ", self.pi)       
+        
+       
+
+        
+    def determineThroughput(self ):
+        self.determineStateProbabilities()
+        print()
+        print("Throughput via Machine 1 is ", self.mu1*( 1 - self.pi[0][ self.StN[ self.N ]]))
+        print("Throughput via Machine 2 is ", self.mu2*( 1 - self.pi[0][ self.StN[ 0 ]]))
+
+        
+     
+    def determineKPIs( self ):
+        self.determineStateProbabilities()
+        TP1 = self.mu1*( 1 - self.pi[0][ self.StN[ self.N ]] )
+        TP2 = self.mu2*( 1 - self.pi[0][ self.StN[ 0 ] ] )
+        
+        ps = self.pi[0][ self.StN[ 0      ]] 
+        pb = self.pi[0][ self.StN[ self.N ]]
+        
+        nb = 0
+        for n in range( self.N + 1 ):
+            nb = nb + n * ( self.pi[0][ self.StN[ n]]  )
+            
+        return TP1, TP2, ps, pb, nb
+      
+
+
+
+def _boundary_probability(x, N):
+    # (1 - rho) / (1 - rho^(N+1)) with x = log(rho), which is the
+    # probability of the empty (or, with -x, the full) extended buffer.
+    # Written with expm1 so that it stays accurate for rho close to 1
+    # and does not overflow for large buffers.
+    if x == 0:
+        return 1 / (N + 1)
+
+    if x > 0:
+        m = (N + 1) * x
+        return math.expm1(x) * math.exp(-m) / -math.expm1(-m)
+
+    return math.expm1(x) / math.expm1((N + 1) * x)
+
+
+def throughput(mu1, mu2, C, with_probabilities=False):
+    """
+    Throughput of a reliable two-machine line with buffer size C, computed
+    from the closed-form boundary probabilities of the birth-death chain
+    instead of solving for all state probabilities.
+
+    Returns TP or, with with_probabilities, the tuple (TP, ps, pb) with the
+    same meaning as in TwoReliableMachines.determineKPIs.
+    """
+    N = C + 2
+    x = math.log(mu1 / mu2)
+
+    ps = _boundary_probability(x, N)
+    pb = _boundary_probability(-x, N)
+    TP = mu1 * (1 - pb)
+
+    if with_probabilities:
+        return TP, ps, pb
+
+    return TP
+
+
+
+def kpis(mu1, mu2, C):
+    """
+    Vectorized closed-form KPIs of reliable two-machine lines. mu1, mu2 and
+    C are broadcast against each other, and the result has the same
+    meaning as TwoReliableMachines.determineKPIs, elementwise:
+    (TP1, TP2, ps, pb, nb).
+    """
+    mu1, mu2, C = np.broadcast_arrays(np.asarray(mu1, dtype=float),
+                                      np.asarray(mu2, dtype=float),
+                                      np.asarray(C))
+    N = C + 2
+    x = np.log(mu1 / mu2)
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        # Same branches as _boundary_probability
+        def boundary_probability(x):
+            m = (N + 1) * x
+            return np.where(x == 0, 1 / (N + 1),
+                            np.where(x > 0,
+                                     np.expm1(x) * np.exp(-m) / -np.expm1(-m),
+                                     np.expm1(x) / np.expm1(m)))
+
+        ps = boundary_probability(x)
+        pb = boundary_probability(-x)
+
+        # Mean of the truncated geometric distribution, with its series
+        # expansion around rho = 1 where the closed form cancels
+        nb = np.where(np.abs((N + 1) * x) < 1e-3,
+                      N / 2 + x * N * (N + 2) / 12,
+                      1 / np.expm1(-x) - (N + 1) / np.expm1(-(N + 1) * x))
+
+    return mu1 * (1 - pb), mu2 * (1 - ps), ps, pb, nb
+
+         
+         
+if __name__ == "__main__":     
+    myTwoMachineLine = TwoReliableMachines("X12", 0.2, 0.3, 3)
+
+    TP1, TP2, ps, pb, nb = myTwoMachineLine.determineKPIs()
+
+    print( TP1, TP2, ps, pb, nb)
@@ -0,0 +1,459 @@
+"""
+Evaluation of line configurations in one process, e.g. from the command
+line interface.
+
+A configuration is a dict with the processing rates mu, the buffer sizes C
+and, for unreliable lines, the failure and repair rates p and r. Rates are
+lists, strings of numbers separated by ';' or numbered keys mu1, mu2, ...,
+p1, ..., C1, ... as in the columns of a CSV file. Optional keys are name,
+backend (one of BACKENDS, otherwise choose_backend picks one),
+sim_duration and seed. The models are imported when a backend needs them.
+
+evaluate picks the backend by accuracy and cost instead: the cheapest one
+of estimate_backends expected to meet a relative tolerance of the
+throughput, within a time budget if one is given, and records why.
+
+    result = evaluate({"mu": [1, 1.1, 1.2], "p": [0.01] * 3,
+                       "r": [0.1] * 3, "C": [20, 20]}, tolerance=0.01)
+    result["backend"], result["reason"]
+"""
+
+import csv
+import json
+import re
+import statistics
+import time
+
+import numpy as np
+
+# Largest number of states for which unreliable lines are solved exactly
+CTMC_STATE_LIMIT = 200_000
+
+# Relative throughput errors assumed by estimate_backends: the solver
+# tolerance of the exact models, and typical errors of the decompositions
+# against the exact CTMC and long simulations (the fluid decomposition of
+# unreliable lines is off by 5 to 30 percent)
+EXACT_ERROR = 1e-8
+DECOMPOSITION_ERROR = {"reliable": 0.02, "unreliable": 0.15}
+
+# Seconds per unit of work of the cost models of estimate_backends,
+# measured on a desktop machine
+SECONDS_PER_UNIT = {"closed_form": 3e-5,     # per buffer level
+                    "ctmc": 2e-5,            # per states**1.2
+                    "decomposition": 3e-5,   # per M**3 (C + 10)
+                    "simulation": 5e-6}      # per M events
+
+# Confidence level of the simulation error
+CONFIDENCE = 0.95
+
+_NUMBERED = re.compile(r"^(mu|p|r|C)(\d+)$")
+
+
+def _values(value):
+    if isinstance(value, str):
+        return [float(v) for v in re.split(r"[;\s]+", value.strip()) if v]
+    if np.ndim(value) == 0:
+        return [float(value)]
+
+    return [float(v) for v in value]
+
+
+def parse_config(config: dict) -> dict:
+    """
+    Line of a configuration, a dict with name, backend, the lists mu, p, r
+    (zero for reliable machines) and C, sim_duration and seed.
+    """
+    lists = {}
+    numbered = {}
+    for key, value in config.items():
+        match = _NUMBERED.match(key)
+        if match:
+            if value not in ("", None):
+                numbered.setdefault(match[1], {})[int(match[2])] = float(value)
+        elif key in ("mu", "p", "r", "C") and value not in ("", None):
+            lists[key] = _values(value)
+
+    for key, values in numbered.items():
+        lists.setdefault(key, [values[i] for i in sorted(values)])
+
+    if "mu" not in lists or "C" not in lists:
+        raise ValueError("A configuration needs the rates mu and buffer sizes C")
+
+    M = len(lists["mu"])
+    if len(lists["C"]) != M - 1:
+        raise ValueError("Sizes of machine array and buffer array don't fit!")
+    for key in ("p", "r"):
+        values = lists.get(key, [0.0] * M)
+        if len(values) != M:
+            raise ValueError(f"{key} needs one value per machine")
+        lists[key] = values
+
+    if any(p > 0 and r <= 0 for p, r in zip(lists["p"], lists["r"])):
+        raise ValueError("Machines that fail need a positive repair rate")
+
+    return {"name": str(config.get("name", "")),
+            "backend": config.get("backend") or None,
+            "mu": lists["mu"],
+            "p": lists["p"],
+            "r": lists["r"],
+            "C": [int(c) for c in lists["C"]],
+            "sim_duration": float(config.get("sim_duration") or 10000),
+            "seed": int(config.get("seed") or 4711)}
+
+
+def is_reliable(line: dict) -> bool:
+    return not any(line["p"])
+
+
+def ctmc_states(line: dict) -> int:
+    """
+    Number of states of the exact model of UnreliableProductionLineCTMC.
+    """
+    states = 2 ** sum(p > 0 for p in line["p"])
+    for C in line["C"]:
+        states *= C + 3
+
+    return states
+
+
+def choose_backend(line: dict) -> str:
+    """
+    Closed forms for two machines, the exact CTMC for small unreliable
+    lines and decompositions otherwise.
+    """
+    if len(line["mu"]) == 2:
+        return "closed_form"
+    if not is_reliable(line) and ctmc_states(line) <= CTMC_STATE_LIMIT:
+        return "ctmc"
+
+    return "decomposition"
+
+
+def simulation_error(line: dict, sim_duration: float) -> float:
+    """
+    Expected relative half-width of the confidence interval of the simulated
+    throughput after sim_duration, from the most variable machine on its
+    own: a machine producing at rate mu while up, with exponential up and
+    down times of rates p and r, has availability A = r / (p + r) and an
+    asymptotic variance of its output per time of
+    mu A + 2 mu^2 p r / (p + r)^3. Buffers only smooth the output of the
+    line, so the error is rather too large.
+    """
+    z = statistics.NormalDist().inv_cdf((1 + CONFIDENCE) / 2)
+    worst = 0.0
+    for mu, p, r in zip(line["mu"], line["p"], line["r"]):
+        A = r / (p + r) if p > 0 else 1.0
+        variance = mu * A + (2 * mu**2 * p * r / (p + r)**3 if p > 0 else 0.0)
+        worst = max(worst, variance / (mu * A)**2)
+
+    return z * (worst / sim_duration) ** 0.5
+
+
+def _simulation_duration(line, tolerance):
+    # Duration for simulation_error = tolerance, but at least ten up and
+    # down cycles of every machine that fails
+    error = simulation_error(line, 1.0)
+    cycles = [1/p + 1/r for p, r in zip(line["p"], line["r"]) if p > 0]
+
+    return max((error / tolerance) ** 2, 10 * max(cycles, default=0.0), 100.0)
+
+
+def estimate_backends(line: dict, tolerance: float = 0.01) -> dict:
+    """
+    Expected relative throughput error and run time in seconds of every
+    backend applicable to a line of parse_config, as dicts with error and
+    time; the simulation also gets the sim_duration needed for tolerance.
+    The costs grow with the levels of a two-machine line, the states of
+    the CTMC, M^3 (C + 10) for the decompositions (iterations times the
+    two-machine lines) and the events of the simulation.
+    """
+    M = len(line["mu"])
+    C = sum(line["C"]) / len(line["C"])
+    estimates = {}
+
+    if M == 2:
+        levels = line["C"][0] + 3 if not is_reliable(line) else 1
+        estimates["closed_form"] = {"error": EXACT_ERROR,
+                                    "time": SECONDS_PER_UNIT["closed_form"] * levels}
+
+    # Two machines have the closed forms; the iterative solve of their
+    # CTMC does not converge for long buffers
+    states = ctmc_states(line)
+    if M > 2 and states <= CTMC_STATE_LIMIT:
+        estimates["ctmc"] = {"error": EXACT_ERROR,
+                             "time": SECONDS_PER_UNIT["ctmc"] * states**1.2}
+
+    kind = "reliable" if is_reliable(line) else "unreliable"
+    work = M**3 * (C + 10)
+    estimates["decomposition"] = {"error": DECOMPOSITION_ERROR[kind],
+                                  "time": SECONDS_PER_UNIT["decomposition"] * work}
+
+    sim_duration = _simulation_duration(line, tolerance)
+    events = sim_duration * sum(line["mu"] + line["p"] + line["r"])
+    # The duration is chosen for the tolerance, up to rounding
+    error = min(tolerance, simulation_error(line, sim_duration))
+    estimates["simulation"] = {"error": error,
+                               "time": SECONDS_PER_UNIT["simulation"] * M * events,
+                               "sim_duration": sim_duration}
+
+    return estimates
+
+
+def select_backend(line: dict, tolerance: float = 0.01,
+                   time_budget: float = None) -> list:
+    """
+    Backends of estimate_backends in the order to try them, as tuples
+    (backend, reason, estimate). First come the ones expected to meet
+    tolerance within time_budget (seconds, None for no limit), cheapest
+    first. If there is none, the most accurate one within the budget, the
+    simulation shortened to the budget, and if nothing fits the budget the
+    fastest one.
+    """
+    estimates = estimate_backends(line, tolerance)
+    budget = float("inf") if time_budget is None else time_budget
+
+    def fits(name):
+        return estimates[name]["time"] <= budget
+
+    meeting = sorted((name for name in estimates
+                      if estimates[name]["error"] <= tolerance and fits(name)),
+                     key=lambda name: estimates[name]["time"])
+    ranked = [(name, f"cheapest backend expected to meet tolerance {tolerance:g}"
+                     if k == 0 else f"fallback expected to meet tolerance {tolerance:g}")
+              for k, name in enumerate(meeting)]
+
+    if not meeting:
+        simulation = estimates["simulation"]
+        if simulation["time"] > budget:
+            # As long a simulation as the budget allows
+            share = budget / simulation["time"]
+            simulation["sim_duration"] *= share
+            simulation["error"] /= share ** 0.5
+            simulation["time"] = budget
+
+        within = sorted((name for name in estimates if fits(name)),
+                        key=lambda name: estimates[name]["error"])
+        ranked = [(name, f"no backend is expected to meet tolerance {tolerance:g} "
+                         f"within {budget:g} s, most accurate within the budget")
+                  for name in within]
+        if not within:
+            fastest = min(estimates, key=lambda name: estimates[name]["time"])
+            ranked = [(fastest, f"no backend is expected to finish within {budget:g} s, "
+                                f"fastest")]
+
+    return [(name, reason, estimates[name]) for name, reason in ranked]
+
+
+def evaluate(line: dict, tolerance: float = 0.01, time_budget: float = None) -> dict:
+    """
+    KPIs of a configuration or line of parse_config with the backend of
+    select_backend, or the one of the configuration if it names one. A
+    backend that fails, e.g. an iterative solver that does not converge,
+    is followed by the next one. The result also holds the reason of the
+    choice, the expected relative throughput error and the failures
+    before, if any.
+    """
+    line = parse_config(line)
+    if line["backend"]:
+        result = evaluate_line(line, line["backend"])
+        result["reason"] = "backend of the configuration"
+        return result
+
+    failures = []
+    for backend, reason, estimate in select_backend(line, tolerance, time_budget):
+        if "sim_duration" in estimate:
+            line = dict(line, sim_duration=estimate["sim_duration"])
+        try:
+            result = evaluate_line(line, backend)
+        except Exception as error:
+            failures.append(f"{backend}: {error!r}")
+            continue
+
+        result["reason"] = reason
+        result["expected_error"] = estimate["error"]
+        if failures:
+            result["failures"] = failures
+        return result
+
+    raise RuntimeError("All backends failed: " + "; ".join(failures))
+
+
+def _closed_form(line):
+    if len(line["mu"]) != 2:
+        raise ValueError("Closed forms exist for two machines only")
+    (mu1, mu2), (C,) = line["mu"], line["C"]
+
+    if is_reliable(line):
+        from .decomposition.TwoMachineLineReliable2023 import kpis
+
+        TP, _, ps, pb, nb = (float(x) for x in kpis(mu1, mu2, C))
+        return {"TP": TP, "nb": [nb], "ps": [0.0, ps], "pb": [pb, 0.0]}
+
+    from .two_machines.both_unreliable.two_machines_reliable_analytical import throughput
+
+    # A machine that never fails gets a positive repair rate, which makes
+    # its down states transient instead of absorbing
+    p1, p2 = line["p"]
+    r1, r2 = (r if p > 0 else 1.0 for p, r in zip(line["p"], line["r"]))
+    TP, ps, pb = throughput(mu1, mu2, p1, p2, r1, r2, C, with_probabilities=True)
+
+    return {"TP": TP, "nb": None, "ps": [0.0, ps], "pb": [pb, 0.0]}
+
+
+def _ctmc(line):
+    from .n_machines.n_machines_unreliable.n_unreliable_machines_analytical import (
+        UnreliableProductionLineCTMC)
+
+    model = UnreliableProductionLineCTMC(mu=line["mu"], r=line["r"], p=line["p"],
+                                         C=line["C"])
+    model.determineSteadyStateProbabilities()
+    pb, ps = model.calc_blocking_starving()
+
+    return {"TP": float(model.calc_TH()[-1]),
+            "nb": [float(n) for n in model.calc_n_bar()],
+            "ps": [float(x) for x in ps],
+            "pb": [float(x) for x in pb]}
+
+
+def _decomposition(line):
+    M = len(line["mu"])
+    if is_reliable(line):
+        from .decomposition.N_MachineLineReliableDecomposition import (
+            N_MachineLineReliable)
+
+        model = N_MachineLineReliable(M, line["mu"], line["C"])
+    else:
+        from .decomposition.FluidDecomposition import N_MachineLineUnreliableFluid
+
+        model = N_MachineLineUnreliableFluid(M, line["mu"], line["p"], line["r"],
+                                             line["C"])
+    model.determineThroughputAndInventory()
+
+    # The virtual lines give the probabilities of the machines next to
+    # each buffer
+    return {"TP": float(model.TP[-1]),
+            "nb": [float(n) for n in model.nb],
+            "ps": [0.0] + [float(x) for x in model.ps],
+            "pb": [float(x) for x in model.pb] + [0.0]}
+
+
+def _simulation(line):
+    from .n_machines.n_machines_unreliable.n_unreliable_machines_numerical import (
+        UnreliableProductionLine)
+
+    # Machines that never fail get a negligible failure rate
+    p = np.maximum(line["p"], 1e-12)
+    r = np.where(np.asarray(line["p"]) > 0, line["r"], 1.0)
+    model = UnreliableProductionLine(mu=np.asarray(line["mu"]), r=r, p=p,
+                                     C=np.asarray(line["C"]))
+    th, _, avg_buffer = model.simulate(line["sim_duration"], seed=line["seed"])
+
+    return {"TP": float(th[-1]),
+            "nb": [float(n) for n in avg_buffer],
+            "ps": [float(x) for x in model.starving_prob],
+            "pb": [float(x) for x in model.blocking_prob]}
+
+
+# Backend name -> function of a parsed line returning TP, the average
+# buffer levels nb (None if the backend does not provide them) and the
+# starving and blocking probabilities ps and pb of every machine
+BACKENDS = {"closed_form": _closed_form,
+            "ctmc": _ctmc,
+            "decomposition": _decomposition,
+            "simulation": _simulation}
+
+
+def evaluate_config(config: dict, backend: str = None,
+                    tolerance: float = None, time_budget: float = None) -> dict:
+    """
+    KPIs of one configuration with the backend of the configuration, the
+    given one or the one of choose_backend, in that order. With a
+    tolerance, evaluate chooses instead of choose_backend. The result also
+    holds the name, the backend and the time taken.
+    """
+    line = parse_config(config)
+    if not (line["backend"] or backend) and tolerance is not None:
+        return evaluate(line, tolerance, time_budget)
+
+    return evaluate_line(line, line["backend"] or backend or choose_backend(line))
+
+
+def evaluate_line(line: dict, backend: str) -> dict:
+    """
+    KPIs of a line of parse_config with the given backend.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, use one of {sorted(BACKENDS)}")
+
+    start = time.perf_counter()
+    result = {"name": line["name"], "backend": backend}
+    result.update(BACKENDS[backend](line))
+    result["time"] = time.perf_counter() - start
+
+    return result
+
+
+def evaluate_configs(configs, backend: str = None,
+                     tolerance: float = None, time_budget: float = None):
+    """
+    Generator of the results of evaluate_config. A configuration that fails
+    gives a result with its name and the error instead of stopping the batch.
+    """
+    for config in configs:
+        try:
+            yield evaluate_config(config, backend, tolerance, time_budget)
+        except Exception as error:
+            yield {"name": str(config.get("name", "")), "error": repr(error)}
+
+
+def read_configs(filename: str):
+    """
+    Generator of the configurations in a JSON file (a list, or a dict with
+    the list under "lines"), a JSON lines file or a CSV or Parquet file
+    with one line per row. All but JSON files are read as they are
+    consumed. Parquet needs pyarrow.
+    """
+    if filename.endswith(".csv"):
+        with open(filename, newline="") as file:
+            yield from csv.DictReader(file)
+        return
+
+    if filename.endswith(".jsonl"):
+        with open(filename) as file:
+            yield from (json.loads(row) for row in file if row.strip())
+        return
+
+    if filename.endswith(".parquet"):
+        import pyarrow.parquet  # optional dependency
+
+        for batch in pyarrow.parquet.ParquetFile(filename).iter_batches():
+            yield from batch.to_pylist()
+        return
+
+    with open(filename) as file:
+        data = json.load(file)
+    yield from data["lines"] if isinstance(data, dict) else data
+
+
+RESULT_FIELDS = ["name", "backend", "TP", "nb", "ps", "pb", "time", "error",
+                 "reason", "expected_error", "failures"]
+
+
+def write_results(results, file, file_format: str = "jsonl"):
+    """
+    Write results to an open file as they come, as JSON lines or CSV with
+    lists joined by ';'. Returns the number of results.
+    """
+    count = 0
+    if file_format == "csv":
+        writer = csv.DictWriter(file, RESULT_FIELDS)
+        writer.writeheader()
+    for result in results:
+        if file_format == "csv":
+            writer.writerow({key: ";".join(map(str, value)) if isinstance(value, list)
+                             else value for key, value in result.items()})
+        else:
+            file.write(json.dumps(result) + "\n")
+        count += 1
+
+    return count
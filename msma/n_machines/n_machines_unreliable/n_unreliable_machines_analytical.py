@@ -0,0 +1,286 @@
+import time
+
+import numpy as np
+import scipy.sparse.linalg as spla
+
+
+class UnreliableProductionLineCTMC:
+    """
+    Exact CTMC model of an N-machine flow line with unreliable machines and
+    operation-dependent failures, the analytical counterpart of
+    UnreliableProductionLine.
+
+    The state is (b_1, ..., b_{N-1}, alpha_1, ..., alpha_N) with extended
+    buffer levels b_i in 0, ..., C_i + 2. Probabilities are kept as an array
+    with one axis per buffer and per machine, and the generator is never
+    stored: x Q is applied as a sum of shifted slices, one term per machine
+    and transition type. A machine with p = 0 is reliable and gets a single
+    state on its axis.
+    """
+    # Machine states
+    MACHINE_UP = 1
+    MACHINE_DOWN = 0
+
+    def __init__(self,
+                 mu: np.ndarray,
+                 r: np.ndarray,
+                 p: np.ndarray,
+                 C: np.ndarray,
+                 instrument: bool = False) -> None:
+        self.mu = np.asarray(mu, dtype=float)
+        self.r = np.asarray(r, dtype=float)
+        self.p = np.asarray(p, dtype=float)
+        self.C = np.asarray(C, dtype=int)
+        self.num_machines = len(self.mu)
+
+        if len(self.C) != self.num_machines - 1:
+            raise ValueError("Sizes of machine array and buffer array don't fit!")
+
+        # Index of the up state on each machine axis
+        self.up = np.where(self.p > 0, self.MACHINE_UP, 0)
+        self.shape = (tuple(self.C + 3)
+                      + tuple(np.where(self.p > 0, 2, 1)))
+        self.num_states = int(np.prod(self.shape))
+
+        # Collect sizes, products with Q and timings of the solves in stats
+        self.instrument = instrument
+        self.matvecs = 0
+
+        self.diag = self.apply_Q(np.ones(self.shape), diagonal_only=True)
+
+
+    def _machine_axis(self, n: int) -> int:
+        return self.num_machines - 1 + n
+
+
+    def _operating(self, n: int, up_shift: int = 0, dn_shift: int = 0) -> tuple:
+        """
+        Slice of all states in which machine n is up, neither starved nor
+        blocked. The shifts move the upstream/downstream buffer levels of
+        the slice, which gives the target states of a completion.
+        """
+        index = [slice(None)] * len(self.shape)
+
+        if n > 0:
+            index[n-1] = slice(1 + up_shift, self.shape[n-1] + up_shift)
+
+        if n < self.num_machines - 1:
+            index[n] = slice(dn_shift, self.shape[n] - 1 + dn_shift)
+
+        index[self._machine_axis(n)] = self.up[n]
+
+        return tuple(index)
+
+
+    def _with_machine_state(self, index: tuple, n: int, state: int) -> tuple:
+        index = list(index)
+        index[self._machine_axis(n)] = state
+
+        return tuple(index)
+
+
+    def apply_Q(self, x: np.ndarray, diagonal_only: bool = False) -> np.ndarray:
+        """
+        Return x Q for a probability array x of shape self.shape. With
+        diagonal_only, only the outflow terms are accumulated, so that
+        apply_Q(ones) is the diagonal of Q.
+        """
+        y = np.zeros(self.shape)
+
+        for n in range(self.num_machines):
+            operating = self._operating(n)
+
+            # Process step completed
+            flow = self.mu[n] * x[operating]
+            y[operating] -= flow
+            if not diagonal_only:
+                y[self._operating(n, up_shift=-1, dn_shift=1)] += flow
+
+            if self.p[n] > 0:
+                # Machine failure, only if it can produce
+                flow = self.p[n] * x[operating]
+                y[operating] -= flow
+                if not diagonal_only:
+                    y[self._with_machine_state(operating, n, self.MACHINE_DOWN)] += flow
+
+                # Machine repair
+                down = self._with_machine_state((slice(None),) * len(self.shape),
+                                                n, self.MACHINE_DOWN)
+                flow = self.r[n] * x[down]
+                y[down] -= flow
+                if not diagonal_only:
+                    y[self._with_machine_state(down, n, self.MACHINE_UP)] += flow
+
+        return y
+
+
+    def _apply_Qmod(self, v: np.ndarray) -> np.ndarray:
+        if self.instrument:
+            self.matvecs += 1
+        # Like the two-machine classes: the last column of Q is replaced
+        # by ones, so the last equation is the normalization
+        y = self.apply_Q(v.reshape(self.shape)).ravel()
+        y[-1] = v.sum()
+
+        return y
+
+
+    def determineSteadyStateProbabilities(self,
+                                          method: str = "gmres",
+                                          tol: float = 1e-10,
+                                          maxiter: int = 10000,
+                                          restart: int = 50):
+        """
+        Solve pi Qmod = nmod without assembling Q.
+
+        Parameters
+        ----------
+        method : str, optional
+            "gmres" or "bicgstab" with a Jacobi preconditioner, or "power"
+            for the power method on the uniformized chain. Default is
+            "gmres".
+        tol : float, optional
+            Relative tolerance of the iterative solver. Default is 1e-10.
+        maxiter : int, optional
+            Maximum number of iterations. Default is 10000.
+        restart : int, optional
+            Number of Krylov vectors kept by GMRES. Default is 50.
+
+        Returns
+        -------
+        pi : numpy.ndarray
+            State probabilities of shape self.shape.
+        """
+        if self.instrument:
+            start = time.perf_counter()
+            self.matvecs = 0
+
+        nmod = np.zeros(self.num_states)
+        nmod[-1] = 1
+        x0 = np.full(self.num_states, 1 / self.num_states)
+
+        if method in ("gmres", "bicgstab"):
+            diag = self.diag.ravel().copy()
+            diag[-1] = 1
+
+            A = spla.LinearOperator((self.num_states, self.num_states),
+                                    matvec=self._apply_Qmod)
+            M = spla.LinearOperator((self.num_states, self.num_states),
+                                    matvec=lambda v: v / diag)
+
+            if method == "gmres":
+                pi, info = spla.gmres(A, nmod, x0=x0, rtol=tol, M=M,
+                                      restart=restart, maxiter=maxiter)
+            else:
+                pi, info = spla.bicgstab(A, nmod, x0=x0, rtol=tol, M=M,
+                                         maxiter=maxiter)
+
+            if info > 0:
+                raise RuntimeError(f"{method} did not converge in {info} iterations")
+
+        elif method == "power":
+            uniformization_rate = 1.01 * np.abs(self.diag).max()
+            pi = x0
+
+            for k in range(maxiter):
+                piQ = self.apply_Q(pi.reshape(self.shape)).ravel()
+                if self.instrument:
+                    self.matvecs += 1
+                pi = pi + piQ / uniformization_rate
+
+                if np.abs(piQ).max() < tol * uniformization_rate * pi.max():
+                    break
+            else:
+                raise RuntimeError(f"power method did not converge in {maxiter} iterations")
+
+        else:
+            raise ValueError("method must be 'gmres', 'bicgstab' or 'power'")
+
+        # Checks as in stationary.diagnostics: the normalization error and
+        # negative mass of the iterate, the residual of the returned pi
+        normalization_error = float(abs(pi.sum() - 1))
+        negative_mass = float(max(0.0, -pi[pi < 0].sum()))
+
+        pi = np.clip(pi, 0, None)
+        self.pi = (pi / pi.sum()).reshape(self.shape)
+
+        residual = float(np.abs(self.apply_Q(self.pi)).max() / np.abs(self.diag).max())
+        self.diagnostics = {"residual": residual,
+                            "normalization_error": normalization_error,
+                            "negative_mass": negative_mass,
+                            "method": method,
+                            "clipped_mass": negative_mass,
+                            "accepted": residual <= tol}
+
+        if self.instrument:
+            self.stats = {"states": self.num_states,
+                          "method": method,
+                          "matvecs": self.matvecs,
+                          "solve_time": time.perf_counter() - start}
+
+        return self.pi
+
+
+    def calc_TH(self) -> np.ndarray:
+        """
+        Throughput of every machine.
+        """
+        return np.array([self.mu[n] * self.pi[self._operating(n)].sum()
+                         for n in range(self.num_machines)])
+
+
+    def buffer_distribution(self, i: int) -> np.ndarray:
+        """
+        Marginal distribution of the extended level of buffer i.
+        """
+        axes = tuple(a for a in range(len(self.shape)) if a != i)
+
+        return self.pi.sum(axis=axes)
+
+
+    def calc_n_bar(self) -> np.ndarray:
+        """
+        Average extended level of every buffer.
+        """
+        return np.array([np.arange(self.C[i] + 3) @ self.buffer_distribution(i)
+                         for i in range(self.num_machines - 1)])
+
+
+    def calc_blocking_starving(self) -> tuple:
+        """
+        Probabilities that a machine is up and blocked, and that it is up
+        and starved.
+        """
+        pb = np.zeros(self.num_machines)
+        ps = np.zeros(self.num_machines)
+        full = [slice(None)] * len(self.shape)
+
+        for n in range(self.num_machines):
+            if n < self.num_machines - 1:
+                index = list(self._with_machine_state(full, n, self.up[n]))
+                index[n] = -1
+                pb[n] = self.pi[tuple(index)].sum()
+
+            if n > 0:
+                index = list(self._with_machine_state(full, n, self.up[n]))
+                index[n-1] = 0
+                ps[n] = self.pi[tuple(index)].sum()
+
+        return pb, ps
+
+
+if __name__ == "__main__":
+    mu = np.array([1, 1.2, 1.1])  # processing rates
+    p = np.array([0.01, 0.02, 0.01])  # failure rates
+    r = np.array([0.1, 0.2, 0.1])  # repair rates
+    C = np.array([30, 30], dtype=int)
+
+    line = UnreliableProductionLineCTMC(mu=mu, r=r, p=p, C=C)
+    print("Number of states:", line.num_states)
+
+    start = time.perf_counter()
+    line.determineSteadyStateProbabilities()
+    print("Solved in", time.perf_counter() - start, "s")
+
+    print("Throughput per machine:", line.calc_TH())
+    print("Average buffer levels:", line.calc_n_bar())
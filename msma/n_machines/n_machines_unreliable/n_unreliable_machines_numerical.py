@@ -0,0 +1,841 @@
+import numpy as np
+import tempfile
+import time
+
+from ...phase_type import as_phase_type
+
+
+class TimeSeriesRecorder:
+    """
+    Records the buffer levels and machine states of a simulation every
+    interval time units after the warm-up, into storage preallocated for
+    capacity samples. Once the storage is full, the oldest samples are
+    overwritten (ring buffer), so a long run keeps its last capacity
+    samples. With a filename, the storage is a NumPy .npy file opened as
+    memory map, which can be reopened with np.load(filename, mmap_mode="r").
+
+    Every sample is a row (time, levels of all buffers, states of all
+    machines). During a tau-leap, levels are interpolated linearly.
+    """
+    def __init__(self,
+                 interval: float,
+                 capacity: int,
+                 filename: str = None) -> None:
+        self.interval = interval
+        self.capacity = capacity
+        self.filename = filename
+        self.data = None
+
+    def start(self, num_machines: int):
+        shape = (self.capacity, 1 + (num_machines - 1) + num_machines)
+        if self.filename is None:
+            self.data = np.zeros(shape)
+        else:
+            self.data = np.lib.format.open_memmap(self.filename, mode="w+",
+                                                  dtype=float, shape=shape)
+        self.num_machines = num_machines
+        self.count = 0
+
+    def record(self, t_start, t_end, levels, states, end_levels=None):
+        # Samples at the multiples of interval within [t_start, t_end)
+        while self.count * self.interval < t_end:
+            t = self.count * self.interval
+            row = self.data[self.count % self.capacity]
+            row[0] = t
+            if end_levels is None:
+                row[1:self.num_machines] = levels
+            else:
+                share = (t - t_start) / (t_end - t_start)
+                row[1:self.num_machines] = np.round(
+                    np.add(levels, share * np.subtract(end_levels, levels)))
+            row[self.num_machines:] = states
+            self.count += 1
+
+    def values(self):
+        """
+        The recorded samples in chronological order.
+        """
+        if self.count <= self.capacity:
+            return self.data[:self.count]
+
+        position = self.count % self.capacity
+        return np.concatenate((self.data[position:], self.data[:position]))
+
+
+class UnreliableProductionLine:
+    # Definition of codes for events
+    PROCESS_STEP_COMPLETED = 1
+    MACHINE_FAILURE = 2
+    MACHINE_REPAIR = 3
+    PHASE_CHANGE = 4  # a phase-type time moved to its next phase
+
+    # Machine states
+    MACHINE_UP = 1
+    MACHINE_DOWN = 0
+
+    # Fewest expected events for which simulate_leaping takes a leap
+    LEAP_MIN_EVENTS = 10
+
+    # Part of cache keys, increase if the results for a seed change
+    ENGINE_VERSION = "1"
+
+
+    def __init__(self, 
+                 mu: np.ndarray, 
+                 r: np.ndarray, 
+                 p: np.ndarray, 
+                 C: np.ndarray,
+                 instrument: bool = False,
+                 process: list = None,
+                 uptime: list = None,
+                 repair: list = None,
+                 servers: np.ndarray = None,
+                 batch: np.ndarray = None) -> None:
+        self.mu = mu
+        self.r = r
+        self.p = p
+        self.C = C
+        self.num_machines = len(self.mu)
+
+        # Optional number of identical parallel machines per station and
+        # number of parts per batch. Every machine processes a batch at rate
+        # mu, fails at rate p while busy and is repaired at rate r, so the
+        # rates of a station scale with its busy and down machines, and
+        # machine_states holds the number of machines up of every station.
+        self.servers = np.ones(self.num_machines, dtype=int) if servers is None else np.asarray(servers, dtype=int)
+        self.batch = np.ones(self.num_machines, dtype=int) if batch is None else np.asarray(batch, dtype=int)
+        if len(self.servers) != self.num_machines or len(self.batch) != self.num_machines:
+            raise ValueError("Give one number of servers and one batch size per machine!")
+        if np.any(self.servers < 1) or np.any(self.batch < 1):
+            raise ValueError("Stations need at least one machine and batches one part!")
+        self.parallel = bool(np.any(self.servers > 1) or np.any(self.batch > 1))
+
+        # With instrument, a run collects events, events per second, random
+        # draws and the time per phase of the event loop in stats
+        self.instrument = instrument
+
+        # Optional phase-type processing times, times to failure and repair
+        # times, one PhaseType or None (exponential with mu, p or r) per
+        # machine. The phases are memoryless, so the event loop stays a
+        # CTMC simulation.
+        self.process = self._distributions(process)
+        self.uptime = self._distributions(uptime)
+        self.repair = self._distributions(repair)
+        self.phase_types = any(d is not None
+                               for d in self.process + self.uptime + self.repair)
+        if self.phase_types and np.any(self.servers > 1):
+            raise ValueError("Phase-type times need one machine per station!")
+
+
+    def capacities(self) -> list:
+        """
+        Extended buffer sizes: the buffer plus the batches in the machines
+        next to it, C + 2 for single machines and parts.
+        """
+        held = self.batch * self.servers
+
+        return [int(self.C[i] + held[i] + held[i+1]) for i in range(self.num_machines - 1)]
+
+
+    def _distributions(self, distributions):
+        if distributions is None:
+            return [None] * self.num_machines
+        if len(distributions) != self.num_machines:
+            raise ValueError("Give one distribution or None per machine!")
+
+        return [as_phase_type(d) for d in distributions]
+
+
+    def simulate(self, 
+                 sim_duration: int, 
+                 seed: int = 4711,
+                 leap_condition: float = None,
+                 record_machine_states: bool = False,
+                 recorder: TimeSeriesRecorder = None):
+        # With a leap condition, use the hybrid tau-leaping engine
+        if leap_condition is not None:
+            return self.simulate_leaping(sim_duration, seed, leap_condition,
+                                         record_machine_states, recorder)
+
+        # The aggregates are computed by the default consumer of the events
+        statistics = SimulationStatistics(self, record_machine_states, recorder)
+        self._store_statistics(statistics.consume(self.events(sim_duration, seed)))
+
+        return self.th, self.parts_processed, self.avg_buffer_level
+
+
+    def events(self,
+               sim_duration: int,
+               seed: int = 4711):
+        """
+        Generator of the events of a simulation run, starting with the
+        warm-up at time -sim_duration/10. Yields (time, machine, event type,
+        buffer levels) after every event. The buffer levels are the array
+        ext_buffer_level, which is updated in place, so consumers that keep
+        it must copy it.
+        """
+        # Initialize the random number generator with a given seed.
+        rng = np.random.default_rng(seed)
+
+        if len(self.C) != self.num_machines - 1:
+            raise ValueError("Sizes of machine array and buffer array don't fit!")
+
+        trans_time = sim_duration/10
+
+        # Initialize the state variables
+        self.ext_buffer_level = np.zeros(self.num_machines - 1, 
+                                    dtype=int)
+        self.time_until_next_part = np.zeros(self.num_machines, 
+                                        dtype=float)
+        
+        # Number of machines up per station, 1 (MACHINE_UP) or 0 (MACHINE_DOWN)
+        # for single machines
+        self.machine_states = self.servers.copy()
+        self.capacity = self.capacities()
+        
+        # Time until the next failure of a busy machine and until the next
+        # repair of a machine that is down
+        self.time_until_state_change = np.zeros(self.num_machines, 
+                                            dtype=float)
+        self.time_until_repair = np.full(self.num_machines, np.inf)
+
+        # Current phases of the phase-type times; exponential times have
+        # only phase 0 and draw no random numbers for it
+        process, uptime, repair = self.process, self.uptime, self.repair
+        self.process_phase = [0 if d is None else d.start(rng) for d in process]
+        self.uptime_phase = [0 if d is None else d.start(rng) for d in uptime]
+        self.repair_phase = [0] * self.num_machines
+
+        # Processing time of the first workpiece on the first machine ( offset 0 )
+        busy = self.busy_machines(0)
+        mu = self.mu[0] if process[0] is None else process[0].rates[self.process_phase[0]]
+        self.time_until_next_part[0] = rng.exponential(1/(busy*mu))
+
+        # Initialize the other machines with plus infinity
+        self.time_until_next_part[1:] = np.inf
+        
+        p = self.p[0] if uptime[0] is None else uptime[0].rates[self.uptime_phase[0]]
+        self.time_until_state_change[0] = rng.exponential(1/(busy*p))
+        self.time_until_state_change[1:] = np.inf
+
+        instrument = self.instrument
+        if instrument:
+            clock = time.perf_counter
+            start = clock()
+            timers = {"event_selection": 0.0,
+                      "event_execution": 0.0,
+                      "rescheduling": 0.0}
+            events = 0
+            rng_draws = 2
+
+        # Start simulation of this Markovian system
+        sim_clock = -trans_time
+
+        while sim_clock < sim_duration:
+            if instrument:
+                t0 = clock()
+
+            time_until_next_event = np.inf
+            next_machine = np.inf
+
+            # Choose initial event which does not exist
+            next_event_type = 0
+
+            # Get production ready machine 
+            # with smallest time until next part
+            # and smallest time until state change
+            # (machines that are not ready have no next part)
+            for n in range(self.num_machines):
+                if self.time_until_next_part[n] < time_until_next_event:
+                    time_until_next_event = self.time_until_next_part[n]
+                    next_machine = n 
+                    next_event_type = self.PROCESS_STEP_COMPLETED
+
+                if self.time_until_state_change[n] < time_until_next_event:
+                    time_until_next_event = self.time_until_state_change[n]
+                    next_machine = n
+                    next_event_type = self.MACHINE_FAILURE     
+
+                if self.time_until_repair[n] < time_until_next_event:
+                    time_until_next_event = self.time_until_repair[n]
+                    next_machine = n
+                    next_event_type = self.MACHINE_REPAIR
+
+            if instrument:
+                t1 = clock()
+                timers["event_selection"] += t1 - t0
+
+            # Advance in time
+            sim_clock += time_until_next_event
+
+            # A phase-type time may only move on to its next phase
+            if self.phase_types:
+                next_event_type = self._advance_phase(next_machine, next_event_type, rng)
+
+            # Execute the next event
+            if next_event_type == self.PROCESS_STEP_COMPLETED:
+                parts = self.batch[next_machine]
+                if next_machine == 0:
+                    self.ext_buffer_level[next_machine] += parts
+
+                elif next_machine == self.num_machines - 1:
+                    self.ext_buffer_level[next_machine - 1] -= parts
+                    
+                else:
+                    self.ext_buffer_level[next_machine - 1] -= parts
+                    self.ext_buffer_level[next_machine] += parts
+
+            elif next_event_type == self.MACHINE_FAILURE:
+                self.machine_states[next_machine] -= 1
+
+            elif next_event_type == self.MACHINE_REPAIR:
+                self.machine_states[next_machine] += 1
+
+            if instrument:
+                timers["event_execution"] += clock() - t1
+                events += 1
+
+            yield sim_clock, next_machine, next_event_type, self.ext_buffer_level
+
+            if instrument:
+                t3 = clock()
+
+            # Given the new state, and USING THE MEMORYLESSNESS PROPERTY, we update
+            # the times until the next events. Since it is a CTMC, we do not need an
+            # event calender. Phase-type times use the rate of their current phase,
+            # parallel machines add up their rates.
+            for n in range(self.num_machines):
+                busy = self.busy_machines(n)
+
+                # This is for machines that are neither blocked nor starved
+                if busy > 0:
+                    mu = self.mu[n] if process[n] is None else process[n].rates[self.process_phase[n]]
+                    p = self.p[n] if uptime[n] is None else uptime[n].rates[self.uptime_phase[n]]
+                    self.time_until_next_part[n] = rng.exponential(1/(busy*mu))
+                    self.time_until_state_change[n] = rng.exponential(1/(busy*p))
+
+                # This is for machines that are blocked, starved or down
+                else:
+                    self.time_until_next_part[n] = np.inf
+                    self.time_until_state_change[n] = np.inf
+
+                down = self.servers[n] - self.machine_states[n]
+                if down > 0:
+                    r = self.r[n] if repair[n] is None else repair[n].rates[self.repair_phase[n]]
+                    self.time_until_repair[n] = rng.exponential(1/(down*r))
+                else:
+                    self.time_until_repair[n] = np.inf
+
+            if instrument:
+                timers["rescheduling"] += clock() - t3
+                rng_draws += int(np.count_nonzero(self.time_until_next_part < np.inf)
+                                 + np.count_nonzero(self.time_until_state_change < np.inf)
+                                 + np.count_nonzero(self.time_until_repair < np.inf))
+
+        if instrument:
+            # The consumers of the events run between the phases
+            wall_time = clock() - start
+            timers["consumer"] = wall_time - sum(timers.values())
+            self.stats = {"events": events,
+                          "events_per_sec": events / wall_time,
+                          "rng_draws": rng_draws,
+                          "timers": timers,
+                          "wall_time": wall_time}
+
+
+    def _advance_phase(self, machine, event_type, rng):
+        # The clock of a time of machine fired: if the time is phase-type
+        # and does not end in this phase, it moves to its next phase.
+        # Otherwise the event happens and the next time starts its phases.
+        if event_type == self.PROCESS_STEP_COMPLETED:
+            ending, phases = self.process[machine], self.process_phase
+            starting, start_phases = self.process[machine], self.process_phase
+        elif event_type == self.MACHINE_FAILURE:
+            ending, phases = self.uptime[machine], self.uptime_phase
+            starting, start_phases = self.repair[machine], self.repair_phase
+        else:
+            ending, phases = self.repair[machine], self.repair_phase
+            starting, start_phases = self.uptime[machine], self.uptime_phase
+
+        if ending is not None:
+            phase = ending.next_phase(phases[machine], rng)
+            if phase >= 0:
+                phases[machine] = phase
+                return self.PHASE_CHANGE
+
+        if starting is not None:
+            start_phases[machine] = starting.start(rng)
+
+        return event_type
+
+
+    def event_batches(self,
+                      sim_duration: int,
+                      seed: int = 4711,
+                      batch_size: int = 4096):
+        """
+        The events of events() as NumPy record arrays of batch_size events
+        (the last one may be shorter) with the fields time, machine, event
+        and buffer (levels after the event).
+        """
+        dtype = np.dtype([("time", float),
+                          ("machine", int),
+                          ("event", np.int8),
+                          ("buffer", int, (self.num_machines - 1,))])
+
+        batch = np.zeros(batch_size, dtype=dtype)
+        k = 0
+        for event in self.events(sim_duration, seed):
+            batch[k] = event
+            k += 1
+            if k == batch_size:
+                yield batch
+                batch = np.zeros(batch_size, dtype=dtype)
+                k = 0
+
+        if k > 0:
+            yield batch[:k]
+
+
+    def _store_statistics(self,
+                          statistics: "SimulationStatistics"):
+        self.statistics = statistics
+        self.th = statistics.th
+        self.parts_processed = statistics.parts_processed
+        self.avg_buffer_level = statistics.avg_buffer_level
+        self.buffer_distribution = statistics.buffer_distribution
+        self.starving_prob = statistics.starving_prob
+        self.blocking_prob = statistics.blocking_prob
+        self.machine_state_prob = statistics.machine_state_prob
+
+
+    def simulate_leaping(self,
+                         sim_duration: int,
+                         seed: int = 4711,
+                         leap_condition: float = 0.03,
+                         record_machine_states: bool = False,
+                         recorder: TimeSeriesRecorder = None):
+        """
+        Hybrid simulation which advances in tau-leaps while all buffers are
+        far from their bounds, and event by event otherwise.
+
+        As long as no buffer reaches 0 or C+2 and no machine fails or gets
+        repaired, the completions of every machine form a Poisson process,
+        so a leap of length tau draws the number of completions per machine
+        from a Poisson distribution. The leap length is chosen such that the
+        mean and the standard deviation of the change of every buffer level
+        stay below leap_condition times the distance of the buffer to its
+        nearest bound, and leaps end at the next failure or repair. Leaps
+        that would push a buffer beyond its bounds, or that would cover
+        fewer than LEAP_MIN_EVENTS events, are replaced by an exact step.
+        Smaller values of leap_condition mean smaller errors and fewer
+        leaps.
+
+        Returns the same results as simulate. The number of leaps and exact
+        steps is stored in leaps and exact_steps.
+        """
+        rng = np.random.default_rng(seed)
+
+        if len(self.C) != self.num_machines - 1:
+            raise ValueError("Sizes of machine array and buffer array don't fit!")
+        if self.phase_types or self.parallel:
+            raise ValueError("Tau-leaping needs single machines with exponential "
+                             "times, simulate without leap_condition")
+
+        M = self.num_machines
+        mu = [float(x) for x in self.mu]
+        p = [float(x) for x in self.p]
+        r = [float(x) for x in self.r]
+        N = [int(x) + 2 for x in self.C]
+
+        trans_time = sim_duration/10
+
+        # Initialize the state variables. Scalar Python lists keep the exact
+        # steps cheap, random numbers are drawn in blocks.
+        level = [0] * (M - 1)
+        up = [True] * M
+        self.leaps = 0
+        self.exact_steps = 0
+        statistics = SimulationStatistics(self, record_machine_states, recorder)
+
+        block = 4096
+        exponentials, uniforms, k = None, None, block
+
+        instrument = self.instrument
+        if instrument:
+            start = time.perf_counter()
+            rng_draws = 0
+
+        sim_clock = -trans_time
+        while sim_clock < sim_duration:
+            # Statistics are collected from time 0 on, so no step crosses it
+            phase_end = 0 if sim_clock < 0 else sim_duration
+            horizon = phase_end - sim_clock
+            counting = sim_clock >= 0
+
+            ready = [up[n]
+                     and (n == 0 or level[n-1] > 0)
+                     and (n == M - 1 or level[n] < N[n])
+                     for n in range(M)]
+            completion_rates = [mu[n] if ready[n] else 0.0 for n in range(M)]
+            change_rates = [p[n] if ready[n] else (0.0 if up[n] else r[n])
+                            for n in range(M)]
+
+            # Leap condition on the mean and standard deviation of the
+            # change of every buffer level
+            tau = horizon
+            for i in range(M - 1):
+                variance = completion_rates[i] + completion_rates[i+1]
+                if variance > 0:
+                    distance = leap_condition * min(level[i], N[i] - level[i])
+                    drift = abs(completion_rates[i] - completion_rates[i+1])
+                    tau = min(tau, distance * distance / variance)
+                    if drift > 0:
+                        tau = min(tau, distance / drift)
+
+            completion_rate = sum(completion_rates)
+            change_rate = sum(change_rates)
+
+            if completion_rate * tau >= self.LEAP_MIN_EVENTS:
+                time_until_change = (rng.exponential(1/change_rate)
+                                     if change_rate > 0 else np.inf)
+                tau = min(tau, time_until_change)
+
+                completed = rng.poisson(np.array(completion_rates) * tau).tolist()
+                if instrument:
+                    rng_draws += M + (change_rate > 0)
+                new_level = [level[i] + completed[i] - completed[i+1]
+                             for i in range(M - 1)]
+
+                if all(0 <= new_level[i] <= N[i] for i in range(M - 1)):
+                    self.leaps += 1
+                    if counting:
+                        statistics.parts_processed += completed
+                        statistics.record(sim_clock + tau, tau, level, up,
+                                          end_levels=new_level)
+
+                    level = new_level
+                    sim_clock += tau
+
+                    # The leap ends with a failure or repair
+                    if tau == time_until_change:
+                        u = rng.random() * change_rate
+                        if instrument:
+                            rng_draws += 1
+                        n = 0
+                        while n < M - 1 and u >= change_rates[n]:
+                            u -= change_rates[n]
+                            n += 1
+                        up[n] = not up[n]
+
+                    continue
+
+            # Exact step, using the memorylessness of all events
+            self.exact_steps += 1
+            if k == block:
+                exponentials = rng.standard_exponential(block).tolist()
+                uniforms = rng.random(block).tolist()
+                k = 0
+                if instrument:
+                    rng_draws += 2 * block
+
+            total_rate = completion_rate + change_rate
+            time_until_next_event = exponentials[k] / total_rate
+            u = uniforms[k] * total_rate
+            k += 1
+
+            if time_until_next_event >= horizon:
+                if counting:
+                    statistics.record(phase_end, horizon, level, up)
+                sim_clock = phase_end
+                continue
+
+            if counting:
+                statistics.record(sim_clock + time_until_next_event,
+                                  time_until_next_event, level, up)
+            sim_clock += time_until_next_event
+
+            if u < completion_rate:
+                n = 0
+                while n < M - 1 and u >= completion_rates[n]:
+                    u -= completion_rates[n]
+                    n += 1
+                if n > 0:
+                    level[n-1] -= 1
+                if n < M - 1:
+                    level[n] += 1
+                if counting:
+                    statistics.parts_processed[n] += 1
+            else:
+                u -= completion_rate
+                n = 0
+                while n < M - 1 and u >= change_rates[n]:
+                    u -= change_rates[n]
+                    n += 1
+                up[n] = not up[n]
+
+        self.ext_buffer_level = np.array(level)
+        self.machine_states = np.where(up, self.MACHINE_UP, self.MACHINE_DOWN)
+        self._store_statistics(statistics.finish())
+
+        if instrument:
+            wall_time = time.perf_counter() - start
+            events = self.leaps + self.exact_steps
+            self.stats = {"events": events,
+                          "events_per_sec": events / wall_time,
+                          "leaps": self.leaps,
+                          "exact_steps": self.exact_steps,
+                          "rng_draws": rng_draws,
+                          "wall_time": wall_time}
+
+        return self.th, self.parts_processed, self.avg_buffer_level
+
+
+    def busy_machines(self,
+                      machine_num: int) -> int:
+        # Machines up that have a batch of parts upstream and space for it
+        # downstream
+        busy = self.machine_states[machine_num]
+        if busy == 0:
+            return 0
+
+        parts = self.batch[machine_num]
+        if machine_num > 0:
+            available = self.ext_buffer_level[machine_num - 1] // parts
+            if available < busy:
+                busy = available
+
+        if machine_num < self.num_machines - 1:
+            space = (self.capacity[machine_num] - self.ext_buffer_level[machine_num]) // parts
+            if space < busy:
+                busy = space
+
+        return busy
+
+
+    def is_prod_ready(self, 
+                      machine_num: int):
+        return self.busy_machines(machine_num) > 0
+            
+        
+    def simulate_M(self,
+                   sim_duration: int,
+                   M: int,
+                   leap_condition: float = None,
+                   cache=None,
+                   seed: int = 4711) -> tuple:
+        th_m = []
+        # M different seeds of the runs, reproducible from seed
+        seeds = np.random.default_rng(seed).choice(10000, M, replace=False).tolist()
+        buffer_m = []
+
+        # With a cache, e.g. a ResultCache, a study with the same parameters
+        # and seeds is loaded instead of simulated
+        if cache is not None:
+            parameters = {"mu": self.mu, "r": self.r, "p": self.p, "C": self.C,
+                          "sim_duration": sim_duration,
+                          "leap_condition": leap_condition}
+            if self.parallel:
+                parameters.update({"servers": self.servers, "batch": self.batch})
+            if self.phase_types:
+                parameters.update(
+                    {name: [None if d is None else d.parameters() for d in distributions]
+                     for name, distributions in [("process", self.process),
+                                                 ("uptime", self.uptime),
+                                                 ("repair", self.repair)]})
+            key = cache.key(type(self), parameters, self.ENGINE_VERSION, seeds)
+            cached = cache.get(key)
+            if cached is not None:
+                return list(cached["th"]), list(cached["buffer"])
+
+        for m in range(M):
+            th, _, avg_buffer = self.simulate(sim_duration=sim_duration,
+                               seed=seeds[m],
+                               leap_condition=leap_condition)
+
+            th_m.append(th[0])
+            buffer_m.append(avg_buffer)
+
+        if cache is not None:
+            cache.put(key, {"th": th_m, "buffer": buffer_m})
+
+        return th_m, buffer_m
+
+
+class SimulationStatistics:
+    """
+    Default consumer of the event stream of UnreliableProductionLine. From
+    time 0 on, i.e. after the warm-up, it accumulates the processed parts,
+    the time-weighted histogram of every buffer level (O(sum C) memory),
+    the time in which a machine is up but starved or blocked, optionally
+    the time in the joint states of all machines (2**num_machines entries
+    for single machines), and feeds an optional TimeSeriesRecorder. A
+    station of parallel machines counts as starved (blocked) while some of
+    its machines up lack a batch of parts (space for a batch).
+
+    Consumers can be chained, observe passes the events on:
+
+        statistics = SimulationStatistics(line)
+        for event in statistics.observe(line.events(sim_duration)):
+            ...
+    """
+    def __init__(self,
+                 line: UnreliableProductionLine,
+                 record_machine_states: bool = False,
+                 recorder: TimeSeriesRecorder = None) -> None:
+        M = line.num_machines
+        self.num_machines = M
+        self.C = [int(c) for c in line.C]
+        self.capacity = line.capacities()
+        self.servers = [int(k) for k in line.servers]
+        self.batch = [int(b) for b in line.batch]
+
+        # State held since the last event
+        self.time = -np.inf
+        self.levels = np.zeros(M - 1, dtype=int)
+        self.states = np.array(self.servers)
+
+        self.parts_processed = np.zeros(M, dtype=int)
+        self.buffer_area = np.zeros(M - 1)
+        self.buffer_time = [np.zeros(N + 1) for N in self.capacity]
+        self.starving_time = np.zeros(M)
+        self.blocking_time = np.zeros(M)
+        self.state_time = (np.zeros(int(np.prod(np.add(self.servers, 1))))
+                           if record_machine_states else None)
+        self.recorded_time = 0.0
+
+        self.recorder = recorder
+        if recorder is not None:
+            recorder.start(M)
+
+    def update(self, time, machine, event_type, levels):
+        if time > 0:
+            self.record(time, time - max(self.time, 0), self.levels, self.states)
+            if event_type == UnreliableProductionLine.PROCESS_STEP_COMPLETED:
+                self.parts_processed[machine] += self.batch[machine]
+
+        self.time = time
+        self.levels[:] = levels
+        if event_type == UnreliableProductionLine.MACHINE_FAILURE:
+            self.states[machine] -= 1
+        elif event_type == UnreliableProductionLine.MACHINE_REPAIR:
+            self.states[machine] += 1
+
+    def observe(self, events):
+        for event in events:
+            self.update(*event)
+            yield event
+
+    def consume(self, events):
+        for event in events:
+            self.update(*event)
+
+        return self.finish()
+
+    def record(self, t, dt, levels, states, end_levels=None):
+        # Statistics of the state held during [t - dt, t). During a leap,
+        # the levels move from levels to end_levels, and the time is spread
+        # evenly over the levels in between.
+        M = self.num_machines
+        self.recorded_time += dt
+
+        if end_levels is None:
+            for i in range(M - 1):
+                self.buffer_area[i] += levels[i] * dt
+                self.buffer_time[i][levels[i]] += dt
+        else:
+            for i in range(M - 1):
+                self.buffer_area[i] += (levels[i] + end_levels[i]) / 2 * dt
+                low, high = sorted((levels[i], end_levels[i]))
+                self.buffer_time[i][low:high+1] += dt / (high - low + 1)
+
+        for n in range(M):
+            if states[n] > 0:
+                if n > 0 and levels[n-1] // self.batch[n] < states[n]:
+                    self.starving_time[n] += dt
+                elif n < M - 1 and (self.capacity[n] - levels[n]) // self.batch[n] < states[n]:
+                    self.blocking_time[n] += dt
+
+        if self.state_time is not None:
+            index = 0
+            for n in range(M):
+                index = (self.servers[n] + 1) * index + int(states[n])
+            self.state_time[index] += dt
+
+        if self.recorder is not None:
+            self.recorder.record(t - dt, t, levels, states, end_levels)
+
+    def finish(self):
+        # Throughput and average level of every buffer, distribution of
+        # every buffer level (like pi_hat of two_rel_machines), probabilities
+        # that a machine is up but starved or blocked, and optionally of the
+        # joint machine states, indexed [machines up of station 0, ..., N-1]
+        self.th = self.parts_processed / self.recorded_time
+        self.avg_buffer_level = self.buffer_area / self.recorded_time
+        self.buffer_distribution = [h / self.recorded_time for h in self.buffer_time]
+        self.starving_prob = self.starving_time / self.recorded_time
+        self.blocking_prob = self.blocking_time / self.recorded_time
+        self.machine_state_prob = (
+            self.state_time.reshape([k + 1 for k in self.servers]) / self.recorded_time
+            if self.state_time is not None else None)
+
+        return self
+
+
+def mean_confidence_interval(data, alpha=0.05):
+    import scipy.stats  # slow to import, only needed here
+
+    a = 1.0 * np.array(data)
+    n = len(a)
+    m, se = np.mean(a), scipy.stats.sem(a, ddof=1)
+    h = se * scipy.stats.t.ppf(1-alpha/2., n-1)
+    return m, (m-h, m+h)
+
+
+if __name__ == "__main__":
+    mu = np.array([1, 8]) # processing rates
+    p  = np.array([0.1, 0.001]) # failure rates
+    r  = np.array([0.2, 10]) # repair rates
+        
+    # Size of buffers between machines
+    C = np.array([200], dtype=int)
+
+    # Time to be simulated
+    sim_duration = 10000
+
+    # Initialize the production line
+    prod_line = UnreliableProductionLine(mu=mu, 
+                                         r=r, 
+                                         p=p, 
+                                         C=C)
+
+    # Simulate M times
+    M = 20
+    th_m = prod_line.simulate_M(sim_duration=sim_duration, M=M)
+    print("Throughput (M):", th_m)
+
+    # Hybrid simulation with tau-leaps while the buffer is far from its bounds
+    th, _, _ = prod_line.simulate(sim_duration=sim_duration, leap_condition=0.1)
+    print("Throughput (tau-leaping):", th[0],
+          "leaps:", prod_line.leaps, "exact steps:", prod_line.exact_steps)
+
+    # Distribution of the buffer level and a decimated time series
+    recorder = TimeSeriesRecorder(interval=1, capacity=1000)
+    prod_line.simulate(sim_duration=sim_duration, recorder=recorder)
+    print("P(buffer empty), P(buffer full):",
+          prod_line.buffer_distribution[0][0], prod_line.buffer_distribution[0][-1])
+    print("Blocking probabilities:", prod_line.blocking_prob)
+    print("Starving probabilities:", prod_line.starving_prob)
+    print("Last recorded (time, level, machine states):", recorder.values()[-1])
+
+    # Event trace: online statistics and a file writer in one pass with
+    # constant memory, read back with np.fromfile(..., dtype=batch.dtype)
+    statistics = SimulationStatistics(prod_line)
+    with tempfile.TemporaryFile() as trace:
+        for batch in prod_line.event_batches(sim_duration=1000):
+            for event in statistics.observe(batch.tolist()):
+                pass
+            batch.tofile(trace)
+        trace.seek(0)
+        print("Events in the trace:", len(np.fromfile(trace, dtype=batch.dtype)))
+    print("Throughput (trace):", statistics.finish().th[0])
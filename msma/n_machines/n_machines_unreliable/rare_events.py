@@ -0,0 +1,354 @@
+"""
+Importance sampling of rare blocking and starving probabilities of
+UnreliableProductionLine.
+
+The line is a CTMC, so its path between two visits of a regeneration
+state is a cycle, and the probability that a machine is up and blocked
+(or starved) is
+
+    P = E[time blocked per cycle] / E[cycle length].
+
+The cycle length is estimated from plain cycles. The time blocked per
+cycle is estimated from cycles in which the rates of all events are
+multiplied by a tilt theta, so that the buffer reaches its bound often,
+weighted with the likelihood ratio of the path. The jump chain is
+simulated, and every state contributes its expected holding time
+1/(total rate) instead of a random one. The tilt is switched off once
+the target is reached (or after max_tilted_events), so the cycle returns
+to the regeneration state with the original rates. Both estimates are
+unbiased, and the confidence interval of the ratio follows from the
+delta method.
+
+The tilt is found by multilevel cross-entropy: cycles are run with the
+current tilt, the rho-quantile of the highest score reached (the level of
+the buffer, or its distance to the full level for starving) is the next
+intermediate level, and the rates are replaced by the likelihood ratio
+weighted maximum likelihood estimates of the cycles reaching it, until
+the level is the target, followed by a few updates at the target.
+
+    line = UnreliableProductionLine(mu, r, p, C)
+    sampler = ImportanceSampling(line, "blocking", machine=0)
+    sampler.cross_entropy()
+    result = sampler.estimate(cycles=10000)
+"""
+
+import collections
+import statistics
+
+import numpy as np
+
+
+class ImportanceSampling:
+    """
+    Parameters
+    ----------
+    line : UnreliableProductionLine
+        Line with exponential times.
+    kind : str, optional
+        "blocking" or "starving", as blocking_prob and starving_prob of
+        SimulationStatistics.
+    machine : int, optional
+        Machine whose probability is estimated.
+    regeneration_state : tuple, optional
+        (buffer levels, machine states with 1 for up). By default the state
+        in which a plain pilot run of pilot_events events spends the most
+        time.
+    pilot_events : int, optional
+        Length of the pilot run.
+    seed : int, optional
+        Seed of the random number generator.
+    """
+    KINDS = ("blocking", "starving")
+
+    def __init__(self, line, kind: str = "blocking", machine: int = 0,
+                 regeneration_state: tuple = None, pilot_events: int = 100000,
+                 seed: int = 4711):
+        if kind not in self.KINDS:
+            raise ValueError(f"kind must be one of {self.KINDS}")
+        if getattr(line, "phase_types", False) or getattr(line, "parallel", False):
+            raise ValueError("Importance sampling needs single machines with "
+                             "exponential times")
+
+        M = line.num_machines
+        if len(line.C) != M - 1:
+            raise ValueError("Sizes of machine array and buffer array don't fit!")
+        if kind == "blocking" and not 0 <= machine < M - 1:
+            raise ValueError("Only machines with a downstream buffer can be blocked")
+        if kind == "starving" and not 0 < machine < M:
+            raise ValueError("Only machines with an upstream buffer can be starved")
+
+        self.M = M
+        self.mu = [float(x) for x in line.mu]
+        self.p = [float(x) for x in line.p]
+        self.r = [float(x) for x in line.r]
+        self.N = [int(x) + 2 for x in line.C]
+        self.kind = kind
+        self.machine = machine
+
+        # Rate of event k = 3n + (0 completion, 1 failure, 2 repair)
+        self.base_rates = np.array([[self.mu[n], self.p[n], self.r[n]]
+                                    for n in range(M)]).ravel()
+        self.theta = np.ones(3 * M)
+        self.target_score = self.N[machine] if kind == "blocking" else self.N[machine - 1]
+
+        self.rng = np.random.default_rng(seed)
+        self._uniforms, self._k = [], 0
+
+        if regeneration_state is None:
+            regeneration_state = self._pilot(pilot_events)
+        levels, states = regeneration_state
+        self.regeneration_state = (tuple(int(x) for x in levels),
+                                   tuple(bool(x) for x in states))
+
+
+    def _uniform(self):
+        # Random numbers are drawn in blocks
+        if self._k == len(self._uniforms):
+            self._uniforms = self.rng.random(4096).tolist()
+            self._k = 0
+        self._k += 1
+
+        return self._uniforms[self._k - 1]
+
+
+    def _rates(self, level, up):
+        rates = [0.0] * (3 * self.M)
+        for n in range(self.M):
+            if not up[n]:
+                rates[3*n + 2] = self.r[n]
+            elif ((n == 0 or level[n-1] > 0)
+                  and (n == self.M - 1 or level[n] < self.N[n])):
+                rates[3*n] = self.mu[n]
+                rates[3*n + 1] = self.p[n]
+
+        return rates
+
+
+    def _choose(self, rates, total):
+        u = self._uniform() * total
+        last = 0
+        for k, rate in enumerate(rates):
+            if rate > 0:
+                if u < rate:
+                    return k
+                u -= rate
+                last = k
+
+        return last  # rounding
+
+
+    def _apply(self, k, level, up):
+        n, event = divmod(k, 3)
+        if event == 0:
+            if n > 0:
+                level[n-1] -= 1
+            if n < self.M - 1:
+                level[n] += 1
+        else:
+            up[n] = not up[n]
+
+
+    def _score(self, level):
+        if self.kind == "blocking":
+            return level[self.machine]
+
+        return self.N[self.machine - 1] - level[self.machine - 1]
+
+
+    def _in_target(self, level, up):
+        # As SimulationStatistics: starving has precedence over blocking
+        n = self.machine
+        if not up[n]:
+            return False
+        starved = n > 0 and level[n-1] == 0
+        if self.kind == "starving":
+            return starved
+
+        return not starved and level[n] == self.N[n]
+
+
+    def _pilot(self, events):
+        # State with the largest expected holding time in a plain run
+        level, up = [0] * (self.M - 1), [True] * self.M
+        time_in_state = collections.Counter()
+        for _ in range(events):
+            rates = self._rates(level, up)
+            total = sum(rates)
+            time_in_state[(tuple(level), tuple(up))] += 1 / total
+            self._apply(self._choose(rates, total), level, up)
+
+        return time_in_state.most_common(1)[0][0]
+
+
+    def _cycle(self, theta=None, max_tilted_events=None, snapshots=False):
+        """
+        One cycle from the regeneration state. Returns the likelihood
+        ratio weighted time in the target, the cycle length (unweighted,
+        meaningful for plain cycles), the number of events and, with
+        snapshots, (score, likelihood ratio, event counts, exposures) at
+        every new highest score while tilted.
+        """
+        level = list(self.regeneration_state[0])
+        up = list(self.regeneration_state[1])
+        start = (tuple(level), tuple(up))
+
+        tilted = theta is not None
+        L = 1.0
+        reward = length = 0.0
+        events = 0
+        best = self._score(level)
+        if snapshots:
+            counts = np.zeros(3 * self.M)
+            exposure = np.zeros(3 * self.M)
+            history = [(best, L, counts.copy(), exposure.copy())]
+
+        while True:
+            rates = self._rates(level, up)
+            total = sum(rates)
+            holding = 1 / total
+            length += holding
+            if self._in_target(level, up):
+                reward += L * holding
+
+            if tilted:
+                tilted_rates = [t * x for t, x in zip(theta, rates)]
+                tilted_total = sum(tilted_rates)
+                k = self._choose(tilted_rates, tilted_total)
+                L *= rates[k] * tilted_total / (tilted_rates[k] * total)
+                if snapshots:
+                    counts[k] += 1
+                    exposure[np.flatnonzero(rates)] += 1 / tilted_total
+            else:
+                k = self._choose(rates, total)
+
+            self._apply(k, level, up)
+            events += 1
+
+            if tilted:
+                score = self._score(level)
+                if score > best:
+                    best = score
+                    if snapshots:
+                        history.append((best, L, counts.copy(), exposure.copy()))
+                # Switching the tilt off at a stopping time keeps the
+                # estimate unbiased
+                if (score >= self.target_score
+                        or max_tilted_events is not None and events >= max_tilted_events):
+                    tilted = False
+
+            if (tuple(level), tuple(up)) == start:
+                break
+
+        if snapshots:
+            return reward, length, events, history
+
+        return reward, length, events
+
+
+    def cross_entropy(self, cycles: int = 1000, rho: float = 0.1,
+                      smoothing: float = 0.7, max_iterations: int = 30,
+                      final_iterations: int = 3,
+                      max_tilted_events: int = 100000) -> np.ndarray:
+        """
+        Tilt of the rates by multilevel cross-entropy, stored in theta and
+        returned. levels holds the intermediate level of every iteration.
+        Once the level is the target, final_iterations more updates refine
+        the tilt, which makes the likelihood ratios less heavy-tailed.
+        """
+        theta = np.ones(3 * self.M)
+        self.levels = []
+        remaining = final_iterations
+
+        for _ in range(max_iterations):
+            histories = [self._cycle(theta, max_tilted_events, snapshots=True)[3]
+                         for _ in range(cycles)]
+            highest = np.array([history[-1][0] for history in histories])
+            level = min(self.target_score, np.quantile(highest, 1 - rho))
+            level = max(level, 1)
+            self.levels.append(float(level))
+
+            # Weighted counts and exposures up to the first visit of level
+            events = np.zeros(3 * self.M)
+            exposure = np.zeros(3 * self.M)
+            for history in histories:
+                for score, L, counts, exposures in history:
+                    if score >= level:
+                        events += L * counts
+                        exposure += L * exposures
+                        break
+
+            enabled = exposure > 0
+            new_theta = theta.copy()
+            new_theta[enabled] = events[enabled] / exposure[enabled] / self.base_rates[enabled]
+            # Events that never happened keep a small positive rate
+            new_theta = np.maximum(new_theta, 1e-3 * theta)
+            theta = smoothing * new_theta + (1 - smoothing) * theta
+
+            if level >= self.target_score:
+                if remaining == 0:
+                    break
+                remaining -= 1
+
+        self.theta = theta
+
+        return theta
+
+
+    def estimate(self, cycles: int = 10000, plain_cycles: int = None,
+                 theta=None, alpha: float = 0.05,
+                 max_tilted_events: int = 100000) -> dict:
+        """
+        Probability of the target with a 1 - alpha confidence interval,
+        from cycles tilted cycles with theta (default: the tilt of
+        cross_entropy) and plain_cycles plain cycles (default: cycles).
+        """
+        theta = self.theta if theta is None else np.asarray(theta, dtype=float)
+        plain_cycles = plain_cycles or cycles
+
+        weighted = np.zeros(cycles)
+        events = 0
+        for i in range(cycles):
+            weighted[i], _, n = self._cycle(theta, max_tilted_events)
+            events += n
+
+        lengths = np.zeros(plain_cycles)
+        for i in range(plain_cycles):
+            _, lengths[i], n = self._cycle()
+            events += n
+
+        reward, length = weighted.mean(), lengths.mean()
+        probability = reward / length
+
+        # Delta method for the ratio of independent means
+        variance = (weighted.var(ddof=1) / cycles
+                    + probability**2 * lengths.var(ddof=1) / plain_cycles) / length**2
+        half_width = statistics.NormalDist().inv_cdf(1 - alpha/2) * np.sqrt(variance)
+
+        return {"probability": float(probability),
+                "ci": (float(probability - half_width), float(probability + half_width)),
+                "relative_error": float(np.sqrt(variance) / probability) if probability > 0 else np.inf,
+                "cycles": cycles,
+                "plain_cycles": plain_cycles,
+                "events": events,
+                "theta": theta}
+
+
+if __name__ == "__main__":
+    import time
+
+    from ...two_machines.both_unreliable.two_machines_reliable_analytical import throughput
+    from .n_unreliable_machines_numerical import UnreliableProductionLine
+
+    # Machine 2 is faster, so a large buffer is rarely full
+    mu, p, r, C = np.array([1.0, 1.3]), np.array([0.01, 0.01]), np.array([0.1, 0.2]), np.array([40])
+    _, _, pb = throughput(mu[0], mu[1], p[0], p[1], r[0], r[1], C[0], with_probabilities=True)
+    print("Blocking probability (exact):", pb)
+
+    line = UnreliableProductionLine(mu=mu, r=r, p=p, C=C)
+    start = time.perf_counter()
+    sampler = ImportanceSampling(line, "blocking", machine=0)
+    print("Tilt:", sampler.cross_entropy().round(3), "levels:", sampler.levels)
+    result = sampler.estimate(cycles=5000)
+    print("Blocking probability (importance sampling):", result["probability"],
+          "CI:", result["ci"], "events:", result["events"],
+          "time:", time.perf_counter() - start, "s")
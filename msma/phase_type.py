@@ -0,0 +1,179 @@
+"""
+Phase-type distributions for processing, failure and repair times.
+
+A phase-type distribution is the time until absorption of a CTMC on a few
+transient phases, started in phase i with probability alpha_i. Within the
+phases it moves with the rates of the subgenerator S, and it is absorbed
+from phase i with rate s_i = -(S 1)_i. Exponential, Erlang and Coxian
+distributions are special cases, so times with a squared coefficient of
+variation below 1 can be modelled by CTMCs with a phase dimension per
+machine, e.g. TwoMachineLinePhaseType, and simulated event by event with
+the memorylessness of the phases, as UnreliableProductionLine does.
+
+    process = PhaseType.fit(mean=1.0, scv=0.25)  # Erlang-4
+"""
+
+import math
+
+import numpy as np
+
+
+class PhaseType:
+    """
+    Parameters
+    ----------
+    alpha : array_like
+        Initial distribution over the phases, summing to 1.
+    S : array_like
+        Subgenerator: negative diagonal, nonnegative off-diagonal entries
+        and nonpositive row sums.
+    """
+    def __init__(self, alpha, S):
+        self.alpha = np.asarray(alpha, dtype=float).ravel()
+        self.S = np.atleast_2d(np.asarray(S, dtype=float))
+        k = len(self.alpha)
+
+        if self.S.shape != (k, k):
+            raise ValueError("alpha and S don't fit!")
+        if np.any(self.alpha < 0) or abs(self.alpha.sum() - 1) > 1e-9:
+            raise ValueError("alpha must be a probability distribution")
+
+        self.rates = -np.diag(self.S)  # total rate of leaving each phase
+        off_diagonal = self.S - np.diag(np.diag(self.S))
+        if np.any(self.rates <= 0) or np.any(off_diagonal < 0):
+            raise ValueError("S must have a negative diagonal and nonnegative "
+                             "off-diagonal entries")
+
+        self.exit = -self.S.sum(axis=1)
+        if np.any(self.exit < -1e-9 * self.rates):
+            raise ValueError("The rows of S must not sum to positive values")
+        self.exit = np.maximum(self.exit, 0)
+
+        # Cumulative probabilities of the next phase (last column:
+        # absorption) and of the initial phase, for simulation
+        jumps = np.hstack([off_diagonal, self.exit[:, None]]) / self.rates[:, None]
+        self._cumulative_jumps = np.cumsum(jumps, axis=1)
+        self._cumulative_alpha = np.cumsum(self.alpha)
+
+    @property
+    def phases(self) -> int:
+        return len(self.alpha)
+
+    @classmethod
+    def exponential(cls, rate: float) -> "PhaseType":
+        return cls([1.0], [[-rate]])
+
+    @classmethod
+    def erlang(cls, k: int, mean: float) -> "PhaseType":
+        """
+        Sum of k exponential phases with rate k/mean each, SCV 1/k.
+        """
+        rate = k / mean
+        S = -rate * np.eye(k) + rate * np.eye(k, k=1)
+
+        return cls(np.eye(1, k)[0], S)
+
+    @classmethod
+    def coxian(cls, rates, continuation) -> "PhaseType":
+        """
+        Phases in series with the given rates, started in the first one.
+        After phase i, the next phase follows with probability
+        continuation[i], otherwise the time ends.
+        """
+        rates = np.asarray(rates, dtype=float)
+        continuation = np.asarray(continuation, dtype=float)
+        if len(continuation) != len(rates) - 1:
+            raise ValueError("A Coxian distribution needs one continuation "
+                             "probability less than rates")
+
+        S = -np.diag(rates) + np.diag(rates[:-1] * continuation, k=1)
+
+        return cls(np.eye(1, len(rates))[0], S)
+
+    @classmethod
+    def fit(cls, mean: float, scv: float) -> "PhaseType":
+        """
+        Distribution with the given mean and squared coefficient of
+        variation: a mixture of Erlang-(k-1) and Erlang-k distributions
+        with a common rate for scv < 1, an exponential distribution for
+        scv = 1 and a two-phase Coxian distribution for scv > 1, the
+        usual two-moment fits.
+        """
+        if mean <= 0 or scv <= 0:
+            raise ValueError("mean and scv must be positive")
+
+        if abs(scv - 1) < 1e-12:
+            return cls.exponential(1 / mean)
+
+        if scv > 1:
+            rate1 = 2 / mean
+            rate2 = 1 / (mean * scv)
+            return cls.coxian([rate1, rate2], [0.5 / scv])
+
+        # k - 1 phases with probability q, k phases otherwise
+        k = math.ceil(1 / scv)
+        q = (k * scv - math.sqrt(k * (1 + scv) - k**2 * scv)) / (1 + scv)
+        rate = (k - q) / mean
+
+        S = -rate * np.eye(k) + rate * np.eye(k, k=1)
+        S[k-2, k-1] *= 1 - q  # leave after phase k-1 with probability q
+
+        return cls(np.eye(1, k)[0], S)
+
+    def moment(self, order: int) -> float:
+        """
+        E[T^order] = order! alpha (-S)^-order 1.
+        """
+        x = np.ones(self.phases)
+        for _ in range(order):
+            x = np.linalg.solve(-self.S, x)
+
+        return float(math.factorial(order) * self.alpha @ x)
+
+    def mean(self) -> float:
+        return self.moment(1)
+
+    def scv(self) -> float:
+        mean = self.mean()
+
+        return self.moment(2) / mean**2 - 1
+
+    def start(self, rng) -> int:
+        """
+        Random initial phase. A single phase needs no random number.
+        """
+        if self.phases == 1:
+            return 0
+
+        alpha = self._cumulative_alpha
+
+        return int(np.searchsorted(alpha, rng.random() * alpha[-1], side="right"))
+
+    def next_phase(self, phase: int, rng) -> int:
+        """
+        Random phase after leaving phase, -1 if the time ends there. Phases
+        that can only end the time need no random number.
+        """
+        if self.exit[phase] == self.rates[phase]:
+            return -1
+
+        jumps = self._cumulative_jumps[phase]
+        j = int(np.searchsorted(jumps, rng.random() * jumps[-1], side="right"))
+
+        return -1 if j == self.phases else j
+
+    def parameters(self) -> dict:
+        return {"alpha": self.alpha, "S": self.S}
+
+    def __repr__(self):
+        return f"PhaseType(alpha={self.alpha.tolist()}, S={self.S.tolist()})"
+
+
+def as_phase_type(value):
+    """
+    A PhaseType, an exponential distribution for a rate, or None.
+    """
+    if value is None or isinstance(value, PhaseType):
+        return value
+
+    return PhaseType.exponential(float(value))
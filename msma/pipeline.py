@@ -0,0 +1,132 @@
+"""
+Streaming evaluation of large files of line configurations.
+
+The configurations are read in chunks, and every chunk is evaluated as a
+whole: reliable lines with the same number of machines are solved
+together by the array version of the closed form or decomposition, all
+other lines one by one with the backend of evaluation.choose_backend, or
+of evaluation.select_backend if a tolerance is given.
+Chunks are spread over a pool of worker processes, and results come back
+in input order as soon as their chunk is done. At most two chunks per
+worker are in flight, so memory does not grow with the input.
+"""
+
+import collections
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from . import evaluation
+
+
+def read_chunks(filename: str, chunk_size: int = 1000):
+    """
+    Generator of lists of at most chunk_size configurations of a file of
+    evaluation.read_configs.
+    """
+    configs = evaluation.read_configs(filename)
+    while True:
+        chunk = list(itertools.islice(configs, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _evaluate_reliable(lines: list) -> list:
+    # Reliable lines with the same number of machines, in one array solve
+    from .decomposition.BatchDecomposition import N_MachineLineReliableBatch
+
+    start = time.perf_counter()
+    batch = N_MachineLineReliableBatch([line["mu"] for line in lines],
+                                       [line["C"] for line in lines])
+    TP, nb, pb, ps = batch.determineThroughputAndInventory()
+    elapsed = (time.perf_counter() - start) / len(lines)
+
+    zeros = np.zeros((len(lines), 1))
+    ps = np.hstack([zeros, ps])
+    pb = np.hstack([pb, zeros])
+
+    return [{"TP": float(TP[k]), "nb": nb[k].tolist(), "ps": ps[k].tolist(),
+             "pb": pb[k].tolist(), "time": elapsed} for k in range(len(lines))]
+
+
+def evaluate_chunk(configs: list, backend: str = None,
+                   tolerance: float = None, time_budget: float = None) -> list:
+    """
+    Results of evaluation.evaluate_configs for a list of configurations.
+    """
+    results = [None] * len(configs)
+    reliable = collections.defaultdict(list)  # (machines, backend) -> indices
+
+    lines = [None] * len(configs)
+    selected = {}  # index -> (reason, estimate) of the backend selected
+    for k, config in enumerate(configs):
+        try:
+            line = evaluation.parse_config(config)
+            selecting = not (line["backend"] or backend) and tolerance is not None
+            if selecting:
+                chosen, *selected[k] = evaluation.select_backend(line, tolerance,
+                                                                 time_budget)[0]
+            else:
+                chosen = line["backend"] or backend or evaluation.choose_backend(line)
+            M = len(line["mu"])
+            if (evaluation.is_reliable(line)
+                    and (chosen == "decomposition" or chosen == "closed_form" and M == 2)):
+                lines[k] = line
+                reliable[(M, chosen)].append(k)
+            elif selecting:
+                results[k] = evaluation.evaluate(line, tolerance, time_budget)
+            else:
+                results[k] = evaluation.evaluate_line(line, chosen)
+        except Exception as error:
+            results[k] = {"name": str(config.get("name", "")), "error": repr(error)}
+
+    for (_, chosen), indices in reliable.items():
+        try:
+            kpis = _evaluate_reliable([lines[k] for k in indices])
+        except Exception:
+            # Evaluate one by one, so that only the failing lines fail
+            for k in indices:
+                results[k] = next(evaluation.evaluate_configs([configs[k]], chosen))
+            continue
+
+        for k, values in zip(indices, kpis):
+            results[k] = {"name": lines[k]["name"], "backend": chosen, **values}
+            if k in selected:
+                reason, estimate = selected[k]
+                results[k].update(reason=reason, expected_error=estimate["error"])
+
+    return results
+
+
+def evaluate_file(filename: str, chunk_size: int = 1000, workers: int = 1,
+                  backend: str = None, tolerance: float = None,
+                  time_budget: float = None):
+    """
+    Generator of the results of all configurations of a file, in input
+    order. With workers > 1 (None: one per CPU), the chunks are evaluated
+    by a process pool.
+    """
+    chunks = read_chunks(filename, chunk_size)
+
+    if workers == 1:
+        for chunk in chunks:
+            yield from evaluate_chunk(chunk, backend, tolerance, time_budget)
+        return
+
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(workers) as pool:
+        max_pending = 2 * workers
+        pending = collections.deque()
+
+        for chunk in chunks:
+            pending.append(pool.submit(evaluate_chunk, chunk, backend, tolerance,
+                                       time_budget))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
@@ -0,0 +1,167 @@
+"""
+Persistent, content-addressed cache for results of analytical models and
+simulation studies.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+
+def _canonical(value):
+    # JSON encoding of parameters, with NumPy scalars and arrays as lists
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    if isinstance(value, type):
+        return f"{value.__module__}.{value.__qualname__}"
+    raise TypeError(f"Cannot use {type(value).__name__} in a cache key")
+
+
+class ResultCache:
+    """
+    Cache of NumPy arrays on disk, addressed by a hash of the model class,
+    its parameters, the solver or engine version and the seed.
+
+    Every entry is a directory with one .npy file per array and a
+    meta.json, so arrays are loaded as read-only memory maps without
+    copying. The modification time of meta.json is the last access.
+    Once the entries take more than max_bytes, the least recently used
+    ones are deleted.
+
+    Models take the cache as optional argument and use it through key,
+    get and put, e.g.
+
+        cache = ResultCache("~/.cache/msma")
+        line = TwoMachineLineBothUnreliable("X", 1, 1.1, 0.01, 0.02,
+                                            0.1, 0.15, C=1000, cache=cache)
+
+    Parameters
+    ----------
+    directory : str
+        Directory of the cache, created if necessary.
+    max_bytes : int, optional
+        Size bound of all entries. Default is 1 GiB.
+    """
+    def __init__(self, directory, max_bytes=2**30):
+        self.directory = os.path.expanduser(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, model, parameters, version, seed=None):
+        """
+        SHA-256 of the model class (or name), its parameters (a dict of
+        numbers, strings, lists or arrays), the version and the seed.
+        """
+        description = {"model": model if isinstance(model, str) else _canonical(model),
+                       "parameters": parameters,
+                       "version": version,
+                       "seed": seed}
+        encoded = json.dumps(description, sort_keys=True, default=_canonical)
+
+        return hashlib.sha256(encoded.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key):
+        """
+        The arrays stored under key as dict of read-only memory maps, or
+        None if there is no such entry.
+        """
+        path = self._path(key)
+        try:
+            with open(os.path.join(path, "meta.json")) as file:
+                meta = json.load(file)
+            arrays = {name: np.load(os.path.join(path, name + ".npy"), mmap_mode="r")
+                      for name in meta["arrays"]}
+        except (OSError, ValueError):
+            # Missing, or deleted by another process meanwhile
+            self.misses += 1
+            return None
+
+        os.utime(os.path.join(path, "meta.json"))
+        self.hits += 1
+
+        return arrays
+
+    def put(self, key, arrays, meta=None):
+        """
+        Store a dict of arrays under key. The entry is written to a
+        temporary directory and renamed, so readers never see partial
+        entries, and concurrent writers of the same key keep one copy.
+        The new entry is not evicted, even if it alone exceeds max_bytes.
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = tempfile.mkdtemp(dir=os.path.dirname(path))
+
+        for name, array in arrays.items():
+            np.save(os.path.join(temporary, name + ".npy"), np.asarray(array))
+        with open(os.path.join(temporary, "meta.json"), "w") as file:
+            json.dump({"arrays": list(arrays), "created": time.time(),
+                       **(meta or {})}, file)
+
+        try:
+            os.rename(temporary, path)
+        except OSError:
+            shutil.rmtree(temporary, ignore_errors=True)
+
+        self.evict(keep=path)
+
+    def cached(self, key, compute):
+        """
+        The arrays under key, computed by compute() returning a dict of
+        arrays and stored if they are not in the cache yet.
+        """
+        arrays = self.get(key)
+        if arrays is None:
+            computed = compute()
+            self.put(key, computed)
+            # Deleted by another process meanwhile: the computed arrays
+            arrays = self.get(key) or computed
+
+        return arrays
+
+    def entries(self):
+        """
+        List of (last access, size in bytes, path) of all entries.
+        """
+        entries = []
+        for prefix in os.scandir(self.directory):
+            if not prefix.is_dir():
+                continue  # a file that is not an entry, e.g. a lock file
+            for key in os.listdir(prefix.path):
+                path = os.path.join(prefix.path, key)
+                try:
+                    accessed = os.path.getmtime(os.path.join(path, "meta.json"))
+                    size = sum(entry.stat().st_size for entry in os.scandir(path))
+                except OSError:
+                    continue  # temporary or partially deleted entry
+                entries.append((accessed, size, path))
+
+        return entries
+
+    def evict(self, keep=None):
+        """
+        Delete least recently used entries until all fit into max_bytes,
+        except the entry at the path keep.
+        """
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        entries = [entry for entry in entries if entry[2] != keep]
+
+        while entries and total > self.max_bytes:
+            _, size, path = entries.pop(0)
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        for prefix in os.listdir(self.directory):
+            shutil.rmtree(os.path.join(self.directory, prefix), ignore_errors=True)
@@ -0,0 +1,388 @@
+"""
+Local evaluation service: JSON-RPC 2.0 over a Unix socket, one request
+and one response per line.
+
+Methods
+-------
+evaluate(config)
+    KPIs of a line configuration as in evaluation.evaluate_config.
+    Requests arriving within batch_window of each other are evaluated
+    together with pipeline.evaluate_chunk, and identical concurrent
+    requests are solved once. Results are kept in an LRU cache.
+simulate(mu, p, r, C, sim_duration=10000, seed=4711, leap_condition=None)
+    A run of UnreliableProductionLine in a process pool, so that long
+    simulations do not hold up the solves. Results are kept in the same
+    cache.
+stats()
+    Counters of requests, batches and cache hits.
+
+The models are imported when the server starts, so no request pays for
+it. Start the server and call it with ServiceClient:
+
+    python -m msma.service --socket /tmp/msma.sock
+
+    with ServiceClient("/tmp/msma.sock") as client:
+        client.call("evaluate", config={"mu": [1, 1.1], "C": [10]})
+"""
+
+import argparse
+import asyncio
+import collections
+import functools
+import json
+import os
+import socket
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from . import evaluation, pipeline
+
+# JSON-RPC error codes
+PARSE_ERROR = -32700
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+
+
+def _simulate(mu, p, r, C, sim_duration=10000, seed=4711, leap_condition=None):
+    from .n_machines.n_machines_unreliable.n_unreliable_machines_numerical import (
+        UnreliableProductionLine)
+    import numpy as np
+
+    line = UnreliableProductionLine(mu=np.asarray(mu, dtype=float),
+                                    r=np.asarray(r, dtype=float),
+                                    p=np.asarray(p, dtype=float),
+                                    C=np.asarray(C, dtype=int))
+    th, parts, avg_buffer = line.simulate(sim_duration, seed=seed,
+                                          leap_condition=leap_condition)
+
+    return {"th": [float(x) for x in th],
+            "parts_processed": [int(x) for x in parts],
+            "avg_buffer_level": [float(x) for x in avg_buffer],
+            "starving_prob": [float(x) for x in line.starving_prob],
+            "blocking_prob": [float(x) for x in line.blocking_prob]}
+
+
+class EvaluationServer:
+    """
+    Parameters
+    ----------
+    path : str
+        Path of the Unix socket.
+    batch_window : float, optional
+        Seconds an evaluate request waits for others to join its batch.
+    max_batch : int, optional
+        Largest number of configurations evaluated together.
+    cache_size : int, optional
+        Number of results kept in the LRU cache.
+    workers : int, optional
+        Processes for simulations, None for one per CPU.
+    """
+    def __init__(self, path, batch_window=0.005, max_batch=1000,
+                 cache_size=100_000, workers=None):
+        self.path = path
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.cache_size = cache_size
+        self.workers = workers
+
+        self.cache = collections.OrderedDict()
+        self.inflight = {}  # key -> future of a request being solved
+        self.counters = collections.Counter()
+
+    # Cache of results, keyed by method and canonical parameters
+
+    def _lookup(self, key):
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.counters["cache_hits"] += 1
+            return self.cache[key]
+
+        return None
+
+    def _store(self, key, result):
+        self.cache[key] = result
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    async def _cached(self, key, solve):
+        result = self._lookup(key)
+        if result is not None:
+            return result
+
+        if key in self.inflight:
+            self.counters["coalesced"] += 1
+            return await asyncio.shield(self.inflight[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        try:
+            result = await solve()
+        except Exception as error:
+            result = {"error": repr(error)}
+        finally:
+            del self.inflight[key]
+
+        if "error" not in result:
+            self._store(key, result)
+        future.set_result(result)
+
+        return result
+
+    # Methods
+
+    async def evaluate(self, config):
+        if not isinstance(config, dict):
+            raise TypeError("config must be an object")
+        key = "evaluate:" + json.dumps(config, sort_keys=True)
+
+        async def solve():
+            future = asyncio.get_running_loop().create_future()
+            await self.queue.put((config, future))
+            return await future
+
+        return self._checked(await self._cached(key, solve))
+
+    async def simulate(self, **params):
+        key = "simulate:" + json.dumps(params, sort_keys=True)
+
+        async def solve():
+            loop = asyncio.get_running_loop()
+            self.counters["simulations"] += 1
+            return await loop.run_in_executor(self.processes,
+                                              functools.partial(_simulate, **params))
+
+        return self._checked(await self._cached(key, solve))
+
+    @staticmethod
+    def _checked(result):
+        if "error" in result:
+            raise ValueError(result["error"])
+
+        return result
+
+    async def stats(self):
+        return dict(self.counters, cache_entries=len(self.cache))
+
+    async def _batcher(self):
+        # Collects evaluate requests into batches and solves them in a thread,
+        # so that the event loop keeps accepting requests meanwhile
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            self.counters["batches"] += 1
+            self.counters["batched_requests"] += len(batch)
+            configs = [config for config, _ in batch]
+            try:
+                results = await loop.run_in_executor(
+                    self.threads, pipeline.evaluate_chunk, configs)
+            except Exception as error:
+                results = [{"error": repr(error)}] * len(batch)
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    # Protocol
+
+    async def _dispatch(self, request):
+        method = request.get("method")
+        params = request.get("params", {})
+        if method not in ("evaluate", "simulate", "stats"):
+            return {"code": METHOD_NOT_FOUND, "message": f"Unknown method {method!r}"}, None
+
+        self.counters["requests"] += 1
+        try:
+            if isinstance(params, list):
+                result = await getattr(self, method)(*params)
+            else:
+                result = await getattr(self, method)(**params)
+        except (TypeError, ValueError) as error:
+            return {"code": INVALID_PARAMS, "message": str(error)}, None
+        except Exception as error:
+            return {"code": SERVER_ERROR, "message": repr(error)}, None
+
+        return None, result
+
+    async def _respond(self, request, writer, lock):
+        try:
+            error, result = await self._dispatch(request)
+        except Exception as exception:
+            error, result = {"code": SERVER_ERROR, "message": repr(exception)}, None
+        response = {"jsonrpc": "2.0", "id": request.get("id")}
+        if error is None:
+            response["result"] = result
+        else:
+            response["error"] = error
+
+        async with lock:
+            writer.write(json.dumps(response).encode() + b"\n")
+            await writer.drain()
+
+    async def _handle(self, reader, writer):
+        # Requests of one connection are answered as they finish, so a
+        # client can pipeline many of them
+        lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("request must be an object")
+                except ValueError as error:
+                    response = {"jsonrpc": "2.0", "id": None,
+                                "error": {"code": PARSE_ERROR, "message": str(error)}}
+                    async with lock:
+                        writer.write(json.dumps(response).encode() + b"\n")
+                    continue
+
+                task = asyncio.create_task(self._respond(request, writer, lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+
+    def _warm_up(self):
+        # Import the models and run every backend once
+        for config in [{"mu": [1, 1.1], "C": [10]},
+                       {"mu": [1, 1.1], "p": [0.01, 0.02], "r": [0.1, 0.15], "C": [10]},
+                       {"mu": [1, 1.1, 1.2], "C": [10, 10]},
+                       {"mu": [1, 1.1, 1.2], "p": [0.01] * 3, "r": [0.1] * 3, "C": [2, 2]}]:
+            evaluation.evaluate_config(config)
+        evaluation.evaluate_config({"mu": [1, 1.1, 1.2], "p": [0.01] * 3,
+                                    "r": [0.1] * 3, "C": [2, 2]}, "decomposition")
+        _simulate([1, 1.1], [0.01, 0.02], [0.1, 0.15], [10], sim_duration=10)
+
+    async def serve(self, ready=None):
+        """
+        Serve until cancelled. ready, an asyncio.Event, is set once the
+        socket accepts connections.
+        """
+        self._warm_up()
+        self.queue = asyncio.Queue()
+        self.threads = ThreadPoolExecutor(1)
+        self.processes = ProcessPoolExecutor(self.workers)
+
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        server = await asyncio.start_unix_server(self._handle, path=self.path)
+        batcher = asyncio.create_task(self._batcher())
+        if ready is not None:
+            ready.set()
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            self.threads.shutdown()
+            self.processes.shutdown(cancel_futures=True)
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+
+class ServiceClient:
+    """
+    Blocking client of EvaluationServer. call sends one request, call_many
+    sends all requests before reading the responses, so that the server
+    can batch them.
+    """
+    def __init__(self, path, timeout=None):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.settimeout(timeout)
+        self.socket.connect(path)
+        self.file = self.socket.makefile("rwb")
+        self.next_id = 0
+
+    def _send(self, method, params):
+        self.next_id += 1
+        request = {"jsonrpc": "2.0", "id": self.next_id, "method": method,
+                   "params": params}
+        self.file.write(json.dumps(request).encode() + b"\n")
+
+        return self.next_id
+
+    def _receive(self):
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError("The server closed the connection")
+
+        return json.loads(line)
+
+    @staticmethod
+    def _result(response):
+        if "error" in response:
+            raise RuntimeError(response["error"]["message"])
+
+        return response["result"]
+
+    def call(self, method, **params):
+        self._send(method, params)
+        self.file.flush()
+
+        return self._result(self._receive())
+
+    def call_many(self, method, params_list):
+        """
+        Results of method for every dict of parameters, in order. Failed
+        requests give a RuntimeError in place of the result.
+        """
+        ids = [self._send(method, params) for params in params_list]
+        self.file.flush()
+
+        responses = {}
+        while len(responses) < len(ids):
+            response = self._receive()
+            responses[response["id"]] = response
+
+        results = []
+        for i in ids:
+            try:
+                results.append(self._result(responses[i]))
+            except RuntimeError as error:
+                results.append(error)
+
+        return results
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local evaluation service")
+    parser.add_argument("--socket", default="/tmp/msma.sock", help="path of the Unix socket")
+    parser.add_argument("--batch-window", type=float, default=0.005,
+                        help="seconds a request waits for others to join its batch")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="simulation processes, one per CPU if omitted")
+    args = parser.parse_args(argv)
+
+    server = EvaluationServer(args.socket, args.batch_window, workers=args.workers)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
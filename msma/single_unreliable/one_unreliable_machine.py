@@ -1,5 +1,4 @@
 import numpy as np
-from sklearn.metrics import mean_squared_error
 
 
 def single_unreliable_machine(p: float, 
@@ -89,6 +88,9 @@ def compute_accuracy(p: float,
     float
         The mean squared error between the analytical and numerical results.
     """
+    # Imported here, scikit-learn is slow to import and only needed here
+    from sklearn.metrics import mean_squared_error
+
     analytical = single_unreliable_machine(p, r,  
                                            init_state=init_state, 
                                            mode="analytical")
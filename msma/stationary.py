@@ -0,0 +1,191 @@
+"""
+Stationary distributions of CTMC generators with accuracy checks.
+
+The models solve pi Qmod = nmod, where Qmod is the generator Q with its
+last column replaced by ones and nmod the last unit vector. solve
+factorizes Qmod instead of inverting it and checks the solution:
+
+    residual               max |pi Q| / max |Q_ii|
+    normalization error    |sum pi - 1|
+    negative mass          -sum of the negative entries of pi
+
+If a check fails by more than tol, the solution is improved by iterative
+refinement with the same factors, the residual of dense systems being
+computed in extended precision. If that does not help either, e.g. for
+rates spanning many orders of magnitude, pi is computed by the
+Grassmann-Taksar-Heyman (GTH) elimination, which needs no subtractions
+and so gives nonnegative probabilities with small relative errors for any
+rates, at the price of a dense O(n^3) elimination (seconds for a few
+thousand states). The LU solution is only accurate relative to the
+largest probabilities, so tail probabilities far below tol, e.g. of a
+large buffer being full, need method="gth". The diagnostics of the
+returned pi are returned with it:
+
+    pi, diagnostics = solve(Q)
+"""
+
+import numpy as np
+import scipy.linalg as sla
+import scipy.sparse as sp
+import scipy.sparse.csgraph as csgraph
+import scipy.sparse.linalg as spla
+
+# Default tolerance of the relative residual, normalization error and
+# negative mass
+TOLERANCE = 1e-12
+
+# Largest number of states for which GTH is used as fallback
+GTH_STATE_LIMIT = 5000
+
+
+def diagnostics(Q, pi) -> dict:
+    """
+    Accuracy measures of pi as stationary distribution of Q.
+    """
+    pi = np.asarray(pi).ravel()
+    piQ = np.asarray(Q.T @ pi).ravel()
+    scale = np.abs(Q.diagonal()).max()
+
+    return {"residual": float(np.abs(piQ).max() / scale),
+            "normalization_error": float(abs(pi.sum() - 1)),
+            "negative_mass": float(max(0.0, -pi[pi < 0].sum()))}
+
+
+def accurate(measures: dict, tol: float = TOLERANCE) -> bool:
+    """
+    Whether all measures of diagnostics are finite and at most tol.
+    """
+    return all(np.isfinite(value) and value <= tol for value in measures.values())
+
+
+def recurrent_state(Q) -> int:
+    """
+    A state of the only closed class of Q, i.e. the strongly connected
+    component that cannot be left.
+    """
+    graph = sp.csr_matrix(Q)
+    graph.eliminate_zeros()
+    count, labels = csgraph.connected_components(graph, directed=True,
+                                                 connection="strong")
+    rows, cols = graph.nonzero()
+    leaving = labels[rows] != labels[cols]
+    closed = np.setdiff1d(np.arange(count), labels[rows[leaving]])
+    if len(closed) != 1:
+        raise ValueError("The generator has more than one recurrent class")
+
+    return int(np.flatnonzero(labels == closed[0])[0])
+
+
+def gth(Q, root: int = None) -> np.ndarray:
+    """
+    Stationary distribution of a generator with one recurrent class by GTH
+    elimination. The root state, by default of recurrent_state, is
+    eliminated last and must be recurrent; states that are never entered,
+    like (n = 0, alpha2 = 0) of the two-machine lines, get probability 0.
+    The diagonal of Q is not used.
+    """
+    if root is None:
+        root = recurrent_state(Q)
+
+    A = Q.toarray() if sp.issparse(Q) else np.array(Q, dtype=float)
+    n = A.shape[0]
+
+    order = np.r_[root, np.delete(np.arange(n), root)]
+    A = A[np.ix_(order, order)]
+
+    # Eliminate the states n-1, ..., 1; the rates out of state k to the
+    # remaining states, i.e. the sum of the off-diagonal entries of row k,
+    # replace the diagonal element, so nothing is subtracted
+    for k in range(n - 1, 0, -1):
+        outflow = A[k, :k].sum()
+        if outflow <= 0:
+            raise ValueError("The root state is not recurrent")
+        A[:k, k] /= outflow
+        A[:k, :k] += np.outer(A[:k, k], A[k, :k])
+
+    x = np.zeros(n)
+    x[0] = 1
+    for k in range(1, n):
+        x[k] = x[:k] @ A[:k, k]
+
+    pi = np.zeros(n)
+    pi[order] = x
+
+    return pi / pi.sum()
+
+
+def solve(Q, tol: float = TOLERANCE, max_refinements: int = 3,
+          method: str = "auto") -> tuple:
+    """
+    Stationary distribution of the generator Q (dense or sparse) as 1-d
+    array, and its diagnostics with the method used ("lu", "lu+refinement"
+    or "gth"), the number of refinement steps, the probability mass of
+    round-off below tol set to 0 (clipped_mass) and whether all checks
+    passed (accepted). method "gth" skips the LU solution. A pi that is
+    not accepted, e.g. not finite for more than GTH_STATE_LIMIT states, is
+    returned as it is.
+    """
+    if method not in ("auto", "gth"):
+        raise ValueError("method must be 'auto' or 'gth'")
+
+    sparse = sp.issparse(Q)
+    n = Q.shape[0]
+
+    if method == "gth":
+        Q = sp.csc_matrix(Q) if sparse else np.asarray(Q, dtype=float)
+        pi = gth(Q)
+        measures = diagnostics(Q, pi)
+        measures.update(method="gth", refinement_steps=0, clipped_mass=0.0,
+                        accepted=accurate(measures, tol))
+        return pi, measures
+
+    if sparse:
+        Q = sp.csc_matrix(Q)
+        Qmod = sp.hstack([Q[:, :-1], np.ones((n, 1))]).tocsc()
+        lu = spla.splu(Qmod.T.tocsc())
+        solve_transposed = lu.solve
+    else:
+        Q = np.asarray(Q, dtype=float)
+        Qmod = Q.copy()
+        Qmod[:, -1] = 1
+        lu = sla.lu_factor(Qmod)
+        solve_transposed = lambda b: sla.lu_solve(lu, b, trans=1)
+
+    nmod = np.zeros(n)
+    nmod[-1] = 1
+
+    pi = solve_transposed(nmod)
+    measures = diagnostics(Q, pi)
+    method = "lu"
+    steps = 0
+
+    # Iterative refinement: solve for the correction with the residual of
+    # pi Qmod = nmod. A non-finite pi, e.g. of a numerically singular Qmod,
+    # cannot be refined and goes straight to GTH
+    while (not accurate(measures, tol) and steps < max_refinements
+           and np.isfinite(pi).all()):
+        if sparse:
+            residual = nmod - Qmod.T @ pi
+        else:
+            residual = (nmod - Qmod.T.astype(np.longdouble) @ pi.astype(np.longdouble))
+        pi = pi + solve_transposed(np.asarray(residual, dtype=float))
+        measures = diagnostics(Q, pi)
+        method = "lu+refinement"
+        steps += 1
+
+    if not accurate(measures, tol) and n <= GTH_STATE_LIMIT:
+        pi = gth(Q)
+        measures = diagnostics(Q, pi)
+        method = "gth"
+
+    # Round-off below tol may leave tiny negative probabilities
+    clipped = measures["negative_mass"]
+    if clipped > 0 and accurate(measures, tol):
+        pi = np.maximum(pi, 0)
+        pi /= pi.sum()
+        measures = diagnostics(Q, pi)
+
+    measures.update(method=method, refinement_steps=steps, clipped_mass=clipped,
+                    accepted=accurate(measures, tol))
+
+    return pi, measures
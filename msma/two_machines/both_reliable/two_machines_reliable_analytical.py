@@ -3,7 +3,8 @@
 #   Author: Stefan Helber, Date: November 20, 2024
 
 import numpy as np
-import numpy.linalg as la
+
+from ... import stationary
 
 
 class TwoMachineLineBothReliable:
@@ -14,8 +15,6 @@ class TwoMachineLineBothReliable:
         self.N = C + 2  # extended buffer size
         self.NumberOfStates = C + 3
         self.Q = np.zeros((self.NumberOfStates, self.NumberOfStates))
-        self.Qmod = np.zeros((self.NumberOfStates, self.NumberOfStates))
-        self.nmod = np.zeros((1, self.NumberOfStates))
         self.pi = np.zeros((1, self.NumberOfStates))  # states prob.
         self.StN = np.arange(self.NumberOfStates)
         counter = -1
@@ -39,14 +38,10 @@ class TwoMachineLineBothReliable:
 
     def determineSteadyStateProbabilities(self):
         self.initializeGeneratorMatrix()
-        self.Qmod = self.Q.copy()
-        numberOfRowsOfQ = self.Qmod.shape[0]
-        for i in range(numberOfRowsOfQ):
-            self.Qmod[i][numberOfRowsOfQ - 1] = 1  # Qmod is quadratic
-        # right hand side row vector with last element as a 1
-        self.nmod[0][numberOfRowsOfQ - 1] = 1
 
-        self.pi = self.nmod.dot(la.inv(self.Qmod))
+        # pi Q = 0 with sum(pi) = 1, checked and refined by stationary.solve
+        pi, self.diagnostics = stationary.solve(self.Q)
+        self.pi = pi[None, :]
         
     
     def calc_TH1(self):
@@ -66,16 +61,17 @@ class TwoMachineLineBothReliable:
             
         return n_bar
 
-# We now create an object of the class
-myTwoMachineLine = TwoMachineLineBothReliable("StefansLine", 10, 8, 2)
+if __name__ == "__main__":
+    # We now create an object of the class
+    myTwoMachineLine = TwoMachineLineBothReliable("StefansLine", 10, 8, 2)
 
-print("Vector of state probablities is:", myTwoMachineLine.pi)
+    print("Vector of state probablities is:", myTwoMachineLine.pi)
 
-print("Throughput via Machine 1 is:",
-    myTwoMachineLine.calc_TH1(),)
+    print("Throughput via Machine 1 is:",
+        myTwoMachineLine.calc_TH1(),)
 
-print("Throughput via Machine 2 is:",
-    myTwoMachineLine.calc_TH2(),)
+    print("Throughput via Machine 2 is:",
+        myTwoMachineLine.calc_TH2(),)
 
-print("Average parts in the system is:", 
-      myTwoMachineLine.calc_n_bar())
+    print("Average parts in the system is:", 
+          myTwoMachineLine.calc_n_bar())
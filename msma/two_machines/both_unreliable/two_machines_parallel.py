@@ -0,0 +1,160 @@
+import numpy as np
+import scipy.sparse as sp
+
+from ... import stationary
+
+
+class TwoMachineLineParallel:
+    """
+    Two-station line whose stations have k1 and k2 identical unreliable
+    machines in parallel and move parts in batches of b1 and b2.
+
+    Every machine of station i processes a batch of bi parts at rate mui,
+    fails at rate pi while it works (operation dependent failures) and is
+    repaired at rate ri, independently of the other machines. A machine of
+    station 1 needs space for a whole batch, a machine of station 2 a whole
+    batch of parts. With u1 and u2 machines up, the numbers of busy
+    machines are
+
+        w1 = min(u1, (N - n) // b1),    w2 = min(u2, n // b2),
+
+    and all rates scale with them, so a station is described by its number
+    of machines up instead of one state per machine. n counts the parts in
+    the buffer and in the machines, N = C + b1 k1 + b2 k2 as in the
+    extended buffer of the one-machine models. With k1 = k2 = b1 = b2 = 1
+    the line is TwoMachineLineBothUnreliable.
+
+    The states (n, u1, u2) are numbered in the order of np.ravel_multi_index
+    over (N+1, U1, U2), where station i only has the state ui = ki if it
+    never fails (pi = 0). The generator is assembled as sparse matrix from
+    the lists of transitions.
+    """
+    def __init__(self, name: str,
+                 mu1: float, mu2: float,
+                 p1: float, p2: float,
+                 r1: float, r2: float,
+                 C: int,
+                 k1: int = 1, k2: int = 1,
+                 b1: int = 1, b2: int = 1):
+        if min(k1, k2, b1, b2) < 1:
+            raise ValueError("Stations need at least one machine and batches one part")
+
+        self.name = name
+
+        self.mu1, self.mu2 = mu1, mu2
+        self.p1, self.p2 = p1, p2
+        self.r1, self.r2 = r1, r2
+        self.k1, self.k2 = k1, k2
+        self.b1, self.b2 = b1, b2
+
+        self.N = C + b1*k1 + b2*k2  # extended buffer size
+        self.C = C
+
+        # Numbers of machines up that can occur
+        self.up1 = np.arange(k1 + 1) if p1 > 0 else np.array([k1])
+        self.up2 = np.arange(k2 + 1) if p2 > 0 else np.array([k2])
+        self.shape = (self.N + 1, len(self.up1), len(self.up2))
+        self.num_states = int(np.prod(self.shape))
+
+        self.determineSteadyStateProbabilities()
+
+
+    def state_labels(self) -> dict:
+        """
+        Buffer level n, machines up u1 and u2 and busy machines w1 and w2 of
+        every state index. alpha1 and alpha2 are 1 if any machine of the
+        station is up, as for first_passage.
+        """
+        n, i1, i2 = np.unravel_index(np.arange(self.num_states), self.shape)
+        u1, u2 = self.up1[i1], self.up2[i2]
+        w1 = np.minimum(u1, (self.N - n) // self.b1)
+        w2 = np.minimum(u2, n // self.b2)
+
+        return {"n": n, "u1": u1, "u2": u2, "w1": w1, "w2": w2,
+                "alpha1": (u1 > 0).astype(int), "alpha2": (u2 > 0).astype(int)}
+
+
+    def initializeGeneratorMatrix(self):
+        s = self.state_labels()
+        n, u1, u2, w1, w2 = s["n"], s["u1"], s["u2"], s["w1"], s["w2"]
+        i1 = np.searchsorted(self.up1, u1)
+        i2 = np.searchsorted(self.up2, u2)
+
+        def index(n, i1, i2):
+            return np.ravel_multi_index((n, i1, i2), self.shape)
+
+        states = np.arange(self.num_states)
+
+        # (rates, from, to) of all transitions; a failure leaves one
+        # machine less up, a repair one more
+        transitions = [(w1 * self.mu1, states, index(np.minimum(n + self.b1, self.N), i1, i2)),
+                       (w2 * self.mu2, states, index(np.maximum(n - self.b2, 0), i1, i2))]
+        if self.p1 > 0:
+            transitions += [(w1 * self.p1, states, index(n, np.maximum(i1 - 1, 0), i2)),
+                            ((self.k1 - u1) * self.r1, states,
+                             index(n, np.minimum(i1 + 1, self.k1), i2))]
+        if self.p2 > 0:
+            transitions += [(w2 * self.p2, states, index(n, i1, np.maximum(i2 - 1, 0))),
+                            ((self.k2 - u2) * self.r2, states,
+                             index(n, i1, np.minimum(i2 + 1, self.k2)))]
+
+        rates = np.concatenate([rate for rate, _, _ in transitions]).astype(float)
+        src = np.concatenate([src for _, src, _ in transitions])
+        dst = np.concatenate([dst for _, _, dst in transitions])
+        keep = rates > 0
+
+        Q = sp.csr_matrix((rates[keep], (src[keep], dst[keep])),
+                          shape=(self.num_states, self.num_states))
+        self.Q = (Q - sp.diags(np.asarray(Q.sum(axis=1)).ravel())).tocsr()
+
+
+    def determineSteadyStateProbabilities(self):
+        self.initializeGeneratorMatrix()
+
+        # Sparse LU, checked and refined by stationary.solve
+        pi, self.diagnostics = stationary.solve(self.Q)
+        self.pi = pi[None, :]
+
+
+    def calc_TH1(self):
+        return self.b1 * self.mu1 * float(self.pi[0] @ self.state_labels()["w1"])
+
+
+    def calc_TH2(self):
+        return self.b2 * self.mu2 * float(self.pi[0] @ self.state_labels()["w2"])
+
+
+    def calc_n_bar(self):
+        return float(self.pi[0] @ self.state_labels()["n"])
+
+
+    def calc_blocking_starving(self) -> tuple:
+        """
+        Probability that a machine of station 1 is up but idle for lack of
+        space (blocked), and that a machine of station 2 is up but idle for
+        lack of parts (starved).
+        """
+        s = self.state_labels()
+
+        return float(self.pi[0] @ (s["u1"] > s["w1"])), float(self.pi[0] @ (s["u2"] > s["w2"]))
+
+
+if __name__ == "__main__":
+    from .two_machines_reliable_analytical import TwoMachineLineBothUnreliable
+
+    # One machine per station and single parts give the model of
+    # TwoMachineLineBothUnreliable
+    line = TwoMachineLineParallel("RobertsLine", 1, 1.1, 0.1, 0.2, 0.2, 0.4, C=3)
+    single = TwoMachineLineBothUnreliable("RobertsLine", 1, 1.1, 0.1, 0.2, 0.2, 0.4, C=3)
+    print("Throughput (parallel, single machines):", line.calc_TH1(), single.calc_TH1())
+
+    # A bottleneck station of three machines feeding one fast machine that
+    # takes batches of two
+    line = TwoMachineLineParallel("RobertsLine", mu1=0.4, mu2=0.6,
+                                  p1=0.01, p2=0.02, r1=0.1, r2=0.15,
+                                  C=20, k1=3, k2=1, b1=1, b2=2)
+    print("States:", line.num_states)
+    print("Throughput via Station 1 is:", line.calc_TH1())
+    print("Throughput via Station 2 is:", line.calc_TH2())
+    print("Average parts in the system is:", line.calc_n_bar())
+    print("Blocking and starving probabilities:", line.calc_blocking_starving())
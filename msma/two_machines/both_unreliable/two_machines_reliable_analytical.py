@@ -0,0 +1,497 @@
+import os
+import tempfile
+import time
+
+import numpy as np
+import numpy.linalg as la
+
+from ... import stationary
+
+
+class TwoMachineLineBothUnreliable:
+    SOLVER_VERSION = "2"  # part of cache keys, increase if pi changes
+
+    def __init__(self, name: str, 
+                 mu1: float, mu2: float,
+                 p1: float, p2: float, 
+                 r1: float, r2: float, 
+                 C: int,
+                 instrument: bool = False,
+                 cache=None,
+                 out_of_core: str = None,
+                 chunk_levels: int = 65536):
+        self.name = name
+        self.instrument = instrument  # collect sizes and timings in stats
+        self.cache = cache  # e.g. a ResultCache; Q is not assembled on hits
+        self.out_of_core = out_of_core  # file of pi, see determineSteadyStateProbabilitiesOutOfCore
+        self.chunk_levels = chunk_levels  # levels per chunk of iter_levels
+
+        self.mu1 = mu1
+        self.p1 = p1
+        self.r1 = r1
+
+        self.mu2 = mu2
+        self.p2 = p2
+        self.r2 = r2
+
+        self.N = C + 2  # extended buffer size
+        self.C = C
+        self.num_states = 4*(C + 3)
+
+        if out_of_core is not None:
+            if cache is not None:
+                raise ValueError("pi is computed out of core or cached, not both")
+            # Nothing of the size of the state space is kept in memory
+            self.determineSteadyStateProbabilitiesOutOfCore(out_of_core, chunk_levels)
+            return
+
+        self.pi = np.zeros((1, self.num_states))  # states prob.
+        self.num_func = np.zeros((self.N+1, 2, 2)).astype((int)) # (n, alpha1, alpha2)
+        
+        count = 0
+        for n in range(self.N+1):
+            for alpha1 in [0, 1]:
+                for alpha2 in [0, 1]:
+                    # so states are numbered from 0
+                    self.num_func[n, alpha1, alpha2] = count  
+                    count += 1
+            
+        self.determineSteadyStateProbabilities()
+
+
+    def initializeGeneratorMatrix(self):
+        self.Q = np.zeros((self.num_states, self.num_states))
+        for n in range(self.N+1):
+            for alpha1 in [0, 1]:
+                for alpha2 in [0, 1]:
+                    # first machine is not blocked; 
+                    # can only fail if it can produce since it is ODF
+                    if n < self.N and alpha1 == 1:  
+                        self.Q[self.num_func[n, 1, alpha2], self.num_func[n+1, 1, alpha2]] = self.mu1
+                        self.Q[self.num_func[n, 1, alpha2], self.num_func[n, 0, alpha2]] = self.p1
+
+                    # second machine is not starved; 
+                    # can only fail if it can produce since it is ODF
+                    if n > 0 and alpha2 == 1:  
+                        self.Q[self.num_func[n, alpha1, 1], self.num_func[n-1, alpha1, 1]] = self.mu2
+                        self.Q[self.num_func[n, alpha1, 1], self.num_func[n, alpha1, 0]] = self.p2
+
+                    # first machine down -> can be repaired
+                    if alpha1 == 0:
+                        self.Q[self.num_func[n, 0, alpha2], self.num_func[n, 1, alpha2]] = self.r1
+
+                    # second machine down -> can be repaired
+                    if alpha2 == 0:
+                        self.Q[self.num_func[n, alpha1, 0], self.num_func[n, alpha1, 1]] = self.r2
+
+        for i in range(self.num_states):
+            for j in range(self.num_states):
+                if i != j:
+                    self.Q[i, i] -= self.Q[i, j]
+
+
+    def parameters(self) -> dict:
+        return {"mu1": self.mu1, "mu2": self.mu2, "p1": self.p1, "p2": self.p2,
+                "r1": self.r1, "r2": self.r2, "C": self.C}
+
+
+    def determineSteadyStateProbabilities(self):
+        if self.instrument:
+            start = time.perf_counter()
+
+        if self.cache is not None:
+            key = self.cache.key(type(self), self.parameters(), self.SOLVER_VERSION)
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.pi = cached["pi"]  # read-only memory map
+                # Checked level by level, as Q is not assembled
+                self.diagnostics = dict(self._level_diagnostics(), method="cache")
+                if self.instrument:
+                    self.stats = {"states": self.num_states,
+                                  "solve_time": time.perf_counter() - start,
+                                  "solve_method": "cache"}
+                return
+
+        self.initializeGeneratorMatrix()
+
+        if self.instrument:
+            assembled = time.perf_counter()
+
+        # pi Q = 0 with sum(pi) = 1, checked and refined by stationary.solve
+        pi, self.diagnostics = stationary.solve(self.Q)
+        self.pi = pi[None, :]
+
+        if self.cache is not None:
+            self.cache.put(key, {"pi": self.pi})
+
+        if self.instrument:
+            self.stats = {"states": self.num_states,
+                          "assembly_time": assembled - start,
+                          "solve_time": time.perf_counter() - assembled,
+                          "solve_method": self.diagnostics["method"]}
+
+
+    def determineSteadyStateProbabilitiesOutOfCore(self, path: str,
+                                                   chunk_levels: int = 65536):
+        """
+        Compute pi level by level into the file path, a float64 array of
+        the shape (1, num_states) of pi, which is then mapped read-only to
+        self.pi. Q is not assembled.
+
+        The level reduction of throughput gives the 4 x 4 matrices R_n of
+        pi_n = pi_{n-1} R_n from the top level down. They are kept in a
+        temporary file next to path and read back from level 0 up. On the
+        way up, pi_n is stored relative to a scale 2^L_n, so that neither
+        overflows nor underflows before the last pass normalizes it. Every
+        pass maps only the chunk of chunk_levels levels it works on, so
+        memory stays at a few hundred bytes per level of a chunk for any C.
+        """
+        if self.instrument:
+            start = time.perf_counter()
+
+        levels = self.N + 1
+        reduction = _level_reduction(self.mu1, self.mu2, self.p1, self.p2,
+                                     self.r1, self.r2, self.C)
+
+        directory = os.path.dirname(os.path.abspath(path))
+        with open(path, "w+b") as pi_file, \
+                tempfile.TemporaryFile(dir=directory) as R_file, \
+                tempfile.TemporaryFile(dir=directory) as L_file:
+            pi_file.truncate(levels * 4 * 8)
+            R_file.truncate(levels * 16 * 8)
+            L_file.truncate(levels * 8)
+
+            # R_N, ..., R_1, chunk by chunk from the top
+            for hi in range(levels, 1, -chunk_levels):
+                lo = max(hi - chunk_levels, 1)
+                R = np.empty((hi - lo, 4, 4))
+                for n in range(hi - 1, lo - 1, -1):
+                    R[n - lo] = next(reduction)
+                _chunk(R_file, lo, hi, (4, 4))[:] = R
+
+            # pi_0 M_0 = 0, normalized as in determineSteadyStateProbabilities
+            M = next(reduction)
+            M[:, -1] = 1
+            x = np.maximum(la.solve(M.T, np.array([0, 0, 0, 1.0])), 0)
+
+            log_scale = 0.0  # log2 of the scale of x
+            log_total = -np.inf  # log2 of the sum of all levels so far
+            for lo in range(0, levels, chunk_levels):
+                hi = min(lo + chunk_levels, levels)
+                R = np.array(_chunk(R_file, lo, hi, (4, 4), "r"))
+                block = np.empty((hi - lo, 4))
+                L = np.empty(hi - lo)
+                for n in range(lo, hi):
+                    if n > 0:
+                        x = x @ R[n - lo]
+                    largest = x.max()
+                    if not 2.0**-500 < largest < 2.0**500:
+                        x = x / largest
+                        log_scale += np.log2(largest)
+                    block[n - lo] = x
+                    L[n - lo] = log_scale
+
+                _chunk(pi_file, lo, hi, (4,))[:] = block
+                _chunk(L_file, lo, hi, ())[:] = L
+                log_total = np.logaddexp2(log_total,
+                                          np.logaddexp2.reduce(L + np.log2(block.sum(axis=1))))
+
+            for lo in range(0, levels, chunk_levels):
+                hi = min(lo + chunk_levels, levels)
+                pi = _chunk(pi_file, lo, hi, (4,))
+                pi *= np.exp2(np.array(_chunk(L_file, lo, hi, ())) - log_total)[:, None]
+                pi.flush()
+                del pi
+
+        self.pi = np.memmap(path, dtype=np.float64, mode="r", shape=(1, self.num_states))
+        self.diagnostics = self._level_diagnostics()
+
+        if self.instrument:
+            self.stats = {"states": self.num_states,
+                          "solve_time": time.perf_counter() - start,
+                          "solve_method": self.diagnostics["method"]}
+
+
+    def iter_levels(self, chunk_levels: int = None):
+        """
+        Generator of the levels n and their probabilities, arrays of shape
+        (levels,) and (levels, 4) with the columns in the order of num_func,
+        2*alpha1 + alpha2, chunk_levels levels at a time. Out of core, every
+        chunk is read from the file on its own.
+        """
+        chunk_levels = chunk_levels or self.chunk_levels
+        for lo in range(0, self.N + 1, chunk_levels):
+            hi = min(lo + chunk_levels, self.N + 1)
+            if self.out_of_core is None:
+                block = self.pi.reshape(self.N + 1, 4)[lo:hi]
+            else:
+                block = np.array(_chunk(self.out_of_core, lo, hi, (4,), "r"))
+            yield np.arange(lo, hi), block
+
+
+    def _level_diagnostics(self) -> dict:
+        # The checks of stationary.diagnostics, level by level: pi_n of
+        # the block tridiagonal Q gets inflows from levels n-1 and n+1
+        A_up, A_dn, B_top, B_mid, B_bottom = _level_blocks(self.mu1, self.mu2, self.p1, self.p2,
+                                                           self.r1, self.r2, self.C)
+        scale = max(np.abs(np.diag(B)).max() for B in (B_top, B_mid, B_bottom))
+        residual = total = negative = 0.0
+        previous = pending = None  # last level of the previous chunk and its pi Q
+
+        for n, block in self.iter_levels():
+            y = block @ B_mid
+            y[n == 0] = block[n == 0] @ B_bottom
+            y[n == self.N] = block[n == self.N] @ B_top
+            y[1:] += block[:-1] @ A_up
+            y[:-1] += block[1:] @ A_dn
+            if previous is not None:
+                y[0] += previous @ A_up
+                residual = max(residual, np.abs(pending + block[0] @ A_dn).max())
+            if len(y) > 1:
+                residual = max(residual, np.abs(y[:-1]).max())
+            previous, pending = block[-1].copy(), y[-1].copy()
+
+            total += block.sum()
+            negative -= block[block < 0].sum()
+
+        residual = max(residual, np.abs(pending).max())
+
+        return {"residual": float(residual / scale),
+                "normalization_error": float(abs(total - 1)),
+                "negative_mass": float(negative),
+                "method": "level reduction",
+                "accepted": bool(residual / scale <= stationary.TOLERANCE)}
+
+
+    def calc_TH1(self):
+        if self.out_of_core is not None:
+            return self.mu1 * sum(float(block[n < self.N, 2:].sum())
+                                  for n, block in self.iter_levels())
+        return self.mu1 * sum([self.pi[0, self.num_func[n, 1, alpha2]] 
+                               for n in range(self.N)
+                               for alpha2 in [0, 1]])
+     
+    
+    def calc_TH2(self):
+        if self.out_of_core is not None:
+            return self.mu2 * sum(float(block[n > 0][:, [1, 3]].sum())
+                                  for n, block in self.iter_levels())
+        return self.mu2 * sum([self.pi[0, self.num_func[n, alpha1, 1]] 
+                               for n in range(1, self.N+1)
+                               for alpha1 in [0, 1]])
+        
+    def calc_n_bar(self):
+        if self.out_of_core is not None:
+            return sum(float(n @ block.sum(axis=1)) for n, block in self.iter_levels())
+        return sum([n*self.pi[0, self.num_func[n, alpha1, alpha2]]
+                    for n in range(1, self.N+1)
+                    for alpha1 in [0, 1]
+                    for alpha2 in [0, 1]])
+
+
+    def buffer_quantile(self, q):
+        """
+        Smallest level n with P(parts in the system <= n) >= q, for q a
+        number or array, accumulated level by level. The probabilities
+        are compared up to a relative stationary.TOLERANCE, so that a
+        level whose cdf equals q is found in memory and out of core alike,
+        whatever the round-off of the two summations.
+        """
+        values = np.atleast_1d(np.asarray(q, dtype=float))
+        quantiles = np.full(values.shape, self.N)
+        pending = np.ones(values.shape, dtype=bool)
+        cumulative = 0.0
+
+        for n, block in self.iter_levels():
+            cdf = cumulative + np.cumsum(block.sum(axis=1))
+            k = np.searchsorted(cdf, values * (1 - stationary.TOLERANCE))
+            found = pending & (k < len(n))
+            quantiles[found] = n[k[found]]
+            pending &= ~found
+            cumulative = cdf[-1]
+            if not pending.any():
+                break
+
+        return int(quantiles[0]) if np.ndim(q) == 0 else quantiles
+
+
+def _chunk(file, lo: int, hi: int, shape: tuple, mode: str = "r+") -> np.memmap:
+    # Memory map of the levels lo, ..., hi-1 of a file of float64 arrays
+    # of shape (levels,) + shape
+    size = int(np.prod(shape))
+    return np.memmap(file, dtype=np.float64, mode=mode, offset=lo * size * 8,
+                     shape=(hi - lo,) + shape)
+
+
+def _level_blocks(mu1, mu2, p1, p2, r1, r2, C) -> tuple:
+    # Blocks of Q between the levels (A_up: n -> n+1, A_dn: n -> n-1) and
+    # within the top, inner and bottom levels, phase = 2*alpha1 + alpha2
+    # as in num_func
+    N = C + 2
+    alpha1 = np.array([0, 0, 1, 1])
+    alpha2 = np.array([0, 1, 0, 1])
+
+    A_up = np.diag(mu1 * alpha1)
+    A_dn = np.diag(mu2 * alpha2)
+
+    def local_block(n):
+        B = np.zeros((4, 4))
+        B[[0, 1], [2, 3]] = r1
+        B[[0, 2], [1, 3]] = r2
+        if n < N:
+            B[[2, 3], [0, 1]] = p1
+        if n > 0:
+            B[[1, 3], [0, 2]] = p2
+        outflow = B.sum(axis=1)
+        if n < N:
+            outflow += mu1 * alpha1
+        if n > 0:
+            outflow += mu2 * alpha2
+
+        return B - np.diag(outflow)
+
+    return A_up, A_dn, local_block(N), local_block(1), local_block(0)
+
+
+def _level_reduction(mu1, mu2, p1, p2, r1, r2, C):
+    """
+    Generator of the matrices R_N, ..., R_1 of pi_n = pi_{n-1} R_n, from
+    the top level down, followed by M_0 with pi_0 M_0 = 0. Only 4 x 4
+    matrices are kept.
+
+    As in GTH elimination, the diagonal of M_n = B_n + R_{n+1} A_dn is not
+    computed by cancellation but from its row sums, M_n 1 = -A_dn 1 and
+    M_0 1 = 0, since whatever leaves level n upwards comes back. Otherwise
+    the errors grow over the levels when the buffer is mostly full.
+    """
+    N = C + 2
+    A_up, A_dn, B_top, B_mid, B_bottom = _level_blocks(mu1, mu2, p1, p2, r1, r2, C)
+    down = A_dn.sum(axis=1)
+
+    R = -la.solve(B_top.T, A_up.T).T
+    for n in range(N, 0, -1):
+        yield R
+        M = (B_mid if n > 1 else B_bottom) + R @ A_dn
+        np.fill_diagonal(M, 0)
+        np.fill_diagonal(M, -M.sum(axis=1) - (down if n > 1 else 0))
+        if n > 1:
+            R = -la.solve(M.T, A_up.T).T
+
+    yield M
+
+
+def throughput(mu1: float, mu2: float,
+               p1: float, p2: float,
+               r1: float, r2: float,
+               C: int,
+               with_probabilities: bool = False):
+    """
+    Throughput of a two-machine line with both machines unreliable, without
+    assembling the generator.
+
+    The states of one buffer level form a block of the four machine states
+    (alpha1, alpha2), so Q is block tridiagonal. Linear level reduction from
+    the top level, pi_n = pi_{n-1} R_n, only needs 4 x 4 matrices, and the
+    sums over all levels needed for normalization and throughput are
+    accumulated on the way down, so memory does not grow with C.
+
+    Parameters
+    ----------
+    mu1, mu2 : float
+        Processing rates.
+    p1, p2 : float
+        Failure rates.
+    r1, r2 : float
+        Repair rates.
+    C : int
+        The capacity of the buffer.
+    with_probabilities : bool, optional
+        If True, also return the probabilities that machine 2 is up and
+        starved and that machine 1 is up and blocked. Default is False.
+
+    Returns
+    -------
+    TH : float
+        The throughput, equal to calc_TH1 of TwoMachineLineBothUnreliable.
+    ps : float, optional
+        Probability of (n = 0, alpha2 = 1).
+    pb : float, optional
+        Probability of (n = N, alpha1 = 1).
+    """
+    N = C + 2
+    # phase = 2*alpha1 + alpha2, as in num_func
+    alpha1 = np.array([0, 0, 1, 1])
+    alpha2 = np.array([0, 1, 0, 1])
+
+    # Column vectors relating pi_n to sums over levels n, ..., N:
+    # pi_n u_n = sum_m pi_m 1, pi_n w_n = sum_m pi_m (alpha1 = 1, m < N),
+    # pi_n z_n = pi_N (alpha1 = 1)
+    u = np.ones(4)
+    w = np.zeros(4)
+    z = alpha1.astype(float)
+
+    # Only ratios matter, so the vectors are kept scaled by exp(-log_scale)
+    # to prevent them from overflowing; the scale itself would overflow
+    # for long buffers, so only its logarithm is kept
+    log_scale = 0.0
+
+    reduction = _level_reduction(mu1, mu2, p1, p2, r1, r2, C)
+    for _, R in zip(range(N), reduction):
+        inverse_scale = np.exp(-log_scale)
+        u = inverse_scale + R @ u
+        w = alpha1 * inverse_scale + R @ w
+        z = R @ z
+
+        factor = u.max()
+        u, w, z = u/factor, w/factor, z/factor
+        log_scale += np.log(factor)
+
+    M = next(reduction)
+
+    # pi_0 M = 0, normalized as in determineSteadyStateProbabilities
+    M[:, -1] = 1
+    pi0 = la.solve(M.T, np.array([0, 0, 0, 1.0]))
+    total = pi0 @ u
+
+    TH = float(mu1 * (pi0 @ w) / total)
+
+    if with_probabilities:
+        ps = float((pi0 @ alpha2) / total * np.exp(-log_scale))
+        pb = float((pi0 @ z) / total)
+        return TH, ps, pb
+
+    return TH
+
+
+if __name__ == "__main__":
+    # We now create an object of the class
+    myTwoMachineLine = TwoMachineLineBothUnreliable("RobertsLine", 
+                                                    mu1=1, mu2=1.1, 
+                                                    p1=0.1, p2=0.2, 
+                                                    r1=0.2, r2=0.4,
+                                                    C=3)
+
+    print("Vector of state probablities is:", myTwoMachineLine.pi)
+
+    print("Throughput via Machine 1 is:",
+        myTwoMachineLine.calc_TH1(),)
+
+    print("Throughput via Machine 2 is:",
+        myTwoMachineLine.calc_TH2(),)
+
+    print("Average parts in the system is:", 
+        myTwoMachineLine.calc_n_bar())
+
+    # Out of core, pi of a large buffer is computed level by level into a
+    # file, and the KPIs are streamed from it
+    with tempfile.TemporaryDirectory() as directory:
+        bigLine = TwoMachineLineBothUnreliable("RobertsLine",
+                                               mu1=1, mu2=1.1,
+                                               p1=0.1, p2=0.2,
+                                               r1=0.2, r2=0.4,
+                                               C=100000,
+                                               out_of_core=os.path.join(directory, "pi.bin"))
+        print("Out of core, throughput is:", bigLine.calc_TH1(),
+              "and the median and 99% quantile of the parts in the system are:",
+              bigLine.buffer_quantile([0.5, 0.99]))
+        del bigLine  # release the memory map before the file is removed
@@ -0,0 +1,294 @@
+import numpy as np
+import scipy.linalg as sla
+import scipy.sparse as sp
+
+from ... import stationary
+from .two_machines_reliable_analytical import TwoMachineLineBothUnreliable
+
+
+class TwoMachineLineBothUnreliableSweep(TwoMachineLineBothUnreliable):
+    """
+    Two-machine line with both machines unreliable, prepared for sweeping
+    one of the rates mu1, mu2, p1, p2, r1 or r2 while all other parameters
+    stay fixed.
+
+    Every rate enters the generator linearly, so the modified generator is
+    Qmod(theta) = A + d * B with A = Qmod(theta_0) and d = theta - theta_0.
+    B only has nonzero rows for the k states in which the swept transition
+    is possible, i.e. B = U W where U selects these rows. The
+    Sherman-Morrison-Woodbury formula then gives
+
+        pi(theta) = pi_0 - d * (pi_0 U) (I + d K)^-1 W A^-1
+
+    with the k x k capacitance matrix K = W A^-1 U. A is factorized and K
+    is reduced to Schur form only once, afterwards a KPI costs a triangular
+    solve of size k and the full state vector another O(n k) per rate
+    value. Values for which the updated state vector does not pass a
+    residual check are solved by refactorizing Qmod(theta).
+    """
+    PARAMETERS = ("mu1", "mu2", "p1", "p2", "r1", "r2")
+
+    def __init__(self, name: str,
+                 mu1: float, mu2: float,
+                 p1: float, p2: float,
+                 r1: float, r2: float,
+                 C: int,
+                 param: str = "r1",
+                 tol: float = 1e-9):
+        if param not in self.PARAMETERS:
+            raise ValueError(f"param must be one of {self.PARAMETERS}")
+
+        self.param = param
+        self.tol = tol
+        self.refactorizations = 0
+
+        super().__init__(name, mu1, mu2, p1, p2, r1, r2, C)
+
+
+    def rate_transitions(self, param: str) -> tuple:
+        """
+        Return the (from, to) state indices of all transitions with the
+        given rate, following initializeGeneratorMatrix.
+        """
+        n = np.arange(self.N+1)[:, None]
+        alpha = np.array([0, 1])[None, :]
+
+        if param in ("mu1", "p1"):
+            n, alpha2 = np.broadcast_arrays(n[:-1], alpha)
+            src = self.num_func[n, 1, alpha2]
+            dst = (self.num_func[n+1, 1, alpha2] if param == "mu1"
+                   else self.num_func[n, 0, alpha2])
+
+        elif param in ("mu2", "p2"):
+            n, alpha1 = np.broadcast_arrays(n[1:], alpha)
+            src = self.num_func[n, alpha1, 1]
+            dst = (self.num_func[n-1, alpha1, 1] if param == "mu2"
+                   else self.num_func[n, alpha1, 0])
+
+        elif param == "r1":
+            n, alpha2 = np.broadcast_arrays(n, alpha)
+            src = self.num_func[n, 0, alpha2]
+            dst = self.num_func[n, 1, alpha2]
+
+        else:
+            n, alpha1 = np.broadcast_arrays(n, alpha)
+            src = self.num_func[n, alpha1, 0]
+            dst = self.num_func[n, alpha1, 1]
+
+        return src.ravel(), dst.ravel()
+
+
+    def initializeGeneratorMatrix(self):
+        # Same generator as the parent class, assembled from the
+        # transition lists instead of a loop over all pairs of states
+        self.Q = np.zeros((self.num_states, self.num_states))
+
+        for param in self.PARAMETERS:
+            src, dst = self.rate_transitions(param)
+            self.Q[src, dst] += getattr(self, param)
+
+        self.Q[np.diag_indices(self.num_states)] = -self.Q.sum(axis=1)
+
+
+    def determineSteadyStateProbabilities(self):
+        self.initializeGeneratorMatrix()
+        self.Qmod = self.Q.copy()
+        self.Qmod[:, -1] = 1
+        self.nmod = np.zeros((1, self.num_states))
+        self.nmod[0, -1] = 1
+
+        self.base_value = getattr(self, self.param)
+        self.lu = sla.lu_factor(self.Qmod)
+
+        # pi A = e  <=>  A^T pi^T = e^T, checked like stationary.solve. The
+        # factors are kept for the updates, and a pi_base that does not
+        # pass the checks is replaced by the refined or GTH one
+        self.pi_base = sla.lu_solve(self.lu, self.nmod[0], trans=1)
+        self.diagnostics = stationary.diagnostics(self.Q, self.pi_base)
+        self.diagnostics.update(method="lu", refinement_steps=0, clipped_mass=0.0,
+                                accepted=stationary.accurate(self.diagnostics))
+        if not self.diagnostics["accepted"]:
+            self.pi_base, self.diagnostics = stationary.solve(self.Q)
+        self.pi = self.pi_base[None, :]
+
+        # Coefficient matrix B = U W of the swept rate in Qmod
+        src, dst = self.rate_transitions(self.param)
+        self.rows = np.unique(src)
+        row_pos = np.searchsorted(self.rows, src)
+        self.W = np.zeros((len(self.rows), self.num_states))
+        np.add.at(self.W, (row_pos, dst), 1)
+        np.add.at(self.W, (row_pos, src), -1)
+        self.W[:, -1] = 0
+
+        # Sparse copies for the residual checks
+        self.A_sparse = sp.csr_matrix(self.Qmod)
+        self.W_sparse = sp.csr_matrix(self.W)
+
+        # W A^-1 and the capacitance matrix K = W A^-1 U
+        WA = sla.lu_solve(self.lu, self.W.T, trans=1).T
+        K = WA[:, self.rows]
+
+        # Unitary Schur form K = Z T Z^H, so that (I + d K)^-1 only needs
+        # a triangular solve per value:
+        # pi(theta) = pi_0 - d * a (I + d T)^-1 G
+        self.T, Z = sla.schur(K, output="complex")
+        self.a = self.pi_base[self.rows] @ Z
+        self.G = Z.conj().T @ WA
+
+        # KPIs are linear in pi, reduce G once against the indicator vectors
+        self.F = self.kpi_vectors()
+        self.piF = self.pi_base @ self.F
+        self.GF = self.G @ self.F
+
+
+    def kpi_vectors(self) -> np.ndarray:
+        """
+        Columns: indicator of machine 1 producing, indicator of machine 2
+        producing and buffer level of each state.
+        """
+        F = np.zeros((self.num_states, 3))
+        F[self.num_func[:self.N, 1, :].ravel(), 0] = 1
+        F[self.num_func[1:, :, 1].ravel(), 1] = 1
+        F[:, 2] = np.repeat(np.arange(self.N+1), 4)
+
+        return F
+
+
+    def _reduced(self, d: np.ndarray) -> np.ndarray:
+        """
+        Rows a (I + d T)^-1 for all rate offsets d.
+        """
+        identity = np.eye(len(self.rows))
+        Y = np.zeros((len(d), len(self.rows)), dtype=complex)
+
+        for i in range(len(d)):
+            try:
+                Y[i] = sla.solve_triangular(identity + d[i] * self.T, self.a,
+                                            trans="T", check_finite=False)
+            except sla.LinAlgError:
+                Y[i] = np.nan
+
+        return Y
+
+
+    def _update(self, d: np.ndarray) -> tuple:
+        """
+        Low-rank update of the state vector for the rate offsets d. Returns
+        the state vectors, one row per offset, and their residuals
+        max |pi Qmod - nmod|.
+        """
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pi = self.pi_base - d[:, None] * (self._reduced(d) @ self.G).real
+
+            residual = (self.A_sparse.T @ pi.T).T - self.nmod
+            residual += d[:, None] * (self.W_sparse.T @ pi[:, self.rows].T).T
+
+        residual = np.abs(residual).max(axis=1)
+        residual[~np.isfinite(residual)] = np.inf
+
+        return pi, residual
+
+
+    def _refactorize(self, value: float) -> tuple:
+        # State vector and diagnostics of stationary.solve for the value
+        self.refactorizations += 1
+        Q = self.Q.copy()
+        src, dst = self.rate_transitions(self.param)
+        d = value - self.base_value
+        np.add.at(Q, (src, dst), d)
+        np.add.at(Q, (src, src), -d)
+
+        return stationary.solve(Q)
+
+
+    def set_value(self, value: float):
+        """
+        Move the swept rate to value and update self.pi, so that calc_TH1,
+        calc_TH2 and calc_n_bar refer to the new value.
+        """
+        pi, residual = self._update(np.array([value - self.base_value]))
+
+        if residual[0] > self.tol:
+            pi, self.diagnostics = self._refactorize(value)
+            pi = pi[None, :]
+        else:
+            self.diagnostics = {"residual": float(residual[0]), "method": "update",
+                                "accepted": True}
+
+        setattr(self, self.param, value)
+        self.pi = pi
+
+
+    def sweep(self, values, check: bool = True, chunk_size: int = 256) -> tuple:
+        """
+        Evaluate the line for all values of the swept rate.
+
+        Parameters
+        ----------
+        values : array_like
+            Values of the swept rate.
+        check : bool, optional
+            If True, the residual of every updated state vector is checked
+            and values failing the tolerance are refactorized, which costs
+            O(n k) per value. If False, the KPIs are updated directly
+            without forming the state vectors. Default is True.
+        chunk_size : int, optional
+            Number of state vectors formed at once when checking.
+
+        Returns
+        -------
+        TH1 : numpy.ndarray
+            Throughput via machine 1 for each value.
+        TH2 : numpy.ndarray
+            Throughput via machine 2 for each value.
+        n_bar : numpy.ndarray
+            Average parts in the system for each value.
+        """
+        values = np.asarray(values, dtype=float)
+        d = values - self.base_value
+
+        if not check:
+            kpis = self.piF - d[:, None] * (self._reduced(d) @ self.GF).real
+
+        else:
+            kpis = np.zeros((len(values), 3))
+
+            for start in range(0, len(values), chunk_size):
+                chunk = slice(start, start + chunk_size)
+                pi, residual = self._update(d[chunk])
+                kpis[chunk] = pi @ self.F
+
+                # Fall back to a fresh factorization where the update
+                # is not accurate enough
+                for i in np.flatnonzero(residual > self.tol):
+                    kpis[start + i] = self._refactorize(values[start + i])[0] @ self.F
+
+        mu1 = values if self.param == "mu1" else self.mu1
+        mu2 = values if self.param == "mu2" else self.mu2
+
+        return mu1 * kpis[:, 0], mu2 * kpis[:, 1], kpis[:, 2]
+
+
+if __name__ == "__main__":
+    import time
+
+    sweep_line = TwoMachineLineBothUnreliableSweep("RobertsLine",
+                                                   mu1=1, mu2=1.1,
+                                                   p1=0.1, p2=0.2,
+                                                   r1=0.2, r2=0.4,
+                                                   C=100, param="r1")
+
+    values = np.linspace(0.05, 2, 1000)
+    start = time.perf_counter()
+    TH1, TH2, n_bar = sweep_line.sweep(values)
+    print("Sweep of 1000 values took", time.perf_counter() - start, "s")
+    print("Refactorizations:", sweep_line.refactorizations)
+
+    for i in [0, 499, 999]:
+        line = TwoMachineLineBothUnreliable("RobertsLine",
+                                            mu1=1, mu2=1.1,
+                                            p1=0.1, p2=0.2,
+                                            r1=values[i], r2=0.4,
+                                            C=100)
+        print(f"r1 = {values[i]:.4f}: TH = {TH1[i]:.10f} (sweep), "
+              f"{line.calc_TH1():.10f} (direct)")
@@ -0,0 +1,203 @@
+"""
+First-passage analytics on the generators of the two-machine lines, e.g.
+the expected time until the buffer is full after machine 2 failed, or
+the distribution of the length of starvation episodes.
+
+Target states are made absorbing, and the remaining transient block Q_TT
+of the generator gives, by sparse solves,
+
+    mean first-passage times      Q_TT m_1 = -1
+    higher moments                Q_TT m_k = -k m_(k-1)
+    absorption probabilities      Q_TT h = -Q_TA 1
+
+where A are the targets. A sojourn in a set of states S is a first passage
+to the complement of S, started from the distribution in which S is
+entered. States are selected with boolean masks over the labels of
+state_labels:
+
+    line = TwoMachineLineBothUnreliable("X", 1, 1.1, 0.01, 0.02, 0.1, 0.15, C=20)
+    Q, s = generator(line), state_labels(line)
+    starved = s["n"] == 0
+    alpha = entrance_distribution(Q, line.pi, starved)
+    mean, second = sojourn_time_moments(Q, starved, alpha)
+"""
+
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+
+
+def generator(line) -> sp.csr_matrix:
+    """
+    Generator of a two-machine line as sparse matrix. It is assembled if
+    the line has none, e.g. because its probabilities came from a cache.
+    """
+    if getattr(line, "Q", None) is None:
+        line.initializeGeneratorMatrix()
+
+    return sp.csr_matrix(line.Q)
+
+
+def state_labels(line) -> dict:
+    """
+    Buffer level n and machine states alpha1 and/or alpha2 of every state
+    index of a two-machine line, as dict of integer arrays. Lines with a
+    state_labels method, e.g. TwoMachineLinePhaseType, give their own.
+    """
+    if hasattr(line, "state_labels"):
+        return line.state_labels()
+
+    if hasattr(line, "StN"):
+        # Both machines reliable, one state per buffer level
+        n = np.empty(len(line.StN), dtype=int)
+        n[line.StN] = np.arange(len(line.StN))
+        return {"n": n}
+
+    num_func = line.num_func
+    if num_func.ndim == 3:
+        names = ["n", "alpha1", "alpha2"]
+    else:
+        names = ["n", "alpha1" if hasattr(line, "p1") else "alpha2"]
+
+    labels = {}
+    grids = np.indices(num_func.shape)
+    for name, grid in zip(names, grids):
+        labels[name] = np.empty(num_func.size, dtype=int)
+        labels[name][num_func.ravel()] = grid.ravel()
+
+    return labels
+
+
+def _mask(states, size):
+    mask = np.zeros(size, dtype=bool)
+    mask[states] = True
+
+    return mask
+
+
+def _factorize(Q, transient):
+    # LU factors of the transient block; singular if the absorbing states
+    # cannot be reached from every transient state
+    Q_TT = Q[transient][:, transient].tocsc()
+    try:
+        return spla.splu(Q_TT)
+    except RuntimeError as error:
+        raise ValueError("The target states are not reachable from all "
+                         "other states") from error
+
+
+def first_passage_moments(Q, targets, order: int = 2) -> np.ndarray:
+    """
+    Moments of the first-passage time into the target states from every
+    state, shape (order, number of states). Row k-1 holds E[T^k], which
+    is 0 on the targets.
+    """
+    Q = sp.csr_matrix(Q)
+    transient = ~_mask(targets, Q.shape[0])
+    lu = _factorize(Q, transient)
+
+    moments = np.zeros((order, Q.shape[0]))
+    previous = np.ones(transient.sum())
+    for k in range(1, order + 1):
+        previous = lu.solve(-k * previous)
+        moments[k-1, transient] = previous
+
+    return moments
+
+
+def mean_first_passage_times(Q, targets) -> np.ndarray:
+    """
+    Expected time until the first visit of the target states, from every
+    state.
+    """
+    return first_passage_moments(Q, targets, order=1)[0]
+
+
+def absorption_probabilities(Q, targets, avoid) -> np.ndarray:
+    """
+    Probability of reaching the target states before the states to avoid,
+    from every state (1 on the targets, 0 on the avoided states).
+    """
+    Q = sp.csr_matrix(Q)
+    targets = _mask(targets, Q.shape[0])
+    avoid = _mask(avoid, Q.shape[0])
+    if np.any(targets & avoid):
+        raise ValueError("A state cannot be a target and avoided")
+
+    transient = ~(targets | avoid)
+    lu = _factorize(Q, transient)
+
+    h = targets.astype(float)
+    h[transient] = lu.solve(-np.asarray(Q[transient][:, targets].sum(axis=1)).ravel())
+
+    return h
+
+
+def entrance_distribution(Q, pi, states) -> np.ndarray:
+    """
+    Distribution of the state in which the set of states is entered in
+    steady state, i.e. the flow pi_i Q_ij from outside into every state j
+    of the set, normalized. pi is the stationary distribution.
+    """
+    Q = sp.csr_matrix(Q)
+    inside = _mask(states, Q.shape[0])
+    pi = np.asarray(pi).ravel()
+
+    flow = np.zeros(Q.shape[0])
+    flow[inside] = Q[~inside][:, inside].T @ pi[~inside]
+    if flow.sum() <= 0:
+        raise ValueError("The states are never entered")
+
+    return flow / flow.sum()
+
+
+def sojourn_time_moments(Q, states, initial, order: int = 2) -> np.ndarray:
+    """
+    Moments E[T^k], k = 1, ..., order, of the time spent in the set of
+    states until it is left, starting from the distribution initial.
+    """
+    moments = first_passage_moments(Q, ~_mask(states, Q.shape[0]), order)
+
+    return moments @ np.asarray(initial).ravel()
+
+
+def sojourn_time_cdf(Q, states, initial, times) -> np.ndarray:
+    """
+    P(T <= t) of the sojourn time of sojourn_time_moments for every t in
+    times: 1 - initial_S expm(Q_SS t) 1.
+    """
+    Q = sp.csr_matrix(Q)
+    inside = _mask(states, Q.shape[0])
+    Q_SS = Q[inside][:, inside].tocsc()
+    initial = np.asarray(initial).ravel()[inside]
+    ones = np.ones(inside.sum())
+
+    return np.array([1 - initial @ spla.expm_multiply(Q_SS * t, ones)
+                     for t in np.atleast_1d(times)])
+
+
+if __name__ == "__main__":
+    from .both_unreliable.two_machines_reliable_analytical import (
+        TwoMachineLineBothUnreliable)
+
+    line = TwoMachineLineBothUnreliable("RobertsLine", mu1=1, mu2=1.1,
+                                        p1=0.01, p2=0.02, r1=0.1, r2=0.15, C=20)
+    Q, s = generator(line), state_labels(line)
+
+    # Expected time until the buffer is full, given machine 2 just failed
+    down2 = s["alpha2"] == 0
+    failed = entrance_distribution(Q, line.pi, down2)
+    m = mean_first_passage_times(Q, s["n"] == line.N)
+    print("Time until the buffer is full after a failure of machine 2:", m @ failed)
+
+    # Probability that the buffer fills up before machine 2 is repaired
+    h = absorption_probabilities(Q, (s["n"] == line.N) & down2, ~down2)
+    print("Probability that the buffer fills before the repair:", h @ failed)
+
+    # Starvation episodes of machine 2
+    starved = s["n"] == 0
+    alpha = entrance_distribution(Q, line.pi, starved)
+    mean, second = sojourn_time_moments(Q, starved, alpha)
+    print("Starvation episodes: mean", mean, "standard deviation",
+          np.sqrt(second - mean**2))
+    print("P(episode <= 1, 10, 100):", sojourn_time_cdf(Q, starved, alpha, [1, 10, 100]))
@@ -1,5 +1,6 @@
 import numpy as np
-import numpy.linalg as la
+
+from ... import stationary
 
 
 class TwoMachineLineFirstUnreliable:
@@ -15,8 +16,6 @@ class TwoMachineLineFirstUnreliable:
         self.N = C + 2  # extended buffer size
         self.num_states = 2*(C + 3)
         self.Q = np.zeros((self.num_states, self.num_states))
-        self.Qmod = np.zeros((self.num_states, self.num_states))
-        self.nmod = np.zeros((1, self.num_states))
         self.pi = np.zeros((1, self.num_states))  # states prob.
         self.num_func = np.zeros((self.N+1, 2)).astype((int))
         
@@ -53,16 +52,9 @@ class TwoMachineLineFirstUnreliable:
 
     def determineSteadyStateProbabilities(self):
         self.initializeGeneratorMatrix()
-        self.Qmod = self.Q.copy()
-        numberOfRowsOfQ = self.Qmod.shape[0]
-        
-        for i in range(numberOfRowsOfQ):
-            self.Qmod[i, numberOfRowsOfQ - 1] = 1  # Qmod is quadratic
-            
-        # right hand side row vector with last element as a 1
-        self.nmod[0][numberOfRowsOfQ - 1] = 1
-
-        self.pi = self.nmod.dot(la.inv(self.Qmod))
+        # pi Q = 0 with sum(pi) = 1, checked and refined by stationary.solve
+        pi, self.diagnostics = stationary.solve(self.Q)
+        self.pi = pi[None, :]
         
     
     def calc_TH1(self):
@@ -1,5 +1,6 @@
 import numpy as np
-import numpy.linalg as la
+
+from ... import stationary
 
 
 class TwoMachineLineSecondUnreliable:
@@ -12,8 +13,6 @@ class TwoMachineLineSecondUnreliable:
         self.N = C + 2  # extended buffer size
         self.num_states = 2*(C + 3)
         self.Q = np.zeros((self.num_states, self.num_states))
-        self.Qmod = np.zeros((self.num_states, self.num_states))
-        self.nmod = np.zeros((1, self.num_states))
         self.pi = np.zeros((1, self.num_states))  # states prob.
         self.num_func = np.zeros((self.N+1, 2)).astype((int))
         
@@ -45,16 +44,9 @@ class TwoMachineLineSecondUnreliable:
 
     def determineSteadyStateProbabilities(self):
         self.initializeGeneratorMatrix()
-        self.Qmod = self.Q.copy()
-        numberOfRowsOfQ = self.Qmod.shape[0]
-        
-        for i in range(numberOfRowsOfQ):
-            self.Qmod[i, numberOfRowsOfQ - 1] = 1  # Qmod is quadratic
-            
-        # right hand side row vector with last element as a 1
-        self.nmod[0][numberOfRowsOfQ - 1] = 1
-
-        self.pi = self.nmod.dot(la.inv(self.Qmod))
+        # pi Q = 0 with sum(pi) = 1, checked and refined by stationary.solve
+        pi, self.diagnostics = stationary.solve(self.Q)
+        self.pi = pi[None, :]
         
     
     def calc_TH1(self):
@@ -72,21 +64,22 @@ class TwoMachineLineSecondUnreliable:
                     for alpha2 in [0, 1]])
 
 
-# We now create an object of the class
-myTwoMachineLine = TwoMachineLineSecondUnreliable("StefansLine", 
-                                                  mu1=1, 
-                                                  mu2=8, 
-                                                  p2=0.1, 
-                                                  r2=0.2, 
-                                                  C=200)
+if __name__ == "__main__":
+    # We now create an object of the class
+    myTwoMachineLine = TwoMachineLineSecondUnreliable("StefansLine", 
+                                                      mu1=1, 
+                                                      mu2=8, 
+                                                      p2=0.1, 
+                                                      r2=0.2, 
+                                                      C=200)
 
-print("Vector of state probablities is:", myTwoMachineLine.pi)
+    print("Vector of state probablities is:", myTwoMachineLine.pi)
 
-print("Throughput via Machine 1 is:",
-    myTwoMachineLine.calc_TH1(),)
+    print("Throughput via Machine 1 is:",
+        myTwoMachineLine.calc_TH1(),)
 
-print("Throughput via Machine 2 is:",
-    myTwoMachineLine.calc_TH2(),)
+    print("Throughput via Machine 2 is:",
+        myTwoMachineLine.calc_TH2(),)
 
-print("Average parts in the system is:", 
-      myTwoMachineLine.calc_n_bar())
+    print("Average parts in the system is:", 
+          myTwoMachineLine.calc_n_bar())
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from msma import cli
+from msma.two_machines.one_unreliable.two_machines_first_unreliable_analytical import (
+    TwoMachineLineFirstUnreliable)
+from msma.two_machines.one_unreliable.two_machines_second_unreliable_analytical import (
+    TwoMachineLineSecondUnreliable)
+
+# Lines with reliable (p = r = 0) and unreliable machines
+MIXED = [{"name": "first", "mu": [1, 1.1], "p": [0.01, 0], "r": [0.1, 0], "C": [200]},
+         {"name": "second", "mu": [1.1, 1], "p": [0, 0.02], "r": [0, 0.1], "C": [50]},
+         {"name": "three", "mu": [1, 1.1, 1.2], "p": [0.01, 0, 0.02],
+          "r": [0.1, 0, 0.1], "C": [600, 600]}]
+
+
+def run(tmp_path, configs, *options):
+    lines = tmp_path / "lines.jsonl"
+    lines.write_text("".join(json.dumps(config) + "\n" for config in configs))
+    output = tmp_path / "results.jsonl"
+
+    status = cli.main([str(lines), "-o", str(output), *options])
+
+    return status, [json.loads(row) for row in output.read_text().splitlines()]
+
+
+def exact(config):
+    # Dense models of two-machine lines with one unreliable machine
+    (mu1, mu2), (p1, p2), (r1, r2), (C,) = (config[key] for key in ("mu", "p", "r", "C"))
+    if p1 > 0:
+        return TwoMachineLineFirstUnreliable("", mu1, mu2, p1, r1, C).calc_TH1()
+    return TwoMachineLineSecondUnreliable("", mu1, mu2, p2, r2, C).calc_TH1()
+
+
+@pytest.mark.parametrize("options", [(), ("--tolerance", "0.01")])
+def test_mixed_two_machine_lines(tmp_path, options):
+    status, results = run(tmp_path, MIXED[:2], *options)
+
+    assert status == 0
+    for config, result in zip(MIXED, results):
+        assert "error" not in result
+        assert result["backend"] == "closed_form"
+        assert result["TP"] == pytest.approx(exact(config), rel=1e-8)
+        assert 0 <= result["ps"][1] <= 1 and 0 <= result["pb"][0] <= 1
+
+
+def test_mixed_line_above_ctmc_limit(tmp_path):
+    status, (result,) = run(tmp_path, MIXED[2:])
+
+    assert status == 0
+    assert "error" not in result
+    assert result["backend"] == "decomposition"
+    # The slowest machine with its availability bounds the throughput
+    assert 0.8 < result["TP"] <= 1 * 0.1 / 0.11 + 1e-9